@@ -5,14 +5,138 @@ import tkinter.simpledialog as sd
 import tkinter.filedialog as fd
 
 
+class Connectivity:
+    """Composantes 4-connexes d'un ensemble de cellules, maintenues de façon incrémentale.
+
+    Union-find sur des nœuds : chaque ajout crée un nœud et l'unit à ses voisins. Un
+    retrait laisse un nœud fantôme ; si les voisins restent reliés par l'anneau des 8
+    cellules autour, rien ne change, sinon on relance un parcours à partir des voisins
+    et les morceaux séparés reçoivent de nouveaux nœuds.
+    """
+
+    # Anneau des 8 cellules autour d'une cellule, dans l'ordre : deux cellules
+    # consécutives sont voisines
+    RING = [(0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
+
+    def __init__(self):
+        self.node = {}      # Clé: (x, y), Valeur: nœud
+        self.parent = []
+        self.num_components = 0
+
+    def __len__(self):
+        return len(self.node)
+
+    def __contains__(self, cell):
+        return cell in self.node
+
+    def _find(self, n):
+        parent = self.parent
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    def _union(self, a, b):
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return False
+        self.parent[rb] = ra
+        return True
+
+    def _new_node(self, cell):
+        self.node[cell] = len(self.parent)
+        self.parent.append(len(self.parent))
+        return self.node[cell]
+
+    @staticmethod
+    def neighbors(cell):
+        x, y = cell
+        return [(x-1, y), (x+1, y), (x, y-1), (x, y+1)]
+
+    def add(self, cell):
+        n = self._new_node(cell)
+        self.num_components += 1
+        for neighbor in self.neighbors(cell):
+            if neighbor in self.node and self._union(self.node[neighbor], n):
+                self.num_components -= 1
+
+    def remove(self, cell):
+        del self.node[cell]
+        x, y = cell
+        ring = [(x + dx, y + dy) in self.node for dx, dy in self.RING]
+        # Les voisins directs sont aux positions paires de l'anneau
+        present = [i for i in range(0, 8, 2) if ring[i]]
+        if not present:
+            self.num_components -= 1
+        elif len(present) > 1 and not self._ring_connected(ring, present):
+            self._split([(x + self.RING[i][0], y + self.RING[i][1]) for i in present])
+        # Trop de nœuds fantômes : on reconstruit
+        if len(self.parent) > 2 * len(self.node) + 64:
+            self.rebuild(list(self.node))
+
+    def _ring_connected(self, ring, present):
+        """Les voisins directs sont-ils dans une même suite de cellules occupées de l'anneau ?"""
+        if all(ring):
+            return True
+        start = ring.index(False)
+        run, runs = 0, {}
+        for k in range(1, 9):
+            i = (start + k) % 8
+            if ring[i]:
+                runs[i] = run
+            else:
+                run += 1
+        return len({runs[i] for i in present}) == 1
+
+    def _flood(self, start):
+        """Parcours en largeur (itératif) de la composante de `start`."""
+        visited = {start}
+        queue = [start]
+        for cell in queue:
+            for neighbor in self.neighbors(cell):
+                if neighbor in self.node and neighbor not in visited:
+                    visited.add(neighbor)
+                    queue.append(neighbor)
+        return visited
+
+    def _split(self, starts):
+        pieces = []
+        for start in starts:
+            if any(start in piece for piece in pieces):
+                continue
+            pieces.append(self._flood(start))
+        self.num_components += len(pieces) - 1
+        if len(pieces) > 1:
+            for piece in pieces:
+                root = None
+                for cell in piece:
+                    n = self._new_node(cell)
+                    if root is None:
+                        root = n
+                    else:
+                        self.parent[n] = root
+
+    def rebuild(self, cells):
+        """Recalcule tout à partir d'une liste de cellules."""
+        self.node.clear()
+        self.parent = []
+        self.num_components = 0
+        for cell in cells:
+            self.add(cell)
+
+    def is_connected(self):
+        return self.num_components == 1
+
+
 class ElectroVoxelApp:
-    def __init__(self, root):
+    def __init__(self, root, grid_size=(20, 20), voxel_size=None):
         self.root = root
         self.root.title("ElectroVoxel Simulator")
 
         # Paramètres du grid
-        self.grid_size = (20, 20)  # Taille du grid (en nombre de voxels)
-        self.voxel_size = 40       # Taille de chaque voxel pour l'affichage
+        self.grid_size = tuple(grid_size)  # Taille du grid (en nombre de voxels)
+        # Taille de chaque voxel pour l'affichage, 40 pixels jusqu'à 20x20 puis le canevas reste à 800 pixels
+        self.voxel_size = voxel_size or max(2, min(40, 800 // max(self.grid_size)))
         self.screen_size = (self.grid_size[0] * self.voxel_size, 
                             self.grid_size[1] * self.voxel_size)
 
@@ -44,6 +168,7 @@ class ElectroVoxelApp:
 
         # Pour stocker les électrovoxels dessinés
         self.electrovoxels = {}  # Clé: (x, y), Valeur: ID du rectangle sur le canevas
+        self.connectivity = Connectivity()
         
         clear_button = tk.Button(control_panel, text="Clear", command=self.clear_grid)
         clear_button.pack()
@@ -55,19 +180,21 @@ class ElectroVoxelApp:
         load_button.pack()
         
     def draw_grid(self):
-            for x in range(0, self.screen_size[0], self.voxel_size):
-                for y in range(0, self.screen_size[1], self.voxel_size):
-                    self.canvas.create_rectangle(x, y, x + self.voxel_size, y + self.voxel_size, outline=self.grid_color)
+        # Une ligne par colonne et par rangée plutôt qu'un rectangle par cellule,
+        # dessinées une seule fois : Clear n'efface que les électrovoxels
+        width, height = self.screen_size
+        for x in range(0, width + 1, self.voxel_size):
+            self.canvas.create_line(x, 0, x, height, fill=self.grid_color, tags="grid")
+        for y in range(0, height + 1, self.voxel_size):
+            self.canvas.create_line(0, y, width, y, fill=self.grid_color, tags="grid")
 
     def clear_grid(self):
-        # Effacer tous les électrovoxels du canevas
-        self.canvas.delete("all")
+        # Effacer tous les électrovoxels du canevas, le grid reste
+        self.canvas.delete("voxel")
 
-        # Dessiner le grid
-        self.draw_grid()
-        
         # Réinitialiser le dictionnaire des électrovoxels
         self.electrovoxels.clear()
+        self.connectivity.rebuild([])
 
         # Mettre à jour le compteur d'électrovoxels
         self.update_electrovoxel_count()
@@ -76,21 +203,18 @@ class ElectroVoxelApp:
         # Calculer les coordonnées de la grille cliquée
         grid_x = event.x // self.voxel_size
         grid_y = event.y // self.voxel_size
-
-        # Coordonnées pour dessiner/effacer l'électrovoxel
-        x1, y1 = grid_x * self.voxel_size, grid_y * self.voxel_size
-        x2, y2 = x1 + self.voxel_size, y1 + self.voxel_size
+        if not (0 <= grid_x < self.grid_size[0] and 0 <= grid_y < self.grid_size[1]):
+            return
 
         # Dessiner ou effacer l'électrovoxel
         if (grid_x, grid_y) in self.electrovoxels:
             # Électrovoxel existant, l'effacer
             self.canvas.delete(self.electrovoxels[(grid_x, grid_y)])
             del self.electrovoxels[(grid_x, grid_y)]
+            self.connectivity.remove((grid_x, grid_y))
         else:
             # Nouvel électrovoxel, le dessiner
-            voxel_id = self.canvas.create_rectangle(x1, y1, x2, y2, fill="blue", outline="")
-            self.electrovoxels[(grid_x, grid_y)] = voxel_id
-        self.update_electrovoxel_count()
+            self.add_electrovoxel(grid_x, grid_y)
         self.update_electrovoxel_count()
         self.update_unity_info()
 
@@ -100,29 +224,11 @@ class ElectroVoxelApp:
         self.electrovoxel_count_label.config(text=f"Electrovoxels: {count}")
 
     def is_shape_unified(self):
-        if not self.electrovoxels:
-            return False  # Aucun électrovoxel présent
-
-        # Sélectionner un électrovoxel de départ
-        start = next(iter(self.electrovoxels))
-
-        # Parcourir les électrovoxels connectés
-        visited = set()
-        self.dfs(start, visited)
-
-        # Vérifier si tous les électrovoxels ont été visités
-        return len(visited) == len(self.electrovoxels)
-
-    def dfs(self, voxel, visited):
-        if voxel not in visited:
-            visited.add(voxel)
-            for neighbor in self.get_neighbors(voxel):
-                if neighbor in self.electrovoxels:
-                    self.dfs(neighbor, visited)
+        # Aucun électrovoxel présent : non, sinon une seule composante connexe
+        return self.connectivity.is_connected()
 
     def get_neighbors(self, voxel):
-        x, y = voxel
-        return [(x-1, y), (x+1, y), (x, y-1), (x, y+1)]  # Les voisins : haut, bas, gauche, droite
+        return Connectivity.neighbors(voxel)  # Les voisins : haut, bas, gauche, droite
 
     def update_unity_info(self):
             if self.is_shape_unified():
@@ -141,12 +247,7 @@ class ElectroVoxelApp:
         shape_name = sd.askstring("Nom de la Forme", "Entrez le nom de la forme:")
         if shape_name:
             # Créer un DataFrame à partir des électrovoxels
-            data = {"X": [], "Y": []}
-            for voxel in self.electrovoxels:
-                data["X"].append(voxel[0])
-                data["Y"].append(voxel[1])
-            
-            df = pd.DataFrame(data)
+            df = pd.DataFrame(list(self.electrovoxels), columns=["X", "Y"])
 
             # Construire le nom du fichier avec le nombre d'électrovoxels
             filename = f"forme/{shape_name}_{len(self.electrovoxels)}_electrovoxels.csv"
@@ -159,28 +260,36 @@ class ElectroVoxelApp:
         # Ouvrir une boîte de dialogue pour sélectionner un fichier
         filename = fd.askopenfilename(title="Ouvrir un fichier", filetypes=[("CSV Files", "*.csv")])
         if filename:
-            # Lire le fichier CSV
-            df = pd.read_csv(filename)
+            # Lire le fichier CSV, toutes les coordonnées d'un coup
+            cells = pd.read_csv(filename, usecols=["X", "Y"]).to_numpy(dtype=int).tolist()
 
             # Effacer le canevas actuel
             self.clear_grid()
 
-            # Dessiner les électrovoxels à partir du fichier
-            for _, row in df.iterrows():
-                self.add_electrovoxel(row['X'], row['Y'])
+            # Dessiner les électrovoxels à partir du fichier, la connexité est calculée une seule fois
+            self.add_electrovoxels(cells)
 
             # Mise à jour du compteur et de l'information d'unité
             self.update_electrovoxel_count()
             self.update_unity_info()
 
-    def add_electrovoxel(self, x, y):
+    def _draw_voxel(self, x, y):
         # Coordonnées pour dessiner l'électrovoxel
         x1, y1 = x * self.voxel_size, y * self.voxel_size
         x2, y2 = x1 + self.voxel_size, y1 + self.voxel_size
+        return self.canvas.create_rectangle(x1, y1, x2, y2, fill="blue", outline="", tags="voxel")
 
+    def add_electrovoxel(self, x, y):
         # Dessiner l'électrovoxel
-        voxel_id = self.canvas.create_rectangle(x1, y1, x2, y2, fill="blue", outline="")
-        self.electrovoxels[(x, y)] = voxel_id
+        self.electrovoxels[(x, y)] = self._draw_voxel(x, y)
+        self.connectivity.add((x, y))
+
+    def add_electrovoxels(self, cells):
+        # Ajout groupé, sans doublons
+        for x, y in cells:
+            if (x, y) not in self.electrovoxels:
+                self.electrovoxels[(x, y)] = self._draw_voxel(x, y)
+        self.connectivity.rebuild(list(self.electrovoxels))
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1 +1,21 @@
-from electrovoxel.electrovoxel_2D import ElectroVoxelenv
\ No newline at end of file
+"""ElectroVoxel environments.
+
+The environments are imported on first access, so that modules of the package that don't
+need them (e.g. electrovoxel.env_client) can be used without gym, pandas or pygame.
+"""
+import importlib
+
+_ENVIRONMENTS = {
+    "ElectroVoxelenv": "electrovoxel.electrovoxel_2D",
+    "ElectroVoxel3Denv": "electrovoxel.electrovoxel_3D",
+}
+
+__all__ = list(_ENVIRONMENTS)
+
+
+def __getattr__(name):
+    if name in _ENVIRONMENTS:
+        value = getattr(importlib.import_module(_ENVIRONMENTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,167 @@
+"""Distance between a swarm and its target shape through an optimal assignment of the cells.
+
+The distance is the minimal total Manhattan distance between the electrovoxels and the
+target cells, each target cell receiving one electrovoxel, over the translations of the
+target (searched locally, see ShapeDistance). Unlike the similarity of neighborhood codes,
+it tells how far the swarm is from the target, and not only whether local patterns match.
+
+Assignments are solved with a vectorized auction algorithm (all unassigned electrovoxels
+bid at once). The prices of a solve are kept per translation and reused after a move: only
+the bids made invalid by the move are redone, which is much cheaper than solving again.
+"""
+import numpy as np
+
+
+def auction(benefit, prices=None, assigned=None):
+    """Maximal-benefit assignment of N persons to N objects with the auction algorithm
+
+    Args:
+        benefit: (N, N) integer benefits of giving object j to person i
+        prices: (N,) prices of a previous solve to warm start from (modified in place), None to start cold
+        assigned: (N,) objects of a previous solve, -1 for none, used with `prices`
+
+    Returns:
+        assigned (N,) objects and prices (N,). With integer benefits, the assignment is optimal.
+    """
+    benefit = np.asarray(benefit, dtype=np.float64)
+    n = len(benefit)
+    if n <= 1:
+        return np.zeros(n, dtype=np.int64), np.zeros(n)
+    final = 1.0 / (n + 1)  # below 1 / n: optimal for integer benefits
+    if prices is None:
+        prices = np.zeros(n)
+        assigned = np.full(n, -1, dtype=np.int64)
+        epsilon = max(np.ptp(benefit) / 4, final)  # epsilon scaling
+    else:
+        assigned = np.full(n, -1, dtype=np.int64) if assigned is None else assigned.copy()
+        epsilon = final
+
+    rows = np.arange(n)
+    while True:
+        # Keep the assignments satisfying epsilon complementary slackness
+        mine = assigned >= 0
+        values = benefit - prices
+        slack = values.max(axis=1) - values[rows, np.maximum(assigned, 0)]
+        assigned[mine & (slack > epsilon)] = -1
+        owner = np.full(n, -1, dtype=np.int64)
+        owner[assigned[assigned >= 0]] = rows[assigned >= 0]
+
+        unassigned = np.flatnonzero(assigned < 0)
+        while len(unassigned):
+            values = benefit[unassigned] - prices
+            local = np.arange(len(unassigned))
+            best = values.argmax(axis=1)
+            first = values[local, best]
+            values[local, best] = -np.inf
+            second = values.max(axis=1)
+            bids = prices[best] + (first - second) + epsilon
+            # Highest bid of each object
+            order = np.lexsort((bids, best))
+            objects = best[order]
+            last = np.concatenate((objects[1:] != objects[:-1], [True]))
+            objects, persons, bids = objects[last], unassigned[order[last]], bids[order[last]]
+            previous = owner[objects]
+            assigned[previous[previous >= 0]] = -1
+            owner[objects] = persons
+            assigned[persons] = objects
+            prices[objects] = bids
+            unassigned = np.flatnonzero(assigned < 0)
+
+        if epsilon <= final:
+            return assigned, prices
+        epsilon = max(epsilon / 5, final)
+        assigned[:] = -1
+
+
+class ShapeDistance:
+    """Assignment distance between a swarm and a target shape, minimized over translation
+
+    The translation is found by a heuristic local search: starting from the alignment of the
+    medians, the 8 neighboring translations are tried and the search moves to the best one
+    until none is better. It stops at a local minimum, so `distance` is an upper bound of the
+    minimum over all translations, exact for each translation it tried.
+
+    Args:
+        target_positions: (N, 2) target cells
+    """
+
+    def __init__(self, target_positions):
+        self.target = np.asarray(target_positions, dtype=np.int64).reshape(-1, 2)
+        self.positions = None
+        self.distance = None
+        self.translation = None  # (dx, dy) added to the target cells
+        self.assignment = None  # assignment[i]: target cell of electrovoxel i
+        self._solves = {}  # translation -> (version, distance, assigned, prices)
+        self._version = 0  # incremented at each move
+        self.cold_solves = 0
+        self.warm_solves = 0
+
+    def _solve(self, translation):
+        """(distance, assigned) for a translation, warm started from its previous solve when there is one."""
+        previous = self._solves.get(translation)
+        if previous is not None and previous[0] == self._version:
+            return previous[1:3]
+        shifted = self.target + np.asarray(translation, dtype=np.int64)
+        cost = np.abs(self.positions[:, None, :] - shifted[None, :, :]).sum(axis=-1)
+        if previous is None:
+            assigned, prices = auction(-cost)
+            self.cold_solves += 1
+        else:
+            # The assignments broken by the moves are dropped by the auction itself
+            assigned, prices = auction(-cost, previous[3], previous[2])
+            self.warm_solves += 1
+        distance = int(cost[np.arange(len(cost)), assigned].sum())
+        self._solves[translation] = (self._version, distance, assigned, prices)
+        return distance, assigned
+
+    def _search(self, start):
+        """Greedy descent over the 8-neighbor translations from `start`, down to a local minimum."""
+        center = start
+        best = self._solve(center)
+        while True:
+            candidates = [(center[0] + dx, center[1] + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+            solves = [(self._solve(t), t) for t in candidates]
+            solve, t = min(solves, key=lambda s: s[0][0])
+            if solve[0] >= best[0]:
+                break
+            center, best = t, solve
+        self.distance, self.assignment = best[0], best[1]
+        self.translation = center
+        return self.distance
+
+    def reset(self, positions, target_positions=None):
+        """Solve from scratch for a new configuration; returns the distance.
+
+        The positions, and the target when `target_positions` is given, are copied into the
+        buffers of the previous configuration when it has the same size.
+        """
+        if target_positions is not None:
+            target_positions = np.asarray(target_positions).reshape(-1, 2)
+            if target_positions.shape == self.target.shape:
+                self.target[:] = target_positions
+            else:
+                self.target = target_positions.astype(np.int64)
+        positions = np.asarray(positions).reshape(-1, 2)
+        if self.positions is not None and self.positions.shape == positions.shape:
+            self.positions[:] = positions
+        else:
+            self.positions = positions.astype(np.int64)
+        if len(self.positions) != len(self.target):
+            raise ValueError("The swarm and the target must have the same number of cells.")
+        self._solves.clear()
+        if len(self.positions) == 0:
+            self.distance, self.translation, self.assignment = 0, (0, 0), np.zeros(0, dtype=np.int64)
+            return 0
+        start = np.round(np.median(self.positions, axis=0) - np.median(self.target, axis=0)).astype(np.int64)
+        return self._search((int(start[0]), int(start[1])))
+
+    def update(self, index, position):
+        """Distance after the electrovoxel `index` moved to `position`, warm started.
+
+        Solves of translations far from the current one are dropped.
+        """
+        self.positions[index] = position
+        self._version += 1
+        self._solves = {t: s for t, s in self._solves.items()
+                        if abs(t[0] - self.translation[0]) <= 2 and abs(t[1] - self.translation[1]) <= 2}
+        return self._search(self.translation)
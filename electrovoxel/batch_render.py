@@ -0,0 +1,209 @@
+"""Headless offline rendering of electrovoxel episodes into NumPy frame arrays.
+
+Episodes are re-simulated from their start/target shapes and action sequences, and every
+state is rasterized with NumPy (no display, no pygame). Batches of episodes are spread
+over a process pool and written to disk as `.npy` frame stacks or PNG sequences.
+
+Usage:
+    python -m electrovoxel.batch_render <recording directory> <output directory> [--png] [--processes N]
+"""
+import argparse
+import os
+import struct
+import zlib
+from multiprocessing import Pool
+from os import path
+
+import numpy as np
+
+BACKGROUND_COLOR = (255, 255, 255)
+GRID_COLOR = (200, 200, 200)
+TARGET_COLOR = (200, 255, 200)
+EDGE_COLOR = (0, 0, 0)
+VOXEL_COLOR = (255, 255, 255)
+
+# Cell labels of the rasterizer
+EMPTY, TARGET, VOXEL = 0, 1, 2
+
+
+def _cell_templates(cell_px: int):
+    """(3, cell_px, cell_px, 3) images of an empty, target and electrovoxel cell."""
+    templates = np.empty((3, cell_px, cell_px, 3), dtype=np.uint8)
+    templates[EMPTY] = BACKGROUND_COLOR
+    templates[TARGET] = TARGET_COLOR
+    templates[VOXEL] = VOXEL_COLOR
+    for label, edge in ((EMPTY, GRID_COLOR), (TARGET, GRID_COLOR), (VOXEL, EDGE_COLOR)):
+        templates[label, 0, :] = edge
+        templates[label, -1, :] = edge
+        templates[label, :, 0] = edge
+        templates[label, :, -1] = edge
+    return templates
+
+
+def rasterize(positions, target_positions, origin, grid_size, cell_px: int = 8, templates=None):
+    """Draw one state of the swarm
+
+    Args:
+        positions: (N, 2) cells of the electrovoxels
+        target_positions: (M, 2) cells of the target shape, drawn below the electrovoxels
+        origin: cell shown in the top left corner
+        grid_size: number of cells shown (width, height)
+        cell_px: size of a cell in pixels
+        templates: result of `_cell_templates(cell_px)`, computed if None
+
+    Returns:
+        (height, width, 3) uint8 RGB frame
+    """
+    if templates is None:
+        templates = _cell_templates(cell_px)
+    labels = np.zeros((grid_size[1], grid_size[0]), dtype=np.uint8)
+    for cells, label in ((target_positions, TARGET), (positions, VOXEL)):
+        local = np.asarray(cells, dtype=np.int64) - origin
+        inside = (local >= 0).all(axis=1) & (local[:, 0] < grid_size[0]) & (local[:, 1] < grid_size[1])
+        labels[local[inside, 1], local[inside, 0]] = label
+    # (rows, columns, cell_px, cell_px, 3) -> (rows * cell_px, columns * cell_px, 3)
+    frame = templates[labels].transpose(0, 2, 1, 3, 4)
+    return frame.reshape(grid_size[1] * cell_px, grid_size[0] * cell_px, 3)
+
+
+def simulate(initial_shape, target_shape, actions):
+    """Re-simulate an episode headlessly
+
+    Args:
+        initial_shape: (N, 2) start positions
+        target_shape: (N, 2) target positions
+        actions: (T, 2) sequence of (electrovoxel, action)
+
+    Returns:
+        (T + 1, N, 2) positions of the electrovoxels after each step
+    """
+    from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+
+    env = ElectroVoxelenv(initial_shape=initial_shape, target_shape=target_shape)
+    actions = np.asarray(actions, dtype=np.int64).reshape(-1, 2)
+    trajectory = np.empty((len(actions) + 1,) + env.positions.shape, dtype=np.int64)
+    trajectory[0] = env.positions
+    for t, (voxel, action) in enumerate(actions.tolist()):
+        env.inc(voxel, action)
+        trajectory[t + 1] = env.positions
+    return trajectory
+
+
+def render_episode(initial_shape, target_shape, actions, cell_px: int = 8, grid_size=None):
+    """Frames of a whole episode
+
+    Args:
+        initial_shape, target_shape, actions: see `simulate`
+        cell_px: size of a cell in pixels
+        grid_size: number of cells shown, fitted to the episode (plus a margin of one cell) if None
+
+    Returns:
+        (T + 1, height, width, 3) uint8 frames
+    """
+    trajectory = simulate(initial_shape, target_shape, actions)
+    target_positions = np.asarray(target_shape, dtype=np.int64)
+    every_cell = np.concatenate([trajectory.reshape(-1, 2), target_positions])
+    low, high = every_cell.min(axis=0) - 1, every_cell.max(axis=0) + 1
+    if grid_size is None:
+        grid_size = tuple(int(v) for v in high - low + 1)
+        origin = low
+    else:
+        # Center the fixed window on the episode
+        origin = (low + high) // 2 - np.asarray(grid_size) // 2
+
+    templates = _cell_templates(cell_px)
+    frames = np.empty((len(trajectory), grid_size[1] * cell_px, grid_size[0] * cell_px, 3), dtype=np.uint8)
+    for t, positions in enumerate(trajectory):
+        frames[t] = rasterize(positions, target_positions, origin, grid_size, cell_px, templates)
+    return frames
+
+
+def write_png(filename: str, image):
+    """Write an (height, width, 3) uint8 image as a PNG file."""
+    height, width, _ = image.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # filter byte 0 on each row
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 1)))
+        f.write(chunk(b"IEND", b""))
+
+
+def _render_job(job):
+    index, (initial_shape, target_shape, actions), output_dir, image_format, cell_px = job
+    frames = render_episode(initial_shape, target_shape, actions, cell_px=cell_px)
+    if image_format == "npy":
+        filename = path.join(output_dir, f"episode_{index:06d}.npy")
+        np.save(filename, frames)
+        return filename
+    directory = path.join(output_dir, f"episode_{index:06d}")
+    os.makedirs(directory, exist_ok=True)
+    for t, frame in enumerate(frames):
+        write_png(path.join(directory, f"frame_{t:05d}.png"), frame)
+    return directory
+
+
+def render_batch(episodes, output_dir: str, image_format: str = "npy", cell_px: int = 8, processes=None):
+    """Render many episodes in parallel
+
+    Args:
+        episodes: iterable of (initial_shape, target_shape, actions)
+        output_dir: directory of the outputs, created if needed
+        image_format: "npy" for one frame stack per episode, "png" for one image sequence per episode
+        cell_px: size of a cell in pixels
+        processes: size of the process pool, `os.cpu_count()` if None
+
+    Returns:
+        list of the written files (npy) or directories (png), in the order of the episodes
+    """
+    if image_format not in ("npy", "png"):
+        raise ValueError(f"Unknown image format '{image_format}', expected 'npy' or 'png'.")
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = ((i, episode, output_dir, image_format, cell_px) for i, episode in enumerate(episodes))
+    with Pool(processes) as pool:
+        return list(pool.imap(_render_job, jobs, chunksize=8))
+
+
+def episodes_from_log(log, indices=None):
+    """Convert episodes of an `electrovoxel.recording.EpisodeLog` into `render_batch` inputs.
+
+    Raises a ValueError on the episodes recorded with shapes outside the catalog (shape ID -1),
+    which can't be re-simulated from the log.
+    """
+    from electrovoxel.electrovoxel_2D import load_shape, shape_catalog
+
+    catalogs = {}
+    for i in range(len(log)) if indices is None else indices:
+        episode = log.episodes[i]
+        if episode["start_id"] < 0 or episode["target_id"] < 0:
+            raise ValueError(f"Episode {i} does not use shapes from the catalog and can't be rendered.")
+        size = int(episode["size"])
+        catalog = catalogs.setdefault(size, shape_catalog(size))
+        steps = log.steps(i)
+        actions = np.column_stack([steps["voxel"], steps["action"]])
+        yield load_shape(catalog[int(episode["start_id"])]), load_shape(catalog[int(episode["target_id"])]), actions
+
+
+def main():
+    from electrovoxel.recording import EpisodeLog
+
+    parser = argparse.ArgumentParser(description="Render recorded ElectroVoxel episodes offline.")
+    parser.add_argument("directory", help="recording directory")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("--png", action="store_true", help="write PNG sequences instead of .npy frame stacks")
+    parser.add_argument("--cell-px", type=int, default=8, help="size of a cell in pixels")
+    parser.add_argument("--processes", type=int, default=None, help="size of the process pool")
+    args = parser.parse_args()
+
+    log = EpisodeLog(args.directory)
+    outputs = render_batch(episodes_from_log(log), args.output, "png" if args.png else "npy", args.cell_px, args.processes)
+    print(f"{len(outputs)} episodes rendered in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
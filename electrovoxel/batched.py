@@ -0,0 +1,203 @@
+"""Batches of ElectroVoxelenv with different numbers of electrovoxels.
+
+Every env of a batch is padded to the same number of electrovoxels `P`, the padding bucket
+of its largest swarm. The buckets bound the padding of the swarms that fall in the same
+bucket, so the padding stays under a given fraction of the real work only for batches built
+with `make_batches`; mixing sizes of different buckets warns. Observations carry a mask of
+the real electrovoxels, and the action space is flattened as `voxel * 8 + movement` with a
+mask of the legal actions.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+from gym import logger, spaces
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, generate_random_shape, load_shape, shape_catalog
+from electrovoxel.rules import legal_moves_2d
+
+
+def padding_buckets(max_size: int, max_waste: float = 0.25, multiple: int = 8):
+    """Padded sizes such that any size up to `max_size` is padded by at most `max_waste`
+
+    Each bucket is the largest size that still pads the first size above the previous bucket
+    by at most `max_waste`, rounded down to a multiple of `multiple`, or of a smaller step
+    (down to 1) for the small buckets where a multiple of `multiple` would waste too much.
+
+    Args:
+        max_size: largest number of electrovoxels to pad
+        max_waste: maximum fraction of padding, relative to the real size
+        multiple: granularity of the large buckets
+
+    Returns:
+        sorted list of bucket sizes
+    """
+    buckets = [0]
+    while buckets[-1] < max_size:
+        # Largest bucket for which the size buckets[-1] + 1 wastes at most max_waste
+        limit = int(math.floor((buckets[-1] + 1) * (1 + max_waste)))
+        step = max(1, min(multiple, limit - buckets[-1]))
+        buckets.append(limit // step * step)
+    return buckets[1:]
+
+
+def bucket_for(size: int, buckets):
+    """Smallest bucket that can hold `size` electrovoxels."""
+    for bucket in buckets:
+        if bucket >= size:
+            return bucket
+    raise ValueError(f"No padding bucket for {size} electrovoxels, largest is {buckets[-1]}.")
+
+
+def make_batches(sizes, batch_size: int, max_waste: float = 0.25):
+    """Group swarm sizes into batches padded to a common bucket with a bounded waste
+
+    Sizes are sorted and a batch is closed when it is full or when the next size falls in
+    another padding bucket, so every batch is padded to the bucket of its own sizes.
+
+    Returns:
+        list of arrays of indices into `sizes`
+    """
+    sizes = np.asarray(sizes)
+    buckets = padding_buckets(int(sizes.max()), max_waste)
+    batches, current = [], []
+    for i in np.argsort(sizes, kind="stable"):
+        if current and (len(current) == batch_size or bucket_for(sizes[i], buckets) != bucket_for(sizes[current[0]], buckets)):
+            batches.append(np.array(current))
+            current = []
+        current.append(int(i))
+    if current:
+        batches.append(np.array(current))
+    return batches
+
+
+class BatchedElectroVoxelenv:
+    """
+    A batch of ElectroVoxelenv stepped together, each with its own number of electrovoxels.
+
+    ### Action Space
+    One integer per env in `[0, P * 8)`: `voxel * 8 + movement`. Actions on padding
+    electrovoxels move nothing but count as steps toward `max_steps`.
+
+    ### Observation Space
+    Dict of batched arrays:
+    - "codes": (B, P, 3) uint8 packed neighborhoods (see ElectroVoxelenv "packed" mode)
+    - "target_codes": (B, P, 3) uint8 packed sorted neighborhoods of the targets
+    - "voxel_mask": (B, P) bool, True for real electrovoxels
+    - "action_mask": (B, P * 8) bool, True for legal actions
+
+    Envs are reset automatically when they reach their target or after `max_steps` steps;
+    `terminated`/`truncated` report it for the step that ended the episode.
+
+    ### Arguments
+    `sizes`: number of electrovoxels of each env.
+    `max_waste`: maximum fraction of padding used to choose the padding buckets. Every env is
+    padded to the bucket of the largest size, so the bound only holds when all the sizes share
+    a bucket, as in the batches of `make_batches`; a warning is issued otherwise.
+    `max_steps`: length limit of an episode.
+    Shapes come from the shape catalog when it has at least two shapes of the size,
+    from `generate_random_shape` otherwise.
+    """
+
+    def __init__(self, sizes, max_waste: float = 0.25, max_steps: int = 200, seed: Optional[int] = None):
+        self.sizes = [int(n) for n in sizes]
+        self.num_envs = len(self.sizes)
+        self.max_steps = max_steps
+        self.np_random = np.random.default_rng(seed)
+        self.buckets = padding_buckets(max(self.sizes), max_waste)
+        self.padded_size = bucket_for(max(self.sizes), self.buckets)
+        wasteful = sorted({n for n in self.sizes if self.padded_size - n > max_waste * n})
+        if wasteful:
+            logger.warn(
+                "Sizes %s are padded to %d electrovoxels, more than %d%% of padding. "
+                "Group the sizes with make_batches.",
+                wasteful, self.padded_size, round(100 * max_waste),
+            )
+        self.nA = 8
+        self._catalogs = {n: shape_catalog(n) for n in set(self.sizes)}
+
+        self.envs = []
+        for n in self.sizes:
+            initial_shape, target_shape = self._draw_shapes(n)
+            self.envs.append(ElectroVoxelenv(initial_shape=initial_shape, target_shape=target_shape, observation_mode="packed"))
+
+        P, B = self.padded_size, self.num_envs
+        self.codes = np.zeros((B, P, 3), dtype=np.uint8)
+        self.target_codes = np.zeros((B, P, 3), dtype=np.uint8)
+        self.voxel_mask = np.zeros((B, P), dtype=bool)
+        self.action_mask = np.zeros((B, P, self.nA), dtype=bool)
+        self.steps = np.zeros(B, dtype=np.int64)
+        for b, n in enumerate(self.sizes):
+            self.voxel_mask[b, :n] = True
+
+        self.action_space = spaces.MultiDiscrete(np.full(B, P * self.nA))
+        self.observation_space = spaces.Dict({
+            "codes": spaces.Box(0, 255, shape=(B, P, 3), dtype=np.uint8),
+            "target_codes": spaces.Box(0, 255, shape=(B, P, 3), dtype=np.uint8),
+            "voxel_mask": spaces.MultiBinary((B, P)),
+            "action_mask": spaces.MultiBinary((B, P * self.nA)),
+        })
+
+    def _draw_shapes(self, n):
+        catalog = self._catalogs[n]
+        if len(catalog) >= 2:
+            first, second = self.np_random.choice(len(catalog), size=2, replace=False)
+            return load_shape(catalog[first]), load_shape(catalog[second])
+        return generate_random_shape(n, self.np_random), generate_random_shape(n, self.np_random)
+
+    def _reset_env(self, b):
+        env = self.envs[b]
+        initial_shape, target_shape = self._draw_shapes(self.sizes[b])
+        env.reset(options={"initial_shape": initial_shape, "target_shape": target_shape})
+        n = self.sizes[b]
+        self.target_codes[b, :n] = env.target_codes.view(np.uint8).reshape(-1, 4)[:, :3]
+        self.steps[b] = 0
+        self._update(b)
+
+    def _update(self, b):
+        env, n = self.envs[b], self.sizes[b]
+        self.codes[b, :n] = env._packed_view
+        self.action_mask[b, :n] = legal_moves_2d(env.codes)
+
+    def _observation(self):
+        return {
+            "codes": self.codes,
+            "target_codes": self.target_codes,
+            "voxel_mask": self.voxel_mask,
+            "action_mask": self.action_mask.reshape(self.num_envs, -1),
+        }
+
+    def reset(self, *, seed: Optional[int] = None):
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        for b in range(self.num_envs):
+            self._reset_env(b)
+        return self._observation(), {}
+
+    def step(self, actions):
+        """Step every env
+
+        Args:
+            actions: (B,) flat actions `voxel * 8 + movement`
+
+        Returns:
+            observation, rewards (B,), terminated (B,), truncated (B,), info dict with "moved" (B,)
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        voxels, moves = np.divmod(actions, self.nA)
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        moved = np.zeros(self.num_envs, dtype=bool)
+        for b, env in enumerate(self.envs):
+            self.steps[b] += 1
+            if voxels[b] < self.sizes[b]:
+                _, rewards[b], terminated[b], _, info = env.step((voxels[b], moves[b]))
+                moved[b] = info["moved"]
+            # else padding electrovoxel: nothing moves, but the step counts toward truncation
+            truncated[b] = not terminated[b] and self.steps[b] >= self.max_steps
+            if terminated[b] or truncated[b]:
+                self._reset_env(b)
+            elif moved[b]:
+                self._update(b)
+        return self._observation(), rewards, terminated, truncated, {"moved": moved}
@@ -0,0 +1,298 @@
+"""Expert demonstrations for imitation learning, generated in a process pool.
+
+Each demonstration is a (start, target) pair, taken from the shape directory or grown at
+random, solved by a constructive solver, then replayed through `ElectroVoxelenv.step` to
+check that the moves are legal and reach the target. The (observation, action) pairs of the
+replay are written to compressed shards:
+
+    <directory>/shard_000000.npz, shard_000001.npz, ...
+
+Each shard holds `episodes_per_shard` solved pairs drawn from its own seed, so shards are
+independent: a run stopped at any time is resumed by generating the shards that are not on
+disk yet. Shards are written by the main process with a bounded number of shards in flight
+in the pool, so memory stays bounded however fast the workers are.
+
+Usage:
+    python -m electrovoxel.demonstrations <directory> --shards S [--episodes-per-shard E] [--size N] [--processes P]
+"""
+import argparse
+import os
+import re
+import time
+from collections import deque
+from multiprocessing import Pool
+from os import path
+from typing import Optional
+
+import numpy as np
+
+from electrovoxel.assignment import ShapeDistance
+from electrovoxel.distance_field import DistanceField
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, generate_random_shape, load_shape, shape_catalog
+from electrovoxel.reachability import ReachabilityCache
+
+SHARD_FORMAT = "shard_{:06d}.npz"
+SHARD_REGEX = re.compile(r"shard_(\d{6})\.npz$")
+DEMONSTRATION_MODES = ("neighborhood", "packed", "image", "coords")
+
+
+def candidate_translations(initial, target, count: int = 4):
+    """Translations of the target worth solving for: the one of the optimal assignment, then the ones
+    with the largest overlap with the initial shape (fewest electrovoxels to move).
+
+    Returns:
+        list of (dx, dy), without repetitions
+    """
+    initial = np.asarray(initial, dtype=np.int64)
+    target = np.asarray(target, dtype=np.int64)
+    shape_distance = ShapeDistance(target)
+    shape_distance.reset(initial)
+    translations = [tuple(int(t) for t in shape_distance.translation)]
+    offsets = (initial[:, None, :] - target[None, :, :]).reshape(-1, 2)
+    offsets, overlap = np.unique(offsets, axis=0, return_counts=True)
+    for k in np.argsort(-overlap, kind="stable"):
+        translation = (int(offsets[k, 0]), int(offsets[k, 1]))
+        if translation not in translations:
+            translations.append(translation)
+        if len(translations) >= count:
+            break
+    return translations
+
+
+def _fill_target(env, cells, max_moves):
+    """Greedy construction of the target cells `cells`, the farthest misplaced electrovoxel first
+
+    Returns:
+        list of (electrovoxel, movement), or None if stuck or over `max_moves`
+    """
+    field = DistanceField(cells)
+    cells = [(int(x), int(y)) for x, y in cells]
+    wanted = set(cells)
+    reachability = ReachabilityCache.for_env(env)
+    actions = []
+    while True:
+        missing = [cell for cell in cells if not env.grid.get(*cell)]
+        if not missing:
+            return actions
+        positions = env.positions.tolist()
+        misplaced = [i for i, cell in enumerate(positions) if tuple(cell) not in wanted]
+        misplaced.sort(key=lambda i: -field.distance(*positions[i]))
+        move = None
+        for i in misplaced:
+            paths = [p for p in (reachability.path(i, cell) for cell in missing) if p is not None]
+            if paths:
+                move = (i, min(paths, key=len))
+                break
+        if move is None or len(actions) + len(move[1]) > max_moves:
+            return None
+        i, path = move
+        for a in path:
+            if not env.inc(i, a):
+                return None
+            actions.append((i, a))
+
+
+def solve(initial, target, max_moves: int = 1000, translations: int = 4):
+    """Constructive solver: moves the misplaced electrovoxels one at a time along the surface of the
+    swarm onto the missing cells of a translation of the target
+
+    Args:
+        initial: (N, 2) initial positions
+        target: (N, 2) target positions
+        max_moves: maximal number of primitive movements
+        translations: number of translations of the target tried, see `candidate_translations`
+
+    Returns:
+        (M, 2) int64 array of (electrovoxel, movement), or None if no solution was found
+    """
+    initial = np.asarray(initial, dtype=np.int64)
+    target = np.asarray(target, dtype=np.int64)
+    env = ElectroVoxelenv(initial_shape=initial, target_shape=target, observation_mode="coords")
+    for translation in candidate_translations(initial, target, translations):
+        env.reset(options={"initial_shape": initial, "target_shape": target})
+        actions = _fill_target(env, target + np.asarray(translation), max_moves)
+        if actions is not None:
+            return np.array(actions, dtype=np.int64).reshape(-1, 2)
+    return None
+
+
+def replay_solution(initial, target, actions, observation_mode: str = "packed"):
+    """Replay a solution through `ElectroVoxelenv.step`
+
+    Args:
+        initial, target: (N, 2) positions
+        actions: (M, 2) array of (electrovoxel, movement)
+        observation_mode: observation encoding of the env
+
+    Returns:
+        (observations, actions) of the steps up to the end of the episode, the observation being the
+        one seen before the action, or None if a move fails or the target is not reached
+    """
+    env = ElectroVoxelenv(initial_shape=initial, target_shape=target, observation_mode=observation_mode)
+    observation, _ = env.reset()
+    observations = []
+    for k, (i, a) in enumerate(np.asarray(actions).tolist()):
+        observations.append(np.array(observation, copy=True))
+        observation, _, terminated, _, info = env.step((i, a))
+        if not info["moved"]:
+            return None
+        if terminated:
+            return np.stack(observations), np.asarray(actions[:k + 1])
+    return None
+
+
+def sample_pair(size: int, np_random: np.random.Generator, random_fraction: float = 0.5):
+    """(initial, target, shape IDs) of a random pair, from the shape directory or grown by
+    `generate_random_shape` (shape IDs -1) with probability `random_fraction`."""
+    catalog = shape_catalog(size)
+    if len(catalog) < 2 or np_random.random() < random_fraction:
+        return generate_random_shape(size, np_random), generate_random_shape(size, np_random), (-1, -1)
+    start, target = np_random.choice(len(catalog), 2, replace=False)
+    return load_shape(catalog[start]), load_shape(catalog[target]), (int(start), int(target))
+
+
+def generate_shard(shard: int, size: int = 9, episodes: int = 64, seed: int = 0, random_fraction: float = 0.5,
+                   observation_mode: str = "packed", max_moves: int = 1000, max_attempts: int = 8):
+    """Demonstrations of one shard, deterministic in (`seed`, `shard`)
+
+    Args:
+        shard: index of the shard
+        size: number of electrovoxels
+        episodes: number of solved pairs
+        seed: seed of the run
+        random_fraction: fraction of randomly grown shapes, see `sample_pair`
+        observation_mode: observation encoding stored with the actions
+        max_moves: maximal length of a solution
+        max_attempts: pairs drawn per episode before giving up on the shard
+
+    Returns:
+        dict of the arrays of the shard, see `write_shard`
+    """
+    np_random = np.random.default_rng([seed, shard])
+    observations, actions, lengths, initials, targets, shape_ids = [], [], [], [], [], []
+    rejected = 0
+    for _ in range(episodes * max_attempts):
+        if len(lengths) == episodes:
+            break
+        initial, target, ids = sample_pair(size, np_random, random_fraction)
+        solution = solve(initial, target, max_moves)
+        demonstration = None if solution is None else replay_solution(initial, target, solution, observation_mode)
+        if demonstration is None or len(demonstration[1]) == 0:
+            # Unsolved, or already matching the target
+            rejected += 1
+            continue
+        observations.append(demonstration[0])
+        actions.append(demonstration[1])
+        lengths.append(len(demonstration[1]))
+        initials.append(initial)
+        targets.append(target)
+        shape_ids.append(ids)
+    if not lengths:
+        raise RuntimeError(f"No pair of shard {shard} could be solved.")
+    return {
+        "observations": np.concatenate(observations),
+        "actions": np.concatenate(actions).astype(np.uint32),
+        "episode_lengths": np.array(lengths, dtype=np.uint32),
+        "initial": np.array(initials, dtype=np.int64),
+        "target": np.array(targets, dtype=np.int64),
+        "shape_ids": np.array(shape_ids, dtype=np.int32),
+        "rejected": np.array(rejected, dtype=np.uint32),
+    }
+
+
+def _generate_shard(args):
+    shard, kwargs = args
+    return shard, generate_shard(shard, **kwargs)
+
+
+def write_shard(directory: str, shard: int, arrays):
+    """Write a shard atomically: it is either complete on disk or absent.
+
+    The arrays are "observations" (M, ...) and "actions" (M, 2) of (electrovoxel, movement),
+    the steps of the episodes one after the other, "episode_lengths" (E,), and the "initial"
+    and "target" (E, N, 2) positions and "shape_ids" (E, 2) of the episodes.
+    """
+    filename = path.join(directory, SHARD_FORMAT.format(shard))
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(temporary, filename)
+
+
+def finished_shards(directory: str):
+    """Indices of the shards already written in `directory`."""
+    if not path.isdir(directory):
+        return set()
+    return {int(m.group(1)) for m in map(SHARD_REGEX.match, os.listdir(directory)) if m}
+
+
+def load_shard(filename: str):
+    """Arrays of a shard file, see `write_shard`."""
+    with np.load(filename) as data:
+        return {key: data[key] for key in data.files}
+
+
+def generate(directory: str, shards: int, processes: Optional[int] = None, max_pending: Optional[int] = None,
+             verbose: bool = False, **kwargs):
+    """Generate the missing shards 0 .. `shards` - 1 of `directory` in a process pool
+
+    Args:
+        directory: output directory, created if needed
+        shards: total number of shards
+        processes: size of the process pool, the number of CPUs if None
+        max_pending: shards in flight in the pool (back-pressure), twice the pool size if None
+        verbose: print a line per written shard
+        kwargs: arguments of `generate_shard`
+
+    Returns:
+        dict with the numbers of "shards", "episodes" and "steps" written, and of "rejected" pairs
+    """
+    observation_mode = kwargs.get("observation_mode", "packed")
+    if observation_mode not in DEMONSTRATION_MODES:
+        raise ValueError(f"Unsupported observation mode '{observation_mode}', expected one of {DEMONSTRATION_MODES}.")
+    os.makedirs(directory, exist_ok=True)
+    todo = [shard for shard in range(shards) if shard not in finished_shards(directory)]
+    stats = {"shards": 0, "episodes": 0, "steps": 0, "rejected": 0}
+    start = time.perf_counter()
+    processes = processes or os.cpu_count() or 1
+    max_pending = max_pending or 2 * processes
+    with Pool(processes) as pool:
+        pending = deque()
+        todo = deque(todo)
+        while todo or pending:
+            while todo and len(pending) < max_pending:
+                pending.append(pool.apply_async(_generate_shard, ((todo.popleft(), kwargs),)))
+            shard, arrays = pending.popleft().get()
+            write_shard(directory, shard, arrays)
+            stats["shards"] += 1
+            stats["episodes"] += len(arrays["episode_lengths"])
+            stats["steps"] += len(arrays["actions"])
+            stats["rejected"] += int(arrays["rejected"])
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"shard {shard}: {len(arrays['episode_lengths'])} episodes, {len(arrays['actions'])} steps "
+                      f"({stats['steps'] / elapsed:.0f} steps/s overall)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate verified expert demonstrations into compressed shards.")
+    parser.add_argument("directory", help="output directory, the shards already in it are kept")
+    parser.add_argument("--shards", type=int, required=True, help="total number of shards")
+    parser.add_argument("--episodes-per-shard", type=int, default=64)
+    parser.add_argument("--size", type=int, default=9, help="number of electrovoxels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--random-fraction", type=float, default=0.5, help="fraction of randomly grown shapes")
+    parser.add_argument("--observation-mode", default="packed", choices=DEMONSTRATION_MODES)
+    parser.add_argument("--max-moves", type=int, default=1000, help="maximal length of a solution")
+    parser.add_argument("--processes", type=int, default=None, help="size of the process pool")
+    args = parser.parse_args()
+
+    stats = generate(args.directory, args.shards, args.processes, verbose=True, size=args.size,
+                     episodes=args.episodes_per_shard, seed=args.seed, random_fraction=args.random_fraction,
+                     observation_mode=args.observation_mode, max_moves=args.max_moves)
+    print(f"{stats['shards']} shards written: {stats['episodes']} episodes, {stats['steps']} steps, {stats['rejected']} pairs rejected")
+
+
+if __name__ == "__main__":
+    main()
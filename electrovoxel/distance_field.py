@@ -0,0 +1,135 @@
+"""Distance fields of target shapes for potential-based reward shaping.
+
+The distance field of a target gives, for every cell, its BFS distance (4-connected, on
+the empty grid) to the nearest target cell. It is stored densely over the bounding box of
+the target; outside of it the distance is the one of the nearest cell of the box plus the
+distance to the box, which is exact for this metric. The potential of a configuration is
+minus the sum of the distances of its electrovoxels, a gather over their positions, and a
+move changes it by the difference of two values of the field.
+
+Fields are computed once per target and kept in a process-wide LRU cache, so all the envs
+of a process working on the same target share one field.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class DistanceField:
+    """BFS distances to the nearest cell of a target shape
+
+    Args:
+        target_positions: (N, 2) target cells
+    """
+
+    def __init__(self, target_positions):
+        target = np.asarray(target_positions, dtype=np.int64).reshape(-1, 2)
+        if len(target) == 0:
+            raise ValueError("The target shape is empty.")
+        self.origin = target.min(axis=0)
+        self.limit = target.max(axis=0) - self.origin  # last cell of the box, in local coordinates
+        width, height = self.limit + 1
+        # Multi-source BFS by wavefront, each wave a vectorized dilation of the previous one
+        field = np.full((height, width), -1, dtype=np.int32)
+        local = target - self.origin
+        field[local[:, 1], local[:, 0]] = 0
+        frontier = np.zeros((height, width), dtype=bool)
+        frontier[local[:, 1], local[:, 0]] = True
+        distance = 0
+        while frontier.any():
+            distance += 1
+            grown = np.zeros_like(frontier)
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            frontier = grown & (field < 0)
+            field[frontier] = distance
+        self.field = field
+        # Plain Python copies for the single-cell lookups of `distance`
+        self._x0, self._y0 = int(self.origin[0]), int(self.origin[1])
+        self._xmax, self._ymax = int(self.limit[0]), int(self.limit[1])
+        self._rows = field.tolist()
+
+    @property
+    def nbytes(self):
+        return self.field.nbytes
+
+    def distances(self, positions):
+        """Distance to the target of each of the (..., 2) positions."""
+        local = np.asarray(positions, dtype=np.int64) - self.origin
+        inside = np.clip(local, 0, self.limit)
+        return self.field[inside[..., 1], inside[..., 0]] + np.abs(local - inside).sum(axis=-1)
+
+    def potential(self, positions):
+        """Minus the total distance of the electrovoxels to the target."""
+        return -int(self.distances(positions).sum())
+
+    def distance(self, x: int, y: int) -> int:
+        """Distance to the target of one cell, without array operations."""
+        lx, ly = x - self._x0, y - self._y0
+        cx, cy = min(max(lx, 0), self._xmax), min(max(ly, 0), self._ymax)
+        return self._rows[cy][cx] + abs(lx - cx) + abs(ly - cy)
+
+    def delta(self, old, new):
+        """Change of the potential when an electrovoxel moves from `old` to `new`, in O(1)."""
+        return self.distance(old[0], old[1]) - self.distance(new[0], new[1])
+
+
+class FieldCache:
+    """Thread-safe LRU cache of distance fields
+
+    Args:
+        max_fields: number of fields kept
+    """
+
+    def __init__(self, max_fields: int = 256):
+        self.max_fields = max_fields
+        self._fields = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fields)
+
+    def get(self, key, target_positions):
+        """Field of a target, computed on the first request for `key`."""
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None:
+                self._fields.move_to_end(key)
+                self.hits += 1
+                return field
+        field = DistanceField(target_positions)
+        with self._lock:
+            self.misses += 1
+            self._fields[key] = field
+            self._fields.move_to_end(key)
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+        return field
+
+    def clear(self):
+        with self._lock:
+            self._fields.clear()
+
+
+FIELD_CACHE = FieldCache()
+
+
+def distance_field(target_positions, target_id: int = -1):
+    """Shared distance field of a target shape
+
+    Args:
+        target_positions: (N, 2) target cells
+        target_id: shape ID of the target in `shape_catalog(N)`, -1 for other targets, which
+            are then keyed by their cells
+    """
+    target_positions = np.asarray(target_positions, dtype=np.int64).reshape(-1, 2)
+    if target_id >= 0:
+        key = ("shape", len(target_positions), target_id)
+    else:
+        key = ("cells", target_positions.tobytes())
+    return FIELD_CACHE.get(key, target_positions)
@@ -1,5 +1,29 @@
 import pygame
 
+from electrovoxel.trace import REASON_BLOCKED, REASON_NO_BASE, REASON_NO_SUPPORT, REASON_OK, REASON_TWO_BASES
+
+FILL_COLORS = {"white": (255, 255, 255), "red": (255, 0, 0), "green": (0, 255, 0)}
+
+
+def draw_voxel(screen, x, y, color="white", size=40):
+    """Dessine un électrovoxel de `size` pixels de côté dont le coin haut gauche est au pixel (x, y)."""
+    # Définissez la couleur des coins et des arrêtes
+    edge_color = (0, 0, 0)  # Noir pour les arrêtes
+    corner_color = (0, 0, 128)  # Bleu foncé pour les coins
+
+    # Dessinez le cube (un rectangle dans ce cas)
+    pygame.draw.rect(screen, edge_color, (x, y, size, size))
+
+    # Dessinez les coins du cube
+    corner_radius = max(1, size // 8)  # Rayon pour les coins, 5 pixels pour une cellule de 40
+    for corner in ((x, y), (x + size, y), (x, y + size), (x + size, y + size)):
+        pygame.draw.circle(screen, corner_color, corner, corner_radius)
+
+    # On dessine d'abord un rectangle plein puis les arrêtes
+    pygame.draw.rect(screen, FILL_COLORS[color], (x+1, y+1, size-2, size-2))
+    pygame.draw.rect(screen, edge_color, (x, y, size, size), 1)
+
+
 class ElectroVoxel:
     def __init__(self, x, y, charge, size, color):
         self.x = x
@@ -9,6 +33,8 @@ class ElectroVoxel:
         # Initialisez self.state avec des tuples pour chaque position relative
         self.state = {(dx, dy): False for dy in range(-2, 3) for dx in range(-2, 3) if (dx, dy) != (0, 0)}
         self.color = color
+        # Raison du dernier refus de mouvement (REASON_* de electrovoxel.trace)
+        self.reason = REASON_OK
 
 
     def update(self, connections):
@@ -19,38 +45,9 @@ class ElectroVoxel:
 
 
 
-    def draw(self, screen):
-        # Définissez la couleur des coins et des arrêtes
-        edge_color = (0, 0, 0)  # Noir pour les arrêtes
-        corner_color = (0, 0, 128)  # Bleu foncé pour les coins
-
-        # Calculez les coordonnées des coins du cube dans la case
-        top_left = (self.x, self.y)
-        top_right = (self.x + 40, self.y)
-        bottom_left = (self.x, self.y + 40)
-        bottom_right = (self.x + 40, self.y + 40)
-
-        # Dessinez le cube (un rectangle dans ce cas)
-        pygame.draw.rect(screen, edge_color, (self.x, self.y, 40, 40))
-
-        # Dessinez les coins du cube
-        corner_radius = 5  # Rayon pour les coins
-        pygame.draw.circle(screen, corner_color, top_left, corner_radius)
-        pygame.draw.circle(screen, corner_color, top_right, corner_radius)
-        pygame.draw.circle(screen, corner_color, bottom_left, corner_radius)
-        pygame.draw.circle(screen, corner_color, bottom_right, corner_radius)
-
-        # Pour une meilleure esthétique, vous pourriez vouloir remplir le cube avec une certaine couleur
-        # et puis dessiner les arrêtes par-dessus.
-        # Pour cela, on dessine d'abord un rectangle plein puis les arrêtes.
-        if self.color == "white":
-            fill_color = (255,255,255)
-        elif self.color == "red":
-            fill_color = (255,0,0)
-        elif self.color == "green":
-            fill_color = (0,255,0)
-        pygame.draw.rect(screen, fill_color, (self.x+1, self.y+1, 40-2, 40-2))
-        pygame.draw.rect(screen, edge_color, (self.x, self.y, 40, 40), 1)
+    def draw(self, screen, offset=(0, 0)):
+        # Position à l'écran (décalage de la vue)
+        draw_voxel(screen, self.x + offset[0], self.y + offset[1], self.color, self.size)
 
     def pivot(self, Axes):
         # regarde le mouvement est possible
@@ -58,7 +55,6 @@ class ElectroVoxel:
 
         result = self._can_pivot(Axes)
         if result:
-            print(f"Le pivot vers {Axes} est possible.")
             if Axes == 'up':
                 self.y=self.y-self.size
                 self.x=self.x+(result[0]*self.size+result[1]*self.size)
@@ -77,7 +73,6 @@ class ElectroVoxel:
             return True
 
         else:
-            print(f"Le pivot vers {Axes} n'est pas possible.")
             return False
 
     def _can_pivot(self, direction):
@@ -100,19 +95,21 @@ class ElectroVoxel:
             if self.state.get(axis):
                 base_axis=axis # Vortex qui est la base du mouvement de pivot
                 vortex_per=vortex_per+1# Un vortex est détecté sur l'axe perpendiculaire, mais pas 2 alors mouvement possible
-        # print(vortex_per)
         if vortex_per == 2 or vortex_per == 0:
+            self.reason = REASON_TWO_BASES if vortex_per == 2 else REASON_NO_BASE
             return False
 
         if direction == 'up':
             if base_axis == (1, 0):
                 for axis in [(-1,0),(-1,-1),(0,-2),(1,-2),(0,-1),(1,-1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
             elif base_axis == (-1, 0):
                 for axis in [(1,0),(1,-1),(0,-2),(-1,-2),(0,-1),(-1,-1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
 
@@ -120,11 +117,13 @@ class ElectroVoxel:
             if base_axis == (1, 0):
                 for axis in [(-1,0),(-1,1),(0,2),(1,2),(0,1),(1,1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
             elif base_axis == (-1, 0):
                 for axis in [(1,0),(1,1),(0,2),(-1,2),(0,1),(-1,1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
 
@@ -132,11 +131,13 @@ class ElectroVoxel:
             if base_axis == (0, 1):
                 for axis in [(0,-1),(-1,-1),(-2,0),(-2,-1),(-1,0),(-1,1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
             elif base_axis == (0, -1):
                 for axis in [(0,1),(-1,1),(-2,0),(-2,1),(-1,0),(-1,-1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
 
@@ -144,13 +145,16 @@ class ElectroVoxel:
             if base_axis == (0, 1):
                 for axis in [(0,-1),(1,-1),(2,0),(2,-1),(1,0),(1,1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
             elif base_axis == (0, -1):
                 for axis in [(0,1),(1,1),(2,0),(2,1),(1,0),(1,-1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
 
+        self.reason = REASON_OK
         return base_axis
 
     def transverse(self, Axes):
@@ -158,7 +162,6 @@ class ElectroVoxel:
         # Vérifiez si le pivot est possible dans une direction donnée
         result = self._can_transverse(Axes)
         if result:
-            print(f"La transverse vers {Axes} est possible.")
             if Axes == 'up':
                 self.y=self.y-self.size
 
@@ -173,7 +176,6 @@ class ElectroVoxel:
 
             return True
         else:
-            print(f"La transverse vers {Axes} n'est pas possible.")
             return False
 
     def _can_transverse(self, direction):
@@ -197,8 +199,8 @@ class ElectroVoxel:
             if self.state.get(axis):
                 base_axis=axis # Vortex qui est la base du mouvement de pivot
                 vortex_per=vortex_per+1# Un vortex est détecté sur l'axe perpendiculaire, mais pas 2 alors mouvement possible
-        print(vortex_per)
         if vortex_per == 2 or vortex_per == 0:
+            self.reason = REASON_TWO_BASES if vortex_per == 2 else REASON_NO_BASE
             return False
 
 
@@ -206,55 +208,72 @@ class ElectroVoxel:
             if base_axis == (1, 0):
                 for axis in [(-1,0),(-1,-1),(0,-1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((1,1)):
+                    self.reason = REASON_OK
                     return base_axis
             elif base_axis == (-1, 0):
                 for axis in [(1,0),(1,-1),(0,-1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((-1,1)):
+                    self.reason = REASON_OK
                     return base_axis
 
         elif direction == 'up':
             if base_axis == (1, 0):
                 for axis in [(-1,0),(-1,1),(0,1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((1,-1)):
+                    self.reason = REASON_OK
                     return base_axis
             elif base_axis == (-1, 0):
                 for axis in [(1,0),(1,1),(0,1)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((-1,-1)):
+                    self.reason = REASON_OK
                     return base_axis
 
         elif direction == 'left':
             if base_axis == (0, 1):
                 for axis in [(0,-1),(-1,-1),(-1,0)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((-1,1)):
+                    self.reason = REASON_OK
                     return base_axis
             elif base_axis == (0, -1):
                 for axis in [(0,1),(-1,1),(-1,0)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((-1,-1)):
+                    self.reason = REASON_OK
                     return base_axis
 
         elif direction == 'right':
             if base_axis == (0, 1):
                 for axis in [(0,-1),(1,-1),(1,0)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((1,1)):
+                    self.reason = REASON_OK
                     return base_axis
             elif base_axis == (0, -1):
                 for axis in [(0,1),(1,1),(1,0)]:
                     if self.state.get(axis):
+                        self.reason = REASON_BLOCKED
                         return False
                 if self.state.get((1,-1)):
+                    self.reason = REASON_OK
                     return base_axis
+        self.reason = REASON_NO_SUPPORT
         return False
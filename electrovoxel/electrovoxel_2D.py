@@ -10,9 +10,16 @@ import numpy as np
 import pandas as pd
 
 from gym import Env, logger, spaces
-from electrovoxel.utils import categorical_sample
+from electrovoxel.utils import categorical_sample, cell_hash, popcount
 from gym.error import DependencyNotInstalled
 from electrovoxel.electrovoxelInit import ElectroVoxel
+from electrovoxel.assignment import ShapeDistance
+from electrovoxel.distance_field import distance_field
+from electrovoxel.graph import NO_EDGE, SwarmGraph
+from electrovoxel.live_render import RenderThread, SnapshotChannel, view_origin
+from electrovoxel.physics import cutoff_offsets, delta_energy, energy
+from electrovoxel.trace import REASON_OCCUPIED, REASON_OK, MoveTrace
+from electrovoxel.grid import ChunkedGrid, NEIGHBOR_OFFSETS, NUM_NEIGHBORS, code_to_connections
 
 LEFT_pivot = 0
 DOWN_pivot = 1
@@ -23,51 +30,125 @@ DOWN_transverse = 5
 RIGHT_transverse = 6
 UP_transverse = 7
 
+OBSERVATION_MODES = ("neighborhood", "packed", "image", "coords", "graph")
 
 
-def initialShape_finalShape(size: int = 9, shape1: str = "None", shape2: str = "None"):
-    """Chose a  random initial shape for electrovoxel and a random final shape to get if the shape1 or shape2 is not NULL
-     
+
+SHAPE_DIRECTORY = path.join(path.dirname(__file__), "shape")
+
+
+def shape_catalog(size: int = 9):
+    """List the shapes of a given size available in the shape directory
 
     Args:
         size: number of electrovoxels shape
-        shape1: path to the initial shape
-        shape2: path to the final shape
 
     Returns:
-        return the positions of each electrovoxel of both shapes
+        sorted list of shape names (without extension), the index of a shape in this list is its shape ID
     """
-    # regex to find filename on the size
     file_name_regex = rf'.+_{size}_electrovoxels\.csv'
+    return sorted(f[:-len(".csv")] for f in os.listdir(SHAPE_DIRECTORY) if re.match(file_name_regex, f))
 
-    # list of file in shape
-    formes_directory = 'electrovoxel/shape/'
-    available_files = [f for f in os.listdir(formes_directory) if re.match(file_name_regex, f)]
+
+def load_shape(name: str):
+    """Return the positions of the electrovoxels of the shape `name` as a (N, 2) array."""
+    return pd.read_csv(path.join(SHAPE_DIRECTORY, name + ".csv")).values
+
+
+def choose_shapes(size: int = 9, shape1: str = "None", shape2: str = "None", np_random: Optional[np.random.Generator] = None, sampler=None):
+    """Chose the names of the initial and final shapes, at random for the ones that are "None"
+
+    Args:
+        size: number of electrovoxels shape
+        shape1: name of the initial shape
+        shape2: name of the final shape
+        np_random: generator used for the random choices, the `random` module if None
+        sampler: optional AliasSampler over `shape_catalog(size)` weighting the random choices
+            (e.g. a curriculum), used instead of a uniform choice. Its draws use `np_random`
+            when given. A ValueError is raised if it gives no weight to the candidate shapes.
+
+    Returns:
+        names of both shapes
+    """
+    available = shape_catalog(size)
+    choice = random.choice if np_random is None else (lambda names: names[np_random.integers(len(names))])
+    if sampler is not None:
+        if sampler.n != len(available):
+            raise ValueError(f"The shape sampler has {sampler.n} weights for {len(available)} shapes of size {size}.")
+
+        def choice(names):
+            # The excluded shapes (the initial shape) temporarily get a zero weight
+            excluded = [i for i, name in enumerate(available) if name not in names]
+            saved = sampler.weights[excluded].copy()
+            if sampler.weights[:sampler.n].sum() - saved.sum() <= 0:
+                raise ValueError("The shape sampler gives no weight to the remaining shapes.")
+            if excluded:
+                sampler.update(excluded, 0.0)
+            try:
+                return available[sampler.sample(np_random=np_random)]
+            finally:
+                if excluded:
+                    sampler.update(excluded, saved)
 
     # random shape if None
     if shape1 == "None":
-        shape1 = random.choice(available_files)
-    else:
-        shape1 += ".csv"
-        if not re.match(file_name_regex, shape1) or shape1 not in available_files:
-            raise ValueError(f"Shape1 '{shape1}' does not match the size {size} or is not available.")
+        shape1 = choice(available)
+    elif shape1 not in available:
+        raise ValueError(f"Shape1 '{shape1}.csv' does not match the size {size} or is not available.")
 
     if shape2 == "None":
-        shape2 = random.choice([f for f in available_files if f != shape1])
-    else:
-        shape2 += ".csv"
-        if not re.match(file_name_regex, shape2) or shape2 not in available_files or shape2 == shape1:
-            raise ValueError(f"Shape2 '{shape2}' does not match the size {size}, is not available, or is the same as Shape1.")
+        shape2 = choice([f for f in available if f != shape1])
+    elif shape2 not in available or shape2 == shape1:
+        raise ValueError(f"Shape2 '{shape2}.csv' does not match the size {size}, is not available, or is the same as Shape1.")
 
-    # Read CSV file for selected shape
-    df_shape1 = pd.read_csv(formes_directory + shape1)
-    df_shape2 = pd.read_csv(formes_directory + shape2)
+    return shape1, shape2
 
-    # Get pos for each shape
-    initial_shape_positions = df_shape1.values
-    final_shape_positions = df_shape2.values
 
-    return initial_shape_positions, final_shape_positions
+def generate_random_shape(size: int = 9, np_random: Optional[np.random.Generator] = None, origin=(5, 5)):
+    """Generate a random connected shape by growing it one electrovoxel at a time
+
+    Args:
+        size: number of electrovoxels shape
+        np_random: random generator, a new unseeded one if None
+        origin: position of the top left corner of the bounding box of the shape
+
+    Returns:
+        (size, 2) array of positions
+    """
+    if np_random is None:
+        np_random = np.random.default_rng()
+    cells = [(0, 0)]
+    occupied = {(0, 0)}
+    frontier = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+    while len(cells) < size:
+        # Pick a random empty cell touching the shape
+        k = np_random.integers(len(frontier))
+        frontier[k], frontier[-1] = frontier[-1], frontier[k]
+        cell = frontier.pop()
+        if cell in occupied:
+            continue
+        cells.append(cell)
+        occupied.add(cell)
+        x, y = cell
+        frontier.extend(c for c in ((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)) if c not in occupied)
+    positions = np.array(cells, dtype=np.int64)
+    return positions - positions.min(axis=0) + np.asarray(origin, dtype=np.int64)
+
+
+def initialShape_finalShape(size: int = 9, shape1: str = "None", shape2: str = "None"):
+    """Chose a  random initial shape for electrovoxel and a random final shape to get if the shape1 or shape2 is not NULL
+     
+
+    Args:
+        size: number of electrovoxels shape
+        shape1: path to the initial shape
+        shape2: path to the final shape
+
+    Returns:
+        return the positions of each electrovoxel of both shapes
+    """
+    shape1, shape2 = choose_shapes(size, shape1, shape2)
+    return load_shape(shape1), load_shape(shape2)
 
 class ElectroVoxelenv(Env):
     """
@@ -82,7 +163,8 @@ class ElectroVoxelenv(Env):
 
 
     ### Action Space
-    The agent takes a 1-element vector for actions. Each action represents a specific kind of movement or transformation applied to the electrovoxels. 
+    The agent takes a 2-element vector for actions: the index of the electrovoxel to move and the movement.
+    Each action represents a specific kind of movement or transformation applied to the electrovoxels. 
     The action space is defined as follows:
 
     - 0: LEFT_PIVOT - Pivot the configuration or selected electrovoxels to the left.
@@ -114,6 +196,19 @@ class ElectroVoxelenv(Env):
         6  0  0  1  1  1  0  0  1  1  1  0  0  1  1  0  0  0  0  0  0  0  0  0  0
         7  0  1  1  1  0  0  1  1  1  0  0  1  1  0  0  0  0  0  0  0  0  0  0  0
         8  1  1  1  0  0  1  1  1  0  0  1  1  0  0  0  0  0  0  0  0  0  0  0  0
+    Encoding of the observations returned by `reset` and `step`, chosen with `observation_mode`:
+    - "neighborhood": MultiBinary(24), the neighborhood of the electrovoxel that moved
+    - "packed": (N, 3) uint8, the 24-bit neighborhood of every electrovoxel packed as with
+      `np.packbits(bits, axis=1, bitorder="little")`
+    - "image": (2, H, W) uint8 over the rendered area, channel 0 the electrovoxels, channel 1 the target
+    - "coords": (N, 2) int64, the position of every electrovoxel
+    - "graph": dict with "x" (N, 24) uint8 node features (unpacked neighborhoods), "edge_index"
+      (2, N * graph_connectivity) int64 COO edges between adjacent electrovoxels
+      (`graph_connectivity` 4 or 8), whose first "num_edges" columns are the edges and the
+      others -1, and "target_x" (N, 24) uint8 features of the target shape. The graph is
+      updated incrementally.
+    The last four are views into the buffers of the environment: they are updated
+    in place by the following steps and must be copied to be kept.
     Exemple of the state of a electrovoxels:
     {(-2, -2): False, (-1, -2): False, (0, -2): False, (1, -2): False, (2, -2): False, (-2, -1): False, 
     (-1, -1): False, (0, -1): False, (1, -1): False, (2, -1): False, (-2, 0): False, (-1, 0): False, 
@@ -131,6 +226,20 @@ class ElectroVoxelenv(Env):
     Actions that lead to an increased alignment with the final_shape are rewarded proportionally. 
     The goal is to encourage the agent to take actions that progressively transform the initial_shape towards the final_shape.
 
+    With `energy_weight` > 0, `energy_weight` times the change of the electrostatic energy of the swarm
+    (Coulomb between the charges of the electrovoxels, truncated at `cutoff` cells, see electrovoxel.physics)
+    is subtracted from the reward.
+
+    With `distance_weight` > 0, `distance_weight` times the change of the assignment distance to the
+    target (total Manhattan distance of an optimal matching of the cells, over the translations of
+    the target, see electrovoxel.assignment) is subtracted from the reward, which rewards moving
+    electrovoxels towards the target even when the neighborhoods do not match yet.
+
+    With `shaping_weight` > 0, the potential-based shaping term `shaping_weight` times the change of
+    minus the total BFS distance of the electrovoxels to the nearest target cell is added to the
+    reward. The distance fields are computed once per target and shared by the envs of the
+    process (see electrovoxel.distance_field).
+
 
     ### Arguments
 
@@ -152,12 +261,24 @@ class ElectroVoxelenv(Env):
         map_name= ["carre_9_electrovoxels","None"]
 
         A random generated map is chose when None is in input by calling the function `generate_random_map`
+
+    `initial_shape`, `target_shape`: arrays of positions used instead of the shape files, `Size` is then
+        the number of positions.
+
+    `render_mode`: "human" draws the swarm in `render()` and waits to keep `render_fps`;
+        "human_async" publishes a snapshot after each move and `render()` only starts a
+        RenderThread drawing the latest one, so stepping never waits for the display
+        (see electrovoxel.live_render).
+
+    `trace_capacity`: when > 0, every movement attempt is recorded in `env.trace`, a MoveTrace ring
+        buffer of that many events with the reason of the rejections (see electrovoxel.trace). An
+        episode of the trace ends at the next `reset`.
         
     ### Version History
     * v0: Initial versions release (1.0.0)
     """
     metadata = {
-        "render_modes": ["human"],# TODO: add ANSI render mode, check  def _render_text(self): in OpenAI gym repository
+        "render_modes": ["human", "human_async"],# TODO: add ANSI render mode, check  def _render_text(self): in OpenAI gym repository
         "render_fps": 4,
     }
     
@@ -165,44 +286,330 @@ class ElectroVoxelenv(Env):
         self,
         render_mode: Optional[str] = None,
         Size=9,
-        map_name=["None","None"]
+        map_name=["None","None"],
+        initial_shape=None,
+        target_shape=None,
+        observation_mode="neighborhood",
+        graph_connectivity=4,
+        energy_weight=0.0,
+        cutoff=3.0,
+        distance_weight=0.0,
+        shaping_weight=0.0,
+        trace_capacity=0,
     ):
-        self.grid_size = (20, 20)
+        if observation_mode not in OBSERVATION_MODES:
+            raise ValueError(f"Unknown observation mode '{observation_mode}', expected one of {OBSERVATION_MODES}.")
+        self.observation_mode = observation_mode
+        self.graph_connectivity = graph_connectivity
+        self.graph = None
+        self.grid_size = (20, 20) # Size of the rendered area, the world itself is unbounded
         self.voxel_size = 40
-        initial_shape, target_shape = initialShape_finalShape(Size,map_name[0],map_name[1])
-        self.voxels = [ElectroVoxel(x * self.voxel_size, y * self.voxel_size, charge=1, size=self.voxel_size, color="white") for x, y in initial_shape]
-        self.voxels_target = [ElectroVoxel(x * self.voxel_size, y * self.voxel_size, charge=1, size=self.voxel_size, color="white") for x, y in target_shape]
-        self.size = Size
+        self.map_name = list(map_name)
+        # Optional AliasSampler over shape_catalog(Size) weighting the random shapes of `reset`
+        self.shape_sampler = None
+        # Optional ShapePairPool of precomputed pairs used by `reset` for random shapes
+        self.shape_pool = None
+
+        # Sparse occupancy grid (voxel index + 1 per cell) and grid positions of each voxel
+        self.grid = ChunkedGrid()
+        # Callables notified with (index, old cell, new cell) after each move, and with index -1
+        # when the swarm is reloaded (caches built on the configuration, see electrovoxel.reachability)
+        self.move_listeners = []
+        # Electrostatic energy of the swarm, kept up to date when it is part of the reward
+        self.energy_weight = energy_weight
+        self.cutoff = cutoff
+        if energy_weight:
+            self._cutoff_offsets = cutoff_offsets(cutoff)
+            self.move_listeners.append(self._update_energy)
+        # Assignment distance to the target, updated from the previous solve after each move
+        self.distance_weight = distance_weight
+        self.shape_distance = None
+        if distance_weight:
+            self.move_listeners.append(self._update_distance)
+        # Potential of the swarm in the distance field of the target, for reward shaping
+        self.shaping_weight = shaping_weight
+        self.distance_field = None
+        if shaping_weight:
+            self.move_listeners.append(self._update_potential)
+        # Trace of the movement attempts, off by default
+        self.trace = MoveTrace(trace_capacity) if trace_capacity else None
+        # Snapshots of the swarm for the render thread of render_mode="human_async"
+        self.snapshots = None
+        self.render_thread = None
+        if render_mode == "human_async":
+            self.snapshots = SnapshotChannel()
+            self.move_listeners.append(self._publish_snapshot)
+        self.fixed_shapes = None if initial_shape is None else (initial_shape, target_shape)
+        if initial_shape is not None:
+            Size = len(initial_shape)
+            self.size = Size
+            self.shape_ids = (-1, -1)
+            self._load_shapes(initial_shape, target_shape)
+        else:
+            shape1, shape2 = choose_shapes(Size, map_name[0], map_name[1])
+            catalog = shape_catalog(Size)
+            self.size = Size
+            self.shape_ids = (catalog.index(shape1), catalog.index(shape2))
+            self._load_shapes(load_shape(shape1), load_shape(shape2))
         
         # Colors for pygames displays
         self.background_color = (255, 255, 255)  # Blanc
         self.grid_color = (200, 200, 200)  # Gris clair
-        self.screen_size = (self.grid_size[0] * self.voxel_size, self.grid_size[1] * self.voxel_size)
         self.render_mode = render_mode
         self.screen_size = (self.grid_size[0] * self.voxel_size, self.grid_size[1] * self.voxel_size)
         self.window_surface = None
         self.clock = None
         
-        # Update each voxel
-        for voxel in self.voxels:
-            connections = self.detect_connections(voxel, self.voxels, self.voxel_size)
-            voxel.update(connections)
-        
         self.num_connections = 24 
         # Variable for RL
-        self.reward_range = (0, 1)
+        # The energy, distance and shaping terms can make the reward negative or larger than 1
+        self.reward_range = (0, 1) if not (energy_weight or distance_weight or shaping_weight) else (-np.inf, np.inf)
         self.nA = 8
-        self.action_space = spaces.Discrete(8)
+        self.action_space = spaces.MultiDiscrete([Size, self.nA])
         self.nS = self.num_connections * self.nA #TODO Maybe juste take the number of colums (24)
         self.P = {s: {a: [] for a in range(self.nA)} for s in range(self.nS)}
-        self.observation_space = spaces.MultiBinary(self.num_connections)
-        
-        
-        
+        if observation_mode == "neighborhood":
+            self.observation_space = spaces.MultiBinary(self.num_connections)
+        elif observation_mode == "packed":
+            self.observation_space = spaces.Box(0, 255, shape=(Size, 3), dtype=np.uint8)
+        elif observation_mode == "image":
+            self.observation_space = spaces.Box(0, 1, shape=(2, self.grid_size[1], self.grid_size[0]), dtype=np.uint8)
+        elif observation_mode == "graph":
+            # edge_index has at most N * graph_connectivity columns, the unused ones hold NO_EDGE (-1)
+            max_edges = Size * graph_connectivity
+            self.observation_space = spaces.Dict({
+                "x": spaces.MultiBinary((Size, self.num_connections)),
+                "edge_index": spaces.Box(NO_EDGE, Size - 1, shape=(2, max_edges), dtype=np.int64),
+                "num_edges": spaces.Discrete(max_edges + 1),
+                "target_x": spaces.MultiBinary((Size, self.num_connections)),
+            })
+        else:
+            bound = np.iinfo(np.int64)
+            self.observation_space = spaces.Box(bound.min, bound.max, shape=(Size, 2), dtype=np.int64)
 
+    def _load_shapes(self, initial_shape, target_shape):
+        """Place the electrovoxels on the initial shape and compute the target codes."""
+        self.voxels = [ElectroVoxel(x * self.voxel_size, y * self.voxel_size, charge=1, size=self.voxel_size, color="white") for x, y in initial_shape]
+        self.voxels_target = [ElectroVoxel(x * self.voxel_size, y * self.voxel_size, charge=1, size=self.voxel_size, color="white") for x, y in target_shape]
+        self.positions = np.array(initial_shape, dtype=np.int64).reshape(-1, 2)
+        self.target_positions = np.array(target_shape, dtype=np.int64).reshape(-1, 2)
+        if len(self.positions) != len(self.target_positions):
+            raise ValueError("Initial and target shapes must have the same number of electrovoxels.")
+
+        self.grid.reset()
+        for i, (x, y) in enumerate(self.positions):
+            self.grid.set(int(x), int(y), i + 1)
+        # Zobrist hash of the occupied cells, updated at each move
+        self.config_hash = int(np.bitwise_xor.reduce(cell_hash(self.positions))) if len(self.positions) else 0
+        for listener in self.move_listeners:
+            listener(-1, None, None)
+
+        # Update each voxel
+        self.codes = np.zeros(len(self.voxels), dtype="<u4")
+        for i, voxel in enumerate(self.voxels):
+            self.codes[i] = self.grid.neighborhood_code(int(self.positions[i, 0]), int(self.positions[i, 1]))
+            voxel.update(code_to_connections(self.codes[i]))
+
+        # Sorted target codes, compared to the sorted current codes to measure the similarity
+        target_grid = ChunkedGrid()
+        for x, y in self.target_positions:
+            target_grid.set(int(x), int(y), 1)
+        self.target_codes = np.sort(np.array([target_grid.neighborhood_code(int(x), int(y)) for x, y in self.target_positions], dtype=np.uint32))
+        self.similarity = self._similarity()
+
+        # Occupancy image of the rendered area, target in the second channel
+        self.image = np.zeros((2, self.grid_size[1], self.grid_size[0]), dtype=np.uint8)
+        self._fill_image()
+
+        # Read-only views returned as observations
+        self._packed_view = self.codes.view(np.uint8).reshape(-1, 4)[:, :3]
+        self._image_view = self.image.view()
+        self._coords_view = self.positions.view()
+        for view in (self._packed_view, self._image_view, self._coords_view):
+            view.flags.writeable = False
+
+        if self.observation_mode == "graph":
+            self.graph = SwarmGraph(self.grid, self.positions, self.codes, self.target_codes, self.graph_connectivity)
+        # Neighborhood bits of the electrovoxels, written in place by _load_pair
+        self._bit_shifts = np.arange(NUM_NEIGHBORS, dtype=np.uint32)
+        self._bits = np.zeros((len(self.positions), NUM_NEIGHBORS), dtype=np.uint32)
+
+    def _fill_image(self):
+        for channel, cells in enumerate((self.positions, self.target_positions)):
+            inside = cells[(cells >= 0).all(axis=1) & (cells[:, 0] < self.grid_size[0]) & (cells[:, 1] < self.grid_size[1])]
+            self.image[channel, inside[:, 1], inside[:, 0]] = 1
+
+    def _load_pair(self, pool, slot):
+        """Place the swarm on a precomputed pair of a ShapePairPool, reusing the buffers of the env."""
+        if len(self.positions) != pool.size:
+            self._load_shapes(pool.initial[slot], pool.target[slot])
+            return
+        # Empty the grid cell by cell, its tiles are kept for the new shape
+        for x, y in self.positions.tolist():
+            self.grid.clear(x, y)
+        self.positions[:] = pool.initial[slot]
+        self.target_positions[:] = pool.target[slot]
+        for voxel, target_voxel, (x, y), (tx, ty) in zip(self.voxels, self.voxels_target, self.positions.tolist(), self.target_positions.tolist()):
+            voxel.x, voxel.y = x * self.voxel_size, y * self.voxel_size
+            target_voxel.x, target_voxel.y = tx * self.voxel_size, ty * self.voxel_size
+
+        for i, (x, y) in enumerate(self.positions.tolist()):
+            self.grid.set(x, y, i + 1)
+        self.config_hash = int(pool.config_hash[slot])
+        for listener in self.move_listeners:
+            listener(-1, None, None)
+
+        self.codes[:] = pool.codes[slot]
+        np.right_shift(self.codes[:, None], self._bit_shifts, out=self._bits)
+        np.bitwise_and(self._bits, 1, out=self._bits)
+        for voxel, row in zip(self.voxels, self._bits.tolist()):
+            state = voxel.state
+            for offset, bit in zip(NEIGHBOR_OFFSETS, row):
+                state[offset] = bit == 1
+        self.target_codes[:] = pool.target_codes[slot]
+        self.similarity = float(pool.similarity[slot])
+        self.image.fill(0)
+        self._fill_image()
+        if self.graph is not None:
+            self.graph.reset(self.codes, self.target_codes)
+
+    def _similarity(self):
+        """Fraction of the neighborhood bits shared by the current and target shapes (1.0 when they match)."""
+        difference = popcount(np.sort(self.codes) ^ self.target_codes).sum()
+        return float(1.0 - difference / (len(self.codes) * NUM_NEIGHBORS))
+
+    def _observation(self, index):
+        """Observation in the encoding chosen by `observation_mode`, `index` is the electrovoxel that moved."""
+        if self.observation_mode == "packed":
+            return self._packed_view
+        elif self.observation_mode == "image":
+            return self._image_view
+        elif self.observation_mode == "coords":
+            return self._coords_view
+        elif self.observation_mode == "graph":
+            return self.graph.observation()
+        return ((self.codes[index] >> np.arange(24, dtype=np.uint32)) & 1).astype(np.int8)
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        """Reset the environment
+
+        Args:
+            seed: seed of the random shape choices
+            options: optional dict with either `map_name` (list of two shape names or "None"),
+                or `initial_shape` and `target_shape` (arrays of positions, their shape IDs are -1).
+                Without options, the shapes given to the constructor are reused, if any, otherwise
+                a pair is taken from `shape_pool` when it is set (not affected by `seed`).
+
+        Returns:
+            observation of the electrovoxel 0 and info dict with the shape IDs
+        """
+        super().reset(seed=seed)
+        if self.trace is not None and self.trace.step:
+            self.trace.end_episode()
+        options = options or {}
+        if "initial_shape" in options:
+            self.shape_ids = (-1, -1)
+            self._load_shapes(options["initial_shape"], options["target_shape"])
+        elif self.fixed_shapes is not None and "map_name" not in options:
+            self._load_shapes(*self.fixed_shapes)
+        elif self.shape_pool is not None and "map_name" not in options:
+            # Precomputed pair, drawn by the pool with its own generator
+            slot = self.shape_pool.take()
+            self.shape_ids = tuple(int(i) for i in self.shape_pool.shape_ids[slot])
+            self._load_pair(self.shape_pool, slot)
+            self.shape_pool.release(slot)
+        else:
+            map_name = options.get("map_name", self.map_name)
+            shape1, shape2 = choose_shapes(self.size, map_name[0], map_name[1], np_random=self.np_random, sampler=self.shape_sampler)
+            catalog = shape_catalog(self.size)
+            self.shape_ids = (catalog.index(shape1), catalog.index(shape2))
+            self._load_shapes(load_shape(shape1), load_shape(shape2))
+        return self._observation(0), {"shape_ids": self.shape_ids}
+
+    def step(self, action):
+        """Move one electrovoxel
+
+        Args:
+            action: (index of the electrovoxel, movement)
+
+        Returns:
+            observation of the moved electrovoxel, reward, terminated, truncated, info
+        """
+        index, a = int(action[0]), int(action[1])
+        moved = self.inc(index, a)
+        reward, terminated = self._reward()
+        return self._observation(index), reward, terminated, False, {"moved": moved}
+
+    def _reward(self):
+        similarity = self._similarity()
+        terminated = bool(similarity == 1.0)
+        reward = 1.0 if terminated else max(0.0, similarity - self.similarity)
+        self.similarity = similarity
+        if self.energy_weight:
+            # Cost of the energy change since the last reward
+            reward -= self.energy_weight * (self.energy - self._rewarded_energy)
+            self._rewarded_energy = self.energy
+        if self.distance_weight:
+            reward -= self.distance_weight * (self.shape_distance.distance - self._rewarded_distance)
+            self._rewarded_distance = self.shape_distance.distance
+        if self.shaping_weight:
+            reward += self.shaping_weight * (self.potential - self._rewarded_potential)
+            self._rewarded_potential = self.potential
+        return reward, terminated
+
+    def _update_energy(self, index, old, new):
+        if index < 0:
+            self.charges = np.array([voxel.charge for voxel in self.voxels], dtype=np.float64)
+            self.energy = energy(self.positions, self.charges, self.cutoff)
+            self._rewarded_energy = self.energy
+        else:
+            self.energy += delta_energy(self.grid, self.charges, index, old, new, self.cutoff, self._cutoff_offsets)
+
+    def _update_distance(self, index, old, new):
+        if index < 0:
+            if self.shape_distance is None:
+                self.shape_distance = ShapeDistance(self.target_positions)
+            self._rewarded_distance = self.shape_distance.reset(self.positions, self.target_positions)
+        else:
+            self.shape_distance.update(index, new)
+
+    def _update_potential(self, index, old, new):
+        if index < 0:
+            self.distance_field = distance_field(self.target_positions, self.shape_ids[1])
+            self.potential = self._rewarded_potential = self.distance_field.potential(self.positions)
+        else:
+            self.potential += self.distance_field.delta(old, new)
+
+    def execute(self, index, actions):
+        """Apply a sequence of movements to one electrovoxel in a single call (macro-action)
+
+        The sequence stops at the first movement that fails or when the target is reached.
+
+        Args:
+            index: index of the electrovoxel
+            actions: sequence of movements
+
+        Returns:
+            observation, sum of the rewards, terminated, truncated, info with the number of
+            primitive movements done in "moves" and whether all of them succeeded in "moved"
+        """
+        total, terminated, moves = 0.0, False, 0
+        for a in actions:
+            if not self.inc(index, int(a)):
+                break
+            moves += 1
+            reward, terminated = self._reward()
+            total += reward
+            if terminated:
+                break
+        return self._observation(index), total, terminated, False, {"moves": moves, "moved": moves == len(actions)}
 
-        
     def detect_connections(self, voxel, voxels, voxel_size):
+        if voxels is self.voxels:
+            # Fast path: 24 lookups in the occupancy grid instead of a scan of the swarm
+            code = self.grid.neighborhood_code(voxel.x // voxel_size, voxel.y // voxel_size)
+            return code_to_connections(code)
+
         # Init connections with all positions at False
         connections = {(dx, dy): False for dy in range(-2, 3) for dx in range(-2, 3) if (dx, dy) != (0, 0)}
 
@@ -271,25 +678,88 @@ class ElectroVoxelenv(Env):
 
         return percentage_difference
         
-    def inc(voxel, a):
+    def inc(self, index, a):
+        """Apply action `a` to the electrovoxel `index` and keep the grid in sync.
+
+        Returns:
+            True if the electrovoxel moved
+        """
+        voxel = self.voxels[index]
+        x, y = int(self.positions[index, 0]), int(self.positions[index, 1])
         if a == LEFT_pivot:
-            voxel.pivot("left")
+            moved = voxel.pivot("left")
         elif a == DOWN_pivot:
-            voxel.pivot("down")
+            moved = voxel.pivot("down")
         elif a == RIGHT_pivot:
-            voxel.pivot("right")
+            moved = voxel.pivot("right")
         elif a == UP_pivot:
-            voxel.pivot("up")
+            moved = voxel.pivot("up")
         elif a == LEFT_transverse:
-            voxel.pivot("left")
+            moved = voxel.transverse("left")
         elif a == DOWN_transverse:
-            voxel.pivot("down")
+            moved = voxel.transverse("down")
         elif a == RIGHT_transverse:
-            voxel.pivot("right")
+            moved = voxel.transverse("right")
         elif a == UP_transverse:
-            voxel.pivot("up")
-                
-                
+            moved = voxel.transverse("up")
+        else:
+            raise ValueError(f"Invalid action {a}.")
+        if not moved:
+            if self.trace is not None:
+                self.trace.record(index, a, False, voxel.reason)
+            return False
+
+        nx, ny = voxel.x // self.voxel_size, voxel.y // self.voxel_size
+        if self.grid.get(nx, ny):
+            # The transverse rules do not check the destination cell, two voxels can't share it
+            voxel.x, voxel.y = x * self.voxel_size, y * self.voxel_size
+            if self.trace is not None:
+                self.trace.record(index, a, False, REASON_OCCUPIED)
+            return False
+        if self.trace is not None:
+            self.trace.record(index, a, True, REASON_OK)
+        self.grid.clear(x, y)
+        self.grid.set(nx, ny, index + 1)
+        self.positions[index] = (nx, ny)
+        for cx, cy, value in ((x, y, 0), (nx, ny, 1)):
+            if 0 <= cx < self.grid_size[0] and 0 <= cy < self.grid_size[1]:
+                self.image[0, cy, cx] = value
+        touched = self._refresh_around(((x, y), (nx, ny)))
+        if self.graph is not None:
+            self.graph.move(index)
+            touched = list(touched)
+            self.graph.update_features(touched, self.codes[touched])
+        self.config_hash ^= int(cell_hash(np.array([x, y]))) ^ int(cell_hash(np.array([nx, ny])))
+        for listener in self.move_listeners:
+            listener(index, (x, y), (nx, ny))
+        return True
+
+    def _refresh_around(self, cells):
+        """Recompute the state of the electrovoxels that can see one of `cells`.
+
+        Returns:
+            set of the indices of these electrovoxels
+        """
+        seen = set()
+        for cx, cy in cells:
+            for dx, dy in NEIGHBOR_OFFSETS + ((0, 0),):
+                i = self.grid.get(cx + dx, cy + dy) - 1
+                if i < 0 or i in seen:
+                    continue
+                seen.add(i)
+                self.codes[i] = self.grid.neighborhood_code(int(self.positions[i, 0]), int(self.positions[i, 1]))
+                self.voxels[i].update(code_to_connections(self.codes[i]))
+        return seen
+
+    def _view_origin(self):
+        """Pixel offset applied when drawing, so that the swarm stays in the rendered area."""
+        return view_origin(self.positions, self.grid_size, self.voxel_size)
+
+    def _publish_snapshot(self, index, old, new):
+        if index < 0:
+            self._snapshot_colors = tuple(voxel.color for voxel in self.voxels)
+        self.snapshots.publish(self.positions, self._snapshot_colors)
+
     def render(self):
         if self.render_mode is None:
             logger.warn(
@@ -299,6 +769,10 @@ class ElectroVoxelenv(Env):
             )
         elif self.render_mode == "ansi":
             return self._render_text()
+        elif self.render_mode == "human_async":
+            if self.render_thread is None:
+                self.render_thread = RenderThread(self.snapshots, self.grid_size, self.voxel_size)
+                self.render_thread.start()
         else:
             return self._render_gui(self.render_mode)
         
@@ -326,8 +800,9 @@ class ElectroVoxelenv(Env):
             for y in range(0, self.screen_size[1], self.voxel_size):
                 pygame.draw.rect(self.window_surface, self.grid_color, (x, y, self.voxel_size, self.voxel_size), 1)
         # Dessiner les voxels
+        offset = self._view_origin()
         for voxel in self.voxels:
-            voxel.draw(self.window_surface)
+            voxel.draw(self.window_surface, offset)
         
         if mode == "human":
             pygame.event.pump()
@@ -335,6 +810,9 @@ class ElectroVoxelenv(Env):
             self.clock.tick(self.metadata["render_fps"])
             
     def close(self):
+        if self.render_thread is not None:
+            self.render_thread.stop()
+            self.render_thread = None
         if self.window_surface is not None:
             import pygame
 
@@ -0,0 +1,182 @@
+from typing import Optional
+
+import numpy as np
+
+from gym import Env, spaces
+from electrovoxel.electrovoxel_2D import initialShape_finalShape
+from electrovoxel.rules import (
+    DISPLACEMENTS_3D,
+    NEIGHBOR_OFFSETS_3D,
+    PRIMITIVES_3D,
+    legal_moves_3d,
+)
+
+_OFFSETS_3D = np.array(NEIGHBOR_OFFSETS_3D, dtype=np.int64)
+_WINDOW_3D = np.array(
+    [(dx, dy, dz) for dz in range(-2, 3) for dy in range(-2, 3) for dx in range(-2, 3)], dtype=np.int64
+)
+
+
+def pack_codes_3d(bits):
+    """Pack a (N, 124) bool array into (N, 2) uint64 neighborhood codes."""
+    packed = np.packbits(bits, axis=-1, bitorder="little")  # 16 bytes per row
+    return np.ascontiguousarray(packed).view("<u8")
+
+
+class ElectroVoxel3Denv(Env):
+    """
+    3D electrovoxel environment: cubes that pivot about an edge or slide along a face.
+
+    The world is a dense occupancy array holding `voxel index + 1` per cell, positions are an
+    (N, 3) array and the 5x5x5 neighborhood of each electrovoxel is kept as a 124-bit code
+    stored in two uint64 words. A step only touches the cells and codes around the moved
+    electrovoxel, so its cost does not depend on the size of the swarm.
+
+    ### Action Space
+    `MultiDiscrete([N, 48])`: the electrovoxel to move and the primitive to apply.
+    Primitives are `(kind, direction, base)` with kind in pivot/transverse, 6 directions and
+    4 base axes perpendicular to the direction (see `electrovoxel.rules.PRIMITIVES_3D`).
+    They are the 2D pivot and transverse rules laid in the plane (direction, base).
+
+    ### Observation Space
+    The packed 124-bit neighborhood codes of every electrovoxel, as a (N, 16) uint8 array.
+
+    ### Rewards
+    +1 and end of the episode when the multiset of neighborhood codes equals the target's
+    (the shape matches the target up to a translation), 0 otherwise.
+
+    ### Arguments
+
+    ```
+    ElectroVoxel3Denv(Size=9, map_name=["None", "None"], world_size=(32, 32, 32))
+    ```
+
+    `Size` and `map_name` select 2D shapes as in `ElectroVoxelenv`, laid flat in the plane z = 2.
+    `initial_shape` / `target_shape`: (N, 3) arrays of cells used instead of the shape files.
+    `world_size`: size of the occupancy array, moves leaving it are illegal.
+    """
+    metadata = {"render_modes": [], "render_fps": 4}
+
+    def __init__(
+        self,
+        render_mode: Optional[str] = None,
+        Size=9,
+        map_name=["None", "None"],
+        initial_shape=None,
+        target_shape=None,
+        world_size=(32, 32, 32),
+    ):
+        if initial_shape is None or target_shape is None:
+            flat_initial, flat_target = initialShape_finalShape(Size, map_name[0], map_name[1])
+            if initial_shape is None:
+                initial_shape = np.column_stack([flat_initial, np.full(len(flat_initial), 2)])
+            if target_shape is None:
+                target_shape = np.column_stack([flat_target, np.full(len(flat_target), 2)])
+        self.render_mode = render_mode
+        self.world_size = tuple(world_size)
+        self.initial_shape = np.array(initial_shape, dtype=np.int64).reshape(-1, 3)
+        self.target_shape = np.array(target_shape, dtype=np.int64).reshape(-1, 3)
+        self.size = len(self.initial_shape)
+
+        # Occupancy is padded by 2 cells so that neighborhood windows never leave the array
+        self.occupancy = np.zeros(tuple(s + 4 for s in self.world_size), dtype=np.int32)
+        self.positions = np.zeros((self.size, 3), dtype=np.int64)
+        self.codes = np.zeros((self.size, 2), dtype=np.uint64)
+        self.target_codes = self._shape_codes(self.target_shape)
+        # Count of each code in the swarm minus its count in the target, and sum of |difference|
+        self._balance = {}
+        self._mismatch = 0
+
+        self.nP = len(PRIMITIVES_3D)
+        self.action_space = spaces.MultiDiscrete([self.size, self.nP])
+        self.observation_space = spaces.Box(0, 255, shape=(self.size, 16), dtype=np.uint8)
+        self.reward_range = (0, 1)
+
+    def _shape_codes(self, cells):
+        """Codes of an arbitrary shape, computed on a temporary occupancy array."""
+        cells = np.asarray(cells, dtype=np.int64)
+        origin = cells.min(axis=0) - 2
+        occupancy = np.zeros(tuple(cells.max(axis=0) - origin + 3), dtype=bool)
+        local = cells - origin
+        occupancy[local[:, 0], local[:, 1], local[:, 2]] = True
+        around = local[:, None, :] + _OFFSETS_3D
+        return pack_codes_3d(occupancy[around[..., 0], around[..., 1], around[..., 2]])
+
+    def _count(self, code, delta):
+        before = self._balance.get(code, 0)
+        after = before + delta
+        self._mismatch += abs(after) - abs(before)
+        if after:
+            self._balance[code] = after
+        else:
+            del self._balance[code]
+
+    def _compute_codes(self, indices):
+        """Recompute the codes of the electrovoxels `indices` from the occupancy array."""
+        around = self.positions[indices, None, :] + _OFFSETS_3D + 2
+        bits = self.occupancy[around[..., 0], around[..., 1], around[..., 2]] != 0
+        new_codes = pack_codes_3d(bits)
+        for old, new in zip(self.codes[indices].tolist(), new_codes.tolist()):
+            if old != new:
+                self._count(tuple(old), -1)
+                self._count(tuple(new), 1)
+        self.codes[indices] = new_codes
+
+    def _observation(self):
+        return self.codes.view(np.uint8)
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        super().reset(seed=seed)
+        self.occupancy.fill(0)
+        self.codes.fill(0)
+        self._balance = {(0, 0): self.size} if self.size else {}
+        self._mismatch = self.size
+        for code in self.target_codes.tolist():
+            self._count(tuple(code), -1)
+        self.positions[:] = self.initial_shape
+        if (self.positions < 0).any() or (self.positions >= self.world_size).any():
+            raise ValueError(f"Initial shape does not fit in a world of size {self.world_size}.")
+        p = self.positions + 2
+        self.occupancy[p[:, 0], p[:, 1], p[:, 2]] = np.arange(1, self.size + 1)
+        self._compute_codes(np.arange(self.size))
+        return self._observation(), {}
+
+    def legal_moves(self):
+        """(N, 48) bool array of the primitives each electrovoxel can apply."""
+        legal = legal_moves_3d(self.codes)
+        # Moves leaving the world are illegal
+        destination = self.positions[:, None, :] + DISPLACEMENTS_3D
+        legal &= ((destination >= 0) & (destination < self.world_size)).all(axis=-1)
+        return legal
+
+    def move(self, index, primitive):
+        """Apply a primitive to one electrovoxel.
+
+        Returns:
+            True if the electrovoxel moved
+        """
+        if not legal_moves_3d(self.codes[index])[primitive]:
+            return False
+        old = self.positions[index].copy()
+        new = old + DISPLACEMENTS_3D[primitive]
+        if (new < 0).any() or (new >= self.world_size).any():
+            return False
+        self.occupancy[tuple(old + 2)] = 0
+        self.occupancy[tuple(new + 2)] = index + 1
+        self.positions[index] = new
+
+        # Only electrovoxels in the 5x5x5 windows of the old and new cells see the change
+        window = np.concatenate([old + _WINDOW_3D, new + _WINDOW_3D]) + 2
+        touched = self.occupancy[window[:, 0], window[:, 1], window[:, 2]]
+        self._compute_codes(np.unique(touched[touched > 0]) - 1)
+        return True
+
+    def is_target_reached(self):
+        return self._mismatch == 0
+
+    def step(self, action):
+        index, primitive = int(action[0]), int(action[1])
+        moved = self.move(index, primitive)
+        terminated = self.is_target_reached()
+        reward = 1.0 if terminated else 0.0
+        return self._observation(), reward, terminated, False, {"moved": moved}
@@ -0,0 +1,86 @@
+"""Benchmark of the env server (electrovoxel.env_server) against in-process stepping.
+
+Starts a server in a subprocess and measures, for each batch size, the round-trip latency of
+a batched step request and the throughput in env steps per second, next to the same random
+steps done on ElectroVoxelenv instances in this process.
+
+Usage:
+    python -m electrovoxel.env_benchmark [--size N] [--batch-sizes 1 8 64] [--steps S]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from electrovoxel.env_client import EnvClient
+
+
+def _random_actions(np_random, num_envs, size, steps):
+    return np.stack([np_random.integers(size, size=(steps, num_envs)), np_random.integers(8, size=(steps, num_envs))], axis=-1)
+
+
+def bench_in_process(num_envs: int, size: int, steps: int, seed: int = 0):
+    """Seconds per batched step of `num_envs` ElectroVoxelenv stepped in this process."""
+    from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+
+    envs = [ElectroVoxelenv(Size=size, observation_mode="packed") for _ in range(num_envs)]
+    for b, env in enumerate(envs):
+        env.reset(seed=seed + b)
+    actions = _random_actions(np.random.default_rng(seed), num_envs, size, steps).tolist()
+    start = time.perf_counter()
+    for batch in actions:
+        for env, action in zip(envs, batch):
+            env.step(action)
+    return (time.perf_counter() - start) / steps
+
+
+def bench_server(address: str, num_envs: int, size: int, steps: int, seed: int = 0):
+    """Seconds per batched step request of a session of `num_envs` envs on the server at `address`."""
+    with EnvClient(address, num_envs, size, seed=seed) as client:
+        client.reset()
+        actions = _random_actions(np.random.default_rng(seed), num_envs, size, steps)
+        start = time.perf_counter()
+        for batch in actions:
+            client.step(batch)
+        return (time.perf_counter() - start) / steps
+
+
+def start_server(address: str, timeout: float = 30.0):
+    """Env server in a subprocess, returned once its socket accepts connections."""
+    process = subprocess.Popen([sys.executable, "-m", "electrovoxel.env_server", address],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(address):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("The env server did not start.")
+        time.sleep(0.05)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the env server with in-process stepping.")
+    parser.add_argument("--size", type=int, default=9, help="number of electrovoxels")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--steps", type=int, default=2000, help="batched steps per measure")
+    args = parser.parse_args()
+
+    address = os.path.join(tempfile.mkdtemp(), "electrovoxel.sock")
+    server = start_server(address)
+    try:
+        print(f"{'envs':>6} {'in-process us/step':>20} {'server us/request':>18} {'in-process steps/s':>19} {'server steps/s':>15}")
+        for num_envs in args.batch_sizes:
+            local = bench_in_process(num_envs, args.size, args.steps)
+            remote = bench_server(address, num_envs, args.size, args.steps)
+            print(f"{num_envs:>6} {local * 1e6:>20.1f} {remote * 1e6:>18.1f} {num_envs / local:>19.0f} {num_envs / remote:>15.0f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Client of the ElectroVoxelenv server (see electrovoxel.env_server), with the protocol both share.
+
+Only numpy and the standard library are imported, so trainers can step environments hosted
+by a server without gym, pandas or pygame.
+
+Control plane: a Unix domain socket. Each request is an OP_* byte and a payload length
+(REQUEST_HEADER), followed by the payload; each reply is a status byte and a payload length
+(REPLY_HEADER), followed by the payload, an error message when the status is not STATUS_OK.
+Only OP_OPEN carries a payload (JSON options), so steps and resets exchange 5 bytes each way.
+
+Data plane: a shared memory block per session laid out by `session_layout`. The client
+writes the actions (and the reset mask) in it before a request; the server writes the
+results in it before replying. After a reset, `codes` and `positions` hold the full state of
+the envs. After a step, only what changed is written: the position of the moved electrovoxel
+and the codes of the electrovoxels whose neighborhood changed, whose indices and new codes
+are also listed in `delta_index` / `delta_code` (`delta_count` entries per env), so clients
+can update their own features incrementally.
+
+Usage:
+    client = EnvClient("/tmp/electrovoxel.sock", num_envs=16, size=9)
+    observations = client.reset()
+    observations, rewards, terminated, moved = client.step(actions)
+"""
+import json
+import os
+import socket
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+REQUEST_HEADER = struct.Struct("<BI")  # op, payload length
+REPLY_HEADER = struct.Struct("<BI")  # status, payload length
+
+OP_OPEN = 1
+OP_RESET = 2
+OP_STEP = 3
+OP_CLOSE = 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MAX_DELTA = 50  # a move changes the codes of the electrovoxels around two cells: 2 x 25 at most
+
+
+def session_layout(num_envs: int, size: int):
+    """Arrays of the shared memory block of a session
+
+    Returns:
+        dict name -> (offset, dtype, shape) and the size of the block in bytes
+    """
+    max_delta = min(size, MAX_DELTA)
+    fields = [
+        ("actions", "<i8", (num_envs, 2)),  # written by the client: (electrovoxel, movement)
+        ("reset_mask", "u1", (num_envs,)),  # written by the client: envs to reset
+        ("codes", "<u4", (num_envs, size)),  # 24-bit neighborhoods
+        ("positions", "<i8", (num_envs, size, 2)),
+        ("shape_ids", "<i4", (num_envs, 2)),
+        ("rewards", "<f8", (num_envs,)),
+        ("terminated", "u1", (num_envs,)),
+        ("moved", "u1", (num_envs,)),
+        ("delta_count", "<u4", (num_envs,)),
+        ("delta_index", "<u4", (num_envs, max_delta)),
+        ("delta_code", "<u4", (num_envs, max_delta)),
+    ]
+    layout = {}
+    offset = 0
+    for name, dtype, shape in fields:
+        dtype = np.dtype(dtype)
+        offset = -(-offset // 8) * 8  # 8-byte aligned
+        layout[name] = (offset, dtype, shape)
+        offset += dtype.itemsize * int(np.prod(shape))
+    return layout, max(offset, 1)
+
+
+def map_arrays(buffer, layout):
+    """Numpy views of the arrays of `layout` in `buffer`."""
+    return {name: np.ndarray(shape, dtype, buffer, offset) for name, (offset, dtype, shape) in layout.items()}
+
+
+def recv_exactly(sock, size: int):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Connection closed by the peer.")
+        received += n
+    return bytes(data)
+
+
+class EnvClient:
+    """Session of `num_envs` ElectroVoxelenv hosted by an env server
+
+    Args:
+        address: path of the Unix socket of the server
+        num_envs: number of environments of the session
+        size: number of electrovoxels
+        map_name: shape names, as in ElectroVoxelenv
+        seed: seed of the first reset, env b being seeded with seed + b
+        env_kwargs: other (JSON-serializable) arguments of ElectroVoxelenv, the observation mode
+            is always "packed"
+    """
+
+    def __init__(self, address: str, num_envs: int = 1, size: int = 9, map_name=["None", "None"], seed=None, **env_kwargs):
+        self.num_envs = num_envs
+        self.size = size
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(address)
+        options = {"num_envs": num_envs, "size": size, "map_name": list(map_name), "seed": seed, "env_kwargs": env_kwargs}
+        reply = json.loads(self._request(OP_OPEN, json.dumps(options).encode("utf-8")))
+        self._memory = shared_memory.SharedMemory(name=reply["shm_name"])
+        if reply["pid"] != os.getpid():
+            # The block belongs to the server: don't let the resource tracker of this process unlink it at exit
+            resource_tracker.unregister(self._memory._name, "shared_memory")
+        layout, _ = session_layout(num_envs, size)
+        self.arrays = map_arrays(self._memory.buf, layout)
+        # Same encoding as the "packed" observations of ElectroVoxelenv
+        self.observations = self.arrays["codes"].view(np.uint8).reshape(num_envs, size, 4)[..., :3]
+
+    def _request(self, op, payload=b""):
+        self._socket.sendall(REQUEST_HEADER.pack(op, len(payload)) + payload)
+        status, length = REPLY_HEADER.unpack(recv_exactly(self._socket, REPLY_HEADER.size))
+        data = recv_exactly(self._socket, length) if length else b""
+        if status != STATUS_OK:
+            raise RuntimeError(f"Env server error: {data.decode('utf-8')}")
+        return data
+
+    def reset(self, mask=None):
+        """Reset all the envs, or the ones selected by the boolean `mask`
+
+        Returns:
+            (num_envs, size, 3) uint8 packed observations, a view updated in place by the next requests
+        """
+        self.arrays["reset_mask"][:] = 1 if mask is None else np.asarray(mask, dtype=bool)
+        self._request(OP_RESET)
+        return self.observations
+
+    def step(self, actions):
+        """Step every env with its (electrovoxel, movement) row of `actions`
+
+        Returns:
+            observations, rewards, terminated, moved: views updated in place by the next requests
+        """
+        self.arrays["actions"][:] = actions
+        self._request(OP_STEP)
+        return self.observations, self.arrays["rewards"], self.arrays["terminated"], self.arrays["moved"]
+
+    def changes(self, b: int):
+        """(indices, codes) of the electrovoxels of env b whose neighborhood changed at the last step."""
+        count = int(self.arrays["delta_count"][b])
+        return self.arrays["delta_index"][b, :count], self.arrays["delta_code"][b, :count]
+
+    def close(self):
+        if self._socket is None:
+            return
+        try:
+            self._request(OP_CLOSE)
+        except (ConnectionError, OSError):
+            pass
+        self.arrays = self.observations = None
+        try:
+            self._memory.close()
+        except BufferError:
+            pass  # views still held by the caller, the mapping goes with them
+        self._socket.close()
+        self._socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
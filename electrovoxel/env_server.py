@@ -0,0 +1,189 @@
+"""Local server hosting ElectroVoxelenv instances for clients in other processes.
+
+A client (electrovoxel.env_client) opens a session of N envs over a Unix domain socket; the
+server creates the envs and a shared memory block for their actions and results, and then
+answers batched reset and step requests on it (see electrovoxel.env_client for the protocol).
+Each connection is served by its own thread.
+
+After a step, the server only writes what the move changed: it lists the electrovoxels in the
+neighborhoods of the old and new cells of the moved electrovoxel (the only ones whose codes
+can change) and writes the codes that differ, as an indexed delta.
+
+Usage:
+    python -m electrovoxel.env_server /tmp/electrovoxel.sock
+"""
+import argparse
+import json
+import os
+import socketserver
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.env_client import (OP_CLOSE, OP_OPEN, OP_RESET, OP_STEP, REPLY_HEADER, REQUEST_HEADER, STATUS_ERROR,
+                                     STATUS_OK, map_arrays, recv_exactly, session_layout)
+from electrovoxel.grid import NEIGHBOR_OFFSETS
+
+_WINDOW = NEIGHBOR_OFFSETS + ((0, 0),)
+
+
+class EnvSession:
+    """Envs of one client and their shared memory block
+
+    Args:
+        num_envs: number of environments
+        size: number of electrovoxels
+        map_name: shape names, as in ElectroVoxelenv
+        seed: seed of the first reset, env b being seeded with seed + b
+        env_kwargs: other arguments of ElectroVoxelenv
+    """
+
+    def __init__(self, num_envs: int, size: int = 9, map_name=["None", "None"], seed=None, env_kwargs=None):
+        if num_envs < 1:
+            raise ValueError("A session needs at least one env.")
+        env_kwargs = dict(env_kwargs or {})
+        env_kwargs["observation_mode"] = "packed"
+        self.envs = [ElectroVoxelenv(Size=size, map_name=map_name, **env_kwargs) for _ in range(num_envs)]
+        self.size = size
+        # Seed of the next reset of each env, only the first one is seeded
+        self._seeds = [None if seed is None else seed + b for b in range(num_envs)]
+        # (old, new) cells of the last move of each env, recorded by a move listener
+        self._moves = [None] * num_envs
+        for b, env in enumerate(self.envs):
+            env.move_listeners.append(self._recorder(b))
+        layout, nbytes = session_layout(num_envs, size)
+        self.memory = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.arrays = map_arrays(self.memory.buf, layout)
+
+    def _recorder(self, b):
+        def record(index, old, new):
+            if index >= 0:
+                self._moves[b] = (old, new)
+        return record
+
+    def reset(self):
+        a = self.arrays
+        for b in np.flatnonzero(a["reset_mask"]):
+            env = self.envs[b]
+            seed, self._seeds[b] = self._seeds[b], None
+            _, info = env.reset(seed=seed)
+            a["codes"][b] = env.codes
+            a["positions"][b] = env.positions
+            a["shape_ids"][b] = info["shape_ids"]
+            a["rewards"][b] = 0.0
+            a["terminated"][b] = 0
+            a["moved"][b] = 0
+            a["delta_count"][b] = 0
+
+    def step(self):
+        a = self.arrays
+        actions = a["actions"]
+        if ((actions[:, 0] < 0) | (actions[:, 0] >= self.size) | (actions[:, 1] < 0) | (actions[:, 1] > 7)).any():
+            raise ValueError(f"Actions must be (electrovoxel in [0, {self.size}), movement in [0, 8)).")
+        codes, positions = a["codes"], a["positions"]
+        for b, (index, action) in enumerate(a["actions"].tolist()):
+            env = self.envs[b]
+            self._moves[b] = None
+            _, reward, terminated, _, info = env.step((index, action))
+            a["rewards"][b] = reward
+            a["terminated"][b] = terminated
+            a["moved"][b] = info["moved"]
+            count = 0
+            if self._moves[b] is not None:
+                positions[b, index] = env.positions[index]
+                # Only the electrovoxels seeing the old or new cell may have a new code
+                changed = set()
+                for cx, cy in self._moves[b]:
+                    for dx, dy in _WINDOW:
+                        i = env.grid.get(cx + dx, cy + dy) - 1
+                        if i >= 0 and i not in changed and env.codes[i] != codes[b, i]:
+                            changed.add(i)
+                            codes[b, i] = env.codes[i]
+                            a["delta_index"][b, count] = i
+                            a["delta_code"][b, count] = env.codes[i]
+                            count += 1
+            a["delta_count"][b] = count
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+        self.arrays = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class _SessionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        session = None
+        try:
+            while True:
+                try:
+                    op, length = REQUEST_HEADER.unpack(recv_exactly(self.request, REQUEST_HEADER.size))
+                    payload = recv_exactly(self.request, length) if length else b""
+                except ConnectionError:
+                    return
+                try:
+                    reply = b""
+                    if op == OP_OPEN:
+                        if session is not None:
+                            raise ValueError("A session is already open on this connection.")
+                        options = json.loads(payload)
+                        session = EnvSession(options["num_envs"], options["size"], options["map_name"], options["seed"], options["env_kwargs"])
+                        reply = json.dumps({"shm_name": session.memory.name, "pid": os.getpid()}).encode("utf-8")
+                    elif session is None:
+                        raise ValueError("No session open on this connection.")
+                    elif op == OP_RESET:
+                        session.reset()
+                    elif op == OP_STEP:
+                        session.step()
+                    elif op == OP_CLOSE:
+                        self.request.sendall(REPLY_HEADER.pack(STATUS_OK, 0))
+                        return
+                    else:
+                        raise ValueError(f"Unknown request {op}.")
+                except Exception as error:
+                    message = f"{type(error).__name__}: {error}".encode("utf-8")
+                    self.request.sendall(REPLY_HEADER.pack(STATUS_ERROR, len(message)) + message)
+                    continue
+                self.request.sendall(REPLY_HEADER.pack(STATUS_OK, len(reply)) + reply)
+        finally:
+            if session is not None:
+                session.close()
+
+
+class EnvServer(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server of ElectroVoxelenv sessions, one thread per connection
+
+    Args:
+        address: path of the socket, replaced if it exists
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: str):
+        if os.path.exists(address):
+            os.unlink(address)
+        super().__init__(address, _SessionHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ElectroVoxelenv sessions over a Unix domain socket.")
+    parser.add_argument("address", help="path of the Unix socket")
+    args = parser.parse_args()
+
+    with EnvServer(args.address) as server:
+        print(f"Serving on {args.address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Graph view of an electrovoxel swarm, maintained incrementally for graph neural network policies.
+
+Nodes are the electrovoxels, with their 24-bit neighborhood unpacked as features. Edges
+link electrovoxels in adjacent cells (4- or 8-connectivity), stored in both directions in a
+COO edge index padded with NO_EDGE columns up to its maximal size N * connectivity. When an
+electrovoxel moves, only its own edges are removed and re-created, in preallocated buffers,
+so an update costs O(1) whatever the size of the swarm.
+"""
+import numpy as np
+
+from electrovoxel.grid import NUM_NEIGHBORS
+
+NO_EDGE = -1  # padding of the unused columns of the edge index
+
+CONNECTIVITY_OFFSETS = {
+    4: ((1, 0), (0, 1), (-1, 0), (0, -1)),
+    8: ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)),
+}
+
+
+def unpack_codes(codes):
+    """(N,) 24-bit codes to (N, 24) uint8 bits, bit i for NEIGHBOR_OFFSETS[i]."""
+    codes = np.ascontiguousarray(codes, dtype="<u4")
+    return np.unpackbits(codes.view(np.uint8).reshape(-1, 4)[:, :3], axis=1, bitorder="little")
+
+
+class SwarmGraph:
+    """Adjacency graph of a swarm
+
+    Args:
+        grid: ChunkedGrid holding `index + 1` in the cells of the electrovoxels
+        positions: (N, 2) positions of the electrovoxels
+        codes: (N,) neighborhood codes of the electrovoxels
+        target_codes: (M,) neighborhood codes of the target shape
+        connectivity: 4 or 8
+    """
+
+    def __init__(self, grid, positions, codes, target_codes, connectivity: int = 4):
+        if connectivity not in CONNECTIVITY_OFFSETS:
+            raise ValueError(f"connectivity must be 4 or 8, got {connectivity}.")
+        self.grid = grid
+        self.positions = positions
+        self.offsets = CONNECTIVITY_OFFSETS[connectivity]
+        self.degree = len(self.offsets)
+        # Index of the opposite direction of each offset
+        self.opposite = [self.offsets.index((-dx, -dy)) for dx, dy in self.offsets]
+
+        n = len(positions)
+        self.node_features = np.zeros((n, NUM_NEIGHBORS), dtype=np.uint8)
+        self.target_features = unpack_codes(target_codes)
+        # neighbors[i, k]: electrovoxel in direction k of i, or -1. It is also a CSR adjacency
+        # with a fixed row length `degree`.
+        self.neighbors = np.full((n, self.degree), -1, dtype=np.int64)
+        # Compact COO edge list, edges[e] = (source, destination) for e < num_edges, NO_EDGE after
+        self.edges = np.full((n * self.degree, 2), NO_EDGE, dtype=np.int64)
+        self.num_edges = 0
+        # slot[i, k]: row of the edge (i, neighbors[i, k]) in `edges`; edge_key[e] = i * degree + k
+        self.slot = np.full((n, self.degree), -1, dtype=np.int64)
+        self.edge_key = np.zeros(n * self.degree, dtype=np.int64)
+
+        self.update_features(np.arange(n), codes)
+        for i in range(n):
+            self._link(i)
+
+    def reset(self, codes, target_codes):
+        """Rebuild the graph in its buffers after the swarm was placed on a new configuration of the same size."""
+        self.edges[:self.num_edges] = NO_EDGE
+        self.num_edges = 0
+        self.neighbors.fill(-1)
+        self.slot.fill(-1)
+        self.node_features[:] = unpack_codes(codes)
+        self.target_features[:] = unpack_codes(target_codes)
+        for i in range(len(self.positions)):
+            self._link(i)
+
+    @property
+    def edge_index(self):
+        """(2, E) COO edge index, a view into the edge buffer."""
+        return self.edges[:self.num_edges].T
+
+    def _add_edge(self, i, k, j):
+        e = self.num_edges
+        self.edges[e] = (i, j)
+        self.edge_key[e] = i * self.degree + k
+        self.slot[i, k] = e
+        self.neighbors[i, k] = j
+        self.num_edges += 1
+
+    def _remove_edge(self, i, k):
+        e = self.slot[i, k]
+        last = self.num_edges - 1
+        if e != last:
+            # Move the last edge in the hole
+            self.edges[e] = self.edges[last]
+            key = self.edge_key[last]
+            self.edge_key[e] = key
+            self.slot[key // self.degree, key % self.degree] = e
+        self.edges[last] = NO_EDGE
+        self.slot[i, k] = -1
+        self.neighbors[i, k] = -1
+        self.num_edges = last
+
+    def _link(self, i):
+        """Create the missing edges of i with the electrovoxels around it."""
+        x, y = int(self.positions[i, 0]), int(self.positions[i, 1])
+        for k, (dx, dy) in enumerate(self.offsets):
+            j = self.grid.get(x + dx, y + dy) - 1
+            if j >= 0 and self.neighbors[i, k] < 0:
+                self._add_edge(i, k, j)
+                self._add_edge(j, self.opposite[k], i)
+
+    def _unlink(self, i):
+        for k in range(self.degree):
+            j = self.neighbors[i, k]
+            if j >= 0:
+                self._remove_edge(i, k)
+                self._remove_edge(j, self.opposite[k])
+
+    def move(self, i):
+        """Update the edges of the electrovoxel i after it moved (its new position already set)."""
+        self._unlink(i)
+        self._link(i)
+
+    def update_features(self, indices, codes):
+        """Set the node features of `indices` from their neighborhood codes."""
+        self.node_features[indices] = unpack_codes(codes)
+
+    def observation(self):
+        """Observation of the env: the edge index is the whole padded buffer, of fixed shape
+        (2, N * connectivity), its first "num_edges" columns being the edges."""
+        return {"x": self.node_features, "edge_index": self.edges.T, "num_edges": self.num_edges, "target_x": self.target_features}
@@ -0,0 +1,179 @@
+import numpy as np
+
+TILE_SIZE = 32
+
+# Relative positions seen by an electrovoxel, in the same order as ElectroVoxel.state.
+# Bit i of a neighborhood code is set when NEIGHBOR_OFFSETS[i] is occupied.
+NEIGHBOR_OFFSETS = tuple((dx, dy) for dy in range(-2, 3) for dx in range(-2, 3) if (dx, dy) != (0, 0))
+NUM_NEIGHBORS = len(NEIGHBOR_OFFSETS)
+_OFFSETS_X = np.array([dx for dx, _ in NEIGHBOR_OFFSETS], dtype=np.int64)
+_OFFSETS_Y = np.array([dy for _, dy in NEIGHBOR_OFFSETS], dtype=np.int64)
+
+# Weight of each cell of a flattened 5x5 window (row major, center excluded)
+_WINDOW_WEIGHTS = np.array(
+    [0 if j == 12 else 1 << (j if j < 12 else j - 1) for j in range(25)], dtype=np.uint32
+)
+
+
+def code_to_connections(code: int):
+    """Convert a 24-bit neighborhood code into the dict used by ElectroVoxel.state.
+
+    Args:
+        code: neighborhood code, bit i set when NEIGHBOR_OFFSETS[i] is occupied
+
+    Returns:
+        dict {(dx, dy): bool}
+    """
+    code = int(code)
+    return {offset: bool(code >> i & 1) for i, offset in enumerate(NEIGHBOR_OFFSETS)}
+
+
+def neighborhood_codes(positions):
+    """Neighborhood codes of every cell of a set of positions, occupied by these positions only.
+
+    Args:
+        positions: (N, 2) integer positions
+
+    Returns:
+        (N,) '<u4' codes
+    """
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    if len(positions) == 0:
+        return np.zeros(0, dtype="<u4")
+    local = positions - positions.min(axis=0) + 2
+    occupied = np.zeros((local[:, 1].max() + 3, local[:, 0].max() + 3), dtype=bool)
+    occupied[local[:, 1], local[:, 0]] = True
+    bits = occupied[local[:, 1, None] + _OFFSETS_Y, local[:, 0, None] + _OFFSETS_X]
+    codes = np.zeros((len(positions), 4), dtype=np.uint8)
+    codes[:, :3] = np.packbits(bits, axis=1, bitorder="little")
+    return codes.view("<u4")[:, 0]
+
+
+def connections_to_code(connections) -> int:
+    """Inverse of `code_to_connections`."""
+    code = 0
+    for i, offset in enumerate(NEIGHBOR_OFFSETS):
+        if connections.get(offset):
+            code |= 1 << i
+    return code
+
+
+class ChunkedGrid:
+    """Unbounded sparse 2D grid made of square tiles allocated on demand.
+
+    Tiles are stored in a dict keyed by tile coordinate `(x // tile_size, y // tile_size)`.
+    A cell holds an integer value, 0 meaning empty. A tile is released as soon as its
+    last non-empty cell is cleared, so memory is proportional to the occupied area.
+    Released tiles are kept (up to `max_free_tiles`) and reused by the next allocations,
+    so that moving or reloading a swarm does not allocate.
+    """
+
+    def __init__(self, tile_size: int = TILE_SIZE, dtype=np.int32, max_free_tiles: int = 64):
+        if tile_size < 8 or tile_size & (tile_size - 1):
+            raise ValueError(f"tile_size must be a power of two >= 8, got {tile_size}.")
+        self.tile_size = tile_size
+        self.dtype = dtype
+        self._shift = tile_size.bit_length() - 1
+        self._mask = tile_size - 1
+        self.tiles = {}
+        self.counts = {}
+        self.max_free_tiles = max_free_tiles
+        self._free = []  # released tiles, all zero
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __contains__(self, cell):
+        return self.get(cell[0], cell[1]) != 0
+
+    @property
+    def nbytes(self):
+        return sum(tile.nbytes for tile in self.tiles.values())
+
+    def get(self, x: int, y: int) -> int:
+        tile = self.tiles.get((x >> self._shift, y >> self._shift))
+        if tile is None:
+            return 0
+        return int(tile[y & self._mask, x & self._mask])
+
+    def set(self, x: int, y: int, value: int):
+        if value == 0:
+            self.clear(x, y)
+            return
+        key = (x >> self._shift, y >> self._shift)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self._free.pop() if self._free else np.zeros((self.tile_size, self.tile_size), dtype=self.dtype)
+            self.tiles[key] = tile
+            self.counts[key] = 0
+        ly, lx = y & self._mask, x & self._mask
+        if tile[ly, lx] == 0:
+            self.counts[key] += 1
+        tile[ly, lx] = value
+
+    def clear(self, x: int, y: int) -> int:
+        """Empty a cell and free its tile if nothing is left in it.
+
+        Returns:
+            the previous value of the cell
+        """
+        key = (x >> self._shift, y >> self._shift)
+        tile = self.tiles.get(key)
+        if tile is None:
+            return 0
+        ly, lx = y & self._mask, x & self._mask
+        previous = int(tile[ly, lx])
+        if previous:
+            tile[ly, lx] = 0
+            self.counts[key] -= 1
+            if self.counts[key] == 0:
+                del self.tiles[key]
+                del self.counts[key]
+                self._release(tile)
+        return previous
+
+    def _release(self, tile):
+        if len(self._free) < self.max_free_tiles:
+            self._free.append(tile)
+
+    def reset(self):
+        for tile in self.tiles.values():
+            if len(self._free) < self.max_free_tiles:
+                tile.fill(0)
+                self._free.append(tile)
+        self.tiles.clear()
+        self.counts.clear()
+
+    def neighborhood_code(self, x: int, y: int) -> int:
+        """24-bit code of the 5x5 neighborhood around (x, y), center excluded."""
+        lx, ly = x & self._mask, y & self._mask
+        if 2 <= lx < self.tile_size - 2 and 2 <= ly < self.tile_size - 2:
+            # Whole window inside one tile: a single slice
+            tile = self.tiles.get((x >> self._shift, y >> self._shift))
+            if tile is None:
+                return 0
+            window = tile[ly - 2:ly + 3, lx - 2:lx + 3].ravel() != 0
+            return int(_WINDOW_WEIGHTS[window].sum())
+        # Window crosses a tile border: at most 4 tiles, one dict lookup per cell
+        code = 0
+        for i, (dx, dy) in enumerate(NEIGHBOR_OFFSETS):
+            if self.get(x + dx, y + dy):
+                code |= 1 << i
+        return code
+
+    def bounding_box(self):
+        """Return (xmin, ymin, xmax, ymax) of the occupied cells, or None if empty."""
+        if not self.tiles:
+            return None
+        xmin = ymin = None
+        xmax = ymax = None
+        for (tx, ty), tile in self.tiles.items():
+            ys, xs = np.nonzero(tile)
+            x0, y0 = tx << self._shift, ty << self._shift
+            bx = (x0 + xs.min(), x0 + xs.max())
+            by = (y0 + ys.min(), y0 + ys.max())
+            xmin = bx[0] if xmin is None else min(xmin, bx[0])
+            xmax = bx[1] if xmax is None else max(xmax, bx[1])
+            ymin = by[0] if ymin is None else min(ymin, by[0])
+            ymax = by[1] if ymax is None else max(ymax, by[1])
+        return int(xmin), int(ymin), int(xmax), int(ymax)
@@ -0,0 +1,143 @@
+"""Hindsight experience replay (HER) for shape-to-shape tasks.
+
+The goal of an episode is its target shape, described as in ElectroVoxelenv by the
+sorted neighborhood codes of the target (`env.target_codes`); the goal achieved by a
+configuration is the sorted codes of the swarm (`achieved_goal(env)`). Since the reward
+only depends on these two arrays, a transition can be relabeled with any shape reached
+later in its episode and its reward recomputed with a popcount of XORed codes, for a whole
+batch at once, without re-simulating anything.
+
+`HindsightReplay` adds the achieved and desired goals to a `ReplayBuffer` and relabels
+the sampled transitions on the fly ("future" strategy).
+"""
+from typing import Optional
+
+import numpy as np
+
+from electrovoxel.grid import NUM_NEIGHBORS
+from electrovoxel.utils import popcount
+
+
+def achieved_goal(env):
+    """Goal reached by the current configuration of an ElectroVoxelenv: its sorted codes."""
+    return np.sort(env.codes)
+
+
+def goal_similarity(achieved, goals):
+    """Similarity of achieved and desired goals, as `ElectroVoxelenv._similarity`
+
+    Args:
+        achieved: (..., N) sorted neighborhood codes
+        goals: (..., N) sorted neighborhood codes, broadcast against `achieved`
+
+    Returns:
+        (...) similarities, 1.0 where the shapes match
+    """
+    achieved = np.asarray(achieved, dtype=np.uint32)
+    difference = popcount(achieved ^ np.asarray(goals, dtype=np.uint32)).sum(axis=-1)
+    return 1.0 - difference / (achieved.shape[-1] * NUM_NEIGHBORS)
+
+
+def goal_rewards(achieved, next_achieved, goals):
+    """Rewards and terminations of transitions for the given goals, as `ElectroVoxelenv._reward`
+
+    Args:
+        achieved: (..., N) goals achieved before the transitions
+        next_achieved: (..., N) goals achieved after the transitions
+        goals: (..., N) desired goals
+
+    Returns:
+        float32 rewards (...) and bool terminated (...)
+    """
+    before = goal_similarity(achieved, goals)
+    after = goal_similarity(next_achieved, goals)
+    terminated = after == 1.0
+    rewards = np.where(terminated, 1.0, np.maximum(0.0, after - before))
+    return rewards.astype(np.float32), terminated
+
+
+class HindsightReplay:
+    """Goal-conditioned view of a ReplayBuffer with hindsight relabeling
+
+    The achieved goal of every stored observation and the desired goal of every episode are
+    kept in rings parallel to the observation ring of the buffer (4 * N bytes per
+    observation), indexed by the same counters.
+
+    Args:
+        buffer: the ReplayBuffer storing the observations and transitions, only fed through this object
+        num_voxels: number of electrovoxels N
+        her_ratio: fraction of the sampled transitions relabeled with a future achieved goal
+    """
+
+    def __init__(self, buffer, num_voxels: int, her_ratio: float = 0.8):
+        self.buffer = buffer
+        self.num_voxels = num_voxels
+        self.her_ratio = her_ratio
+        capacity = buffer.observation_capacity
+        self.achieved = np.zeros((capacity, num_voxels), dtype="<u4")
+        self.goals = np.zeros((capacity, num_voxels), dtype="<u4")  # desired goal, per episode
+        self.episode_of = np.zeros(capacity, dtype=np.int64)  # observation -> episode
+        self.episode_last = np.zeros(capacity, dtype=np.int64)  # episode -> counter of its last observation
+        self.num_episodes = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def _store(self, achieved):
+        counter = self.buffer.num_observations - 1
+        slot = counter % len(self.achieved)
+        self.achieved[slot] = achieved
+        self.episode_of[slot] = self.num_episodes - 1
+        self.episode_last[(self.num_episodes - 1) % len(self.episode_last)] = counter
+
+    def begin(self, observation, achieved, goal):
+        """Start an episode
+
+        Args:
+            observation: first observation
+            achieved: goal achieved by the first configuration, `achieved_goal(env)`
+            goal: desired goal, `env.target_codes`
+        """
+        self.buffer.begin(observation)
+        self.num_episodes += 1
+        self.goals[(self.num_episodes - 1) % len(self.goals)] = goal
+        self._store(achieved)
+
+    def add(self, voxel: int, action: int, reward: float, next_observation, terminated: bool, next_achieved):
+        """Add a transition, `next_achieved` being `achieved_goal(env)` after the step."""
+        self.buffer.add(voxel, action, reward, next_observation, terminated)
+        self._store(next_achieved)
+
+    def sample(self, batch_size: int, her_ratio: Optional[float] = None):
+        """Draw a batch of transitions, part of them relabeled
+
+        Returns:
+            the batch of `ReplayBuffer.sample`, with the rewards and terminations of the relabeled
+            transitions recomputed for their new goal, plus "goal" (B, N) and "relabeled" (B,) bool
+        """
+        her_ratio = self.her_ratio if her_ratio is None else her_ratio
+        buffer = self.buffer
+        batch = buffer.sample(batch_size)
+        capacity = len(self.achieved)
+        states = buffer.transitions["state"][batch["index"]].astype(np.int64)
+        episodes = self.episode_of[states % capacity]
+        last = self.episode_last[episodes % capacity]
+
+        # Future strategy: a goal achieved after the transition, in the same episode
+        relabeled = buffer.np_random.random(batch_size) < her_ratio
+        future = states + 1 + (buffer.np_random.random(batch_size) * (last - states)).astype(np.int64)
+        goals = np.where(
+            relabeled[:, None],
+            self.achieved[future % capacity],
+            self.goals[episodes % capacity],
+        )
+        # Only the similarity part of the reward depends on the goal: the other terms of
+        # `ElectroVoxelenv._reward` (energy, distance, shaping) are kept from the stored reward
+        achieved, next_achieved = self.achieved[states % capacity], self.achieved[(states + 1) % capacity]
+        stored_similarity, _ = goal_rewards(achieved, next_achieved, self.goals[episodes % capacity])
+        similarity, terminated = goal_rewards(achieved, next_achieved, goals)
+        batch["reward"] = np.where(relabeled, batch["reward"] - stored_similarity + similarity, batch["reward"]).astype(np.float32)
+        batch["terminated"] = np.where(relabeled, terminated, batch["terminated"])
+        batch["goal"] = goals
+        batch["relabeled"] = relabeled
+        return batch
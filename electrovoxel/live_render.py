@@ -0,0 +1,113 @@
+"""Display of an ElectroVoxelenv decoupled from its stepping loop.
+
+With `render_mode="human_async"` the env publishes a snapshot (a copy of the positions of
+the electrovoxels with a version counter) on a `SnapshotChannel` after each move, which
+costs a small array copy. A `RenderThread` draws the latest snapshot at its own frame rate
+and skips the versions published in between, so the env never waits for the display.
+
+pygame must be allowed to open its window outside the main thread, which is the case on
+Linux and Windows but not on macOS.
+"""
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+from electrovoxel.electrovoxelInit import draw_voxel
+
+
+class Snapshot(NamedTuple):
+    version: int
+    positions: np.ndarray  # (N, 2) grid positions, owned by the snapshot
+    colors: tuple
+
+
+class SnapshotChannel:
+    """Latest snapshot of a swarm, written by the env and read by a renderer
+
+    Publishing replaces the reference to the latest snapshot, which is atomic: the reader
+    always gets a complete snapshot, and older ones are simply dropped.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.latest = None
+
+    def publish(self, positions, colors):
+        self.version += 1
+        self.latest = Snapshot(self.version, np.array(positions, copy=True), tuple(colors))
+
+
+def view_origin(positions, grid_size, voxel_size):
+    """Pixel offset applied when drawing, so that the swarm stays in the rendered area."""
+    xmin, ymin = positions.min(axis=0)
+    xmax, ymax = positions.max(axis=0)
+    if xmin >= 0 and ymin >= 0 and xmax < grid_size[0] and ymax < grid_size[1]:
+        return (0, 0)
+    # Center the window on the swarm
+    ox = (grid_size[0] - (xmax - xmin + 1)) // 2 - xmin
+    oy = (grid_size[1] - (ymax - ymin + 1)) // 2 - ymin
+    return (int(ox) * voxel_size, int(oy) * voxel_size)
+
+
+class RenderThread(threading.Thread):
+    """Daemon thread drawing the latest snapshot of a channel in a pygame window
+
+    Args:
+        channel: SnapshotChannel to display
+        grid_size: size of the rendered area in cells
+        voxel_size: size of a cell in pixels
+        fps: maximal frame rate
+        caption: title of the window
+    """
+
+    def __init__(self, channel: SnapshotChannel, grid_size=(20, 20), voxel_size: int = 40, fps: float = 30, caption: str = "Electrovoxel"):
+        super().__init__(name="electrovoxel-render", daemon=True)
+        self.channel = channel
+        self.grid_size = tuple(grid_size)
+        self.voxel_size = voxel_size
+        self.fps = fps
+        self.caption = caption
+        self.frames = 0  # frames drawn
+        self.skipped = 0  # versions published but never drawn
+        self._stop_event = threading.Event()
+
+    def run(self):
+        import pygame
+
+        pygame.display.init()
+        pygame.display.set_caption(self.caption)
+        screen_size = (self.grid_size[0] * self.voxel_size, self.grid_size[1] * self.voxel_size)
+        window = pygame.display.set_mode(screen_size)
+        # Background and grid drawn once, then copied at each frame
+        background = pygame.Surface(screen_size)
+        background.fill((255, 255, 255))
+        for x in range(0, screen_size[0], self.voxel_size):
+            pygame.draw.line(background, (200, 200, 200), (x, 0), (x, screen_size[1]))
+        for y in range(0, screen_size[1], self.voxel_size):
+            pygame.draw.line(background, (200, 200, 200), (0, y), (screen_size[0], y))
+
+        clock = pygame.time.Clock()
+        drawn = 0
+        try:
+            while not self._stop_event.is_set():
+                pygame.event.pump()
+                snapshot = self.channel.latest
+                if snapshot is not None and snapshot.version != drawn:
+                    self.skipped += max(0, snapshot.version - drawn - 1)
+                    drawn = snapshot.version
+                    window.blit(background, (0, 0))
+                    if len(snapshot.positions):
+                        ox, oy = view_origin(snapshot.positions, self.grid_size, self.voxel_size)
+                        for (x, y), color in zip(snapshot.positions.tolist(), snapshot.colors):
+                            draw_voxel(window, x * self.voxel_size + ox, y * self.voxel_size + oy, color, self.voxel_size)
+                    pygame.display.flip()
+                    self.frames += 1
+                clock.tick(self.fps)
+        finally:
+            pygame.display.quit()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
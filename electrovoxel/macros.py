@@ -0,0 +1,48 @@
+"""Macro-actions for ElectroVoxelenv.
+
+A macro-action moves one electrovoxel over many cells in a single env call: the sequence
+of pivot/transverse movements is planned by the cached reachability search of
+`electrovoxel.reachability` (the rest of the swarm fixed), then executed by `ElectroVoxelenv.execute`,
+which returns the aggregated reward and the number of primitive movements used.
+"""
+from electrovoxel.reachability import ReachabilityCache
+
+
+def surface_path(env, index, cell):
+    """Shortest sequence of movements taking an electrovoxel to `cell` over the rest of the swarm
+
+    Args:
+        env: ElectroVoxelenv
+        index: index of the electrovoxel
+        cell: destination (x, y)
+
+    Returns:
+        list of movements, or None if the cell can't be reached
+    """
+    return ReachabilityCache.for_env(env).path(index, cell)
+
+
+def roll_to(env, index, cell):
+    """Roll the electrovoxel `index` along the surface of the swarm to `cell`
+
+    Returns:
+        same as `ElectroVoxelenv.execute`, with info["reachable"] False (and nothing done) if
+        the cell can't be reached
+    """
+    path = surface_path(env, index, cell)
+    if path is None:
+        return env._observation(index), 0.0, False, False, {"moves": 0, "moved": False, "reachable": False}
+    observation, reward, terminated, truncated, info = env.execute(index, path)
+    info["reachable"] = True
+    return observation, reward, terminated, truncated, info
+
+
+def transfer(env, source, destination):
+    """Move the electrovoxel at cell `source` to cell `destination`, see `roll_to`."""
+    index = env.grid.get(int(source[0]), int(source[1])) - 1
+    if index < 0:
+        raise ValueError(f"No electrovoxel at {tuple(source)}.")
+    return roll_to(env, index, destination)
+
+
+MACROS = {"roll_to": roll_to, "transfer": transfer}
@@ -0,0 +1,230 @@
+"""Mosaic rendering of many ElectroVoxelenv in one frame.
+
+A `MosaicRenderer` shows K envs as tiles of one frame, each with its target shape drawn below
+the electrovoxels and a step counter in its corner. The frame is a persistent NumPy image
+composed incrementally: the background of a tile (grid and target) is rasterized once per
+episode and cached, and after that only the cells left or entered by the electrovoxels,
+collected by move listeners, are copied from the background or stamped with the electrovoxel
+template. The cells are made smaller when K is large, so that the mosaic fits `max_size`.
+
+With `render_mode="human"` the frame is shown in a single pygame window, through a surface
+sharing the memory of the frame, and only the rectangles of the tiles that changed are blitted
+and updated.
+
+Usage:
+    mosaic = MosaicRenderer(envs, render_mode="rgb_array")
+    frame = mosaic.render()
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+from electrovoxel.batch_render import EDGE_COLOR, EMPTY, TARGET, TARGET_COLOR, VOXEL, _cell_templates
+from electrovoxel.live_render import view_origin
+
+SEPARATOR_COLOR = (96, 96, 96)
+COUNTER_DIGITS = 6
+
+# 3 x 5 bitmaps of the digits, one string of 15 pixels (rows of 3) per digit
+_DIGITS = np.array([[c == "#" for c in d] for d in (
+    "####.##.##.####", "..#..#..#..#..#", "###..#####..###", "###..####..####", "#.##.####..#..#",
+    "####..###..####", "####..####.####", "###..#..#..#..#", "####.#####.####", "####.####..####",
+)]).reshape(10, 5, 3)
+
+
+def _tile_templates(cell_px: int):
+    """Cell images as in `batch_render`, without edges when the cells are too small for them."""
+    if cell_px >= 4:
+        return _cell_templates(cell_px)
+    templates = np.empty((3, cell_px, cell_px, 3), dtype=np.uint8)
+    templates[EMPTY] = (255, 255, 255)
+    templates[TARGET] = TARGET_COLOR
+    templates[VOXEL] = EDGE_COLOR
+    return templates
+
+
+class MosaicRenderer:
+    """Tiled display of a batch of envs
+
+    Args:
+        envs: list of ElectroVoxelenv, their moves are followed with move listeners
+        columns: number of tiles per row, about the square root of the number of envs if None
+        tile_cells: cells shown in a tile (width, height)
+        max_size: maximal size of the frame in pixels (width, height)
+        max_cell_px: size of a cell in pixels when the mosaic is small enough
+        render_mode: "rgb_array" to get the frames, "human" to display them in a window
+    """
+
+    def __init__(self, envs, columns: Optional[int] = None, tile_cells=(20, 20), max_size=(1280, 960),
+                 max_cell_px: int = 16, render_mode: str = "rgb_array"):
+        if render_mode not in ("rgb_array", "human"):
+            raise ValueError(f"Unknown render mode '{render_mode}', expected 'rgb_array' or 'human'.")
+        self.envs = list(envs)
+        self.render_mode = render_mode
+        self.columns = columns or math.ceil(math.sqrt(len(self.envs)))
+        self.rows = math.ceil(len(self.envs) / self.columns)
+        self.tile_cells = tuple(tile_cells)
+        # Downsample: largest cell size such that the mosaic fits in max_size
+        self.gap = 2
+        fit = min((max_size[0] - self.gap * (self.columns - 1)) // (self.columns * self.tile_cells[0]),
+                  (max_size[1] - self.gap * (self.rows - 1)) // (self.rows * self.tile_cells[1]))
+        self.cell_px = max(1, min(max_cell_px, fit))
+        if self.cell_px < 4:
+            self.gap = 1
+        self.tile_px = (self.tile_cells[0] * self.cell_px, self.tile_cells[1] * self.cell_px)
+        self.counter_scale = self.cell_px // 4  # counters are not drawn on tiny tiles
+        self._templates = _tile_templates(self.cell_px)
+
+        width = self.columns * self.tile_px[0] + (self.columns - 1) * self.gap
+        height = self.rows * self.tile_px[1] + (self.rows - 1) * self.gap
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        self.frame[:] = SEPARATOR_COLOR
+        self._corners = [((k // self.columns) * (self.tile_px[1] + self.gap), (k % self.columns) * (self.tile_px[0] + self.gap))
+                         for k in range(len(self.envs))]
+        self._backgrounds = [None] * len(self.envs)  # cached (tile height, tile width, 3) grid and target
+        self._offsets = [None] * len(self.envs)  # cells added to the positions of an env in its tile
+        self._reloaded = [True] * len(self.envs)  # the whole tile must be redrawn
+        self._dirty = [[] for _ in self.envs]  # (old, new) cells moved since the last frame
+        self.moves = [0] * len(self.envs)  # moves since the last reset, the default counters
+        self._counters = [None] * len(self.envs)
+        self._listeners = [self._listener(k) for k in range(len(self.envs))]
+        for env, listener in zip(self.envs, self._listeners):
+            env.move_listeners.append(listener)
+        self.window = None
+        self._surface = None
+
+    def _listener(self, k):
+        def on_move(index, old, new):
+            if index < 0:
+                self._reloaded[k] = True
+                self._dirty[k].clear()
+                self.moves[k] = 0
+            else:
+                self._dirty[k].append((old, new))
+                self.moves[k] += 1
+        return on_move
+
+    def _tile(self, k):
+        top, left = self._corners[k]
+        return self.frame[top:top + self.tile_px[1], left:left + self.tile_px[0]]
+
+    def _cell(self, image, x, y):
+        return image[y * self.cell_px:(y + 1) * self.cell_px, x * self.cell_px:(x + 1) * self.cell_px]
+
+    def _inside(self, x, y):
+        return 0 <= x < self.tile_cells[0] and 0 <= y < self.tile_cells[1]
+
+    def _redraw_tile(self, k):
+        """Rasterize the background of a tile (the view follows the swarm, as in the env) and stamp the swarm."""
+        env = self.envs[k]
+        offset = np.asarray(view_origin(env.positions, self.tile_cells, 1), dtype=np.int64)
+        labels = np.zeros((self.tile_cells[1], self.tile_cells[0]), dtype=np.uint8)
+        local = env.target_positions + offset
+        inside = (local >= 0).all(axis=1) & (local[:, 0] < self.tile_cells[0]) & (local[:, 1] < self.tile_cells[1])
+        labels[local[inside, 1], local[inside, 0]] = TARGET
+        background = self._templates[labels].transpose(0, 2, 1, 3, 4).reshape(self.tile_px[1], self.tile_px[0], 3)
+        self._backgrounds[k] = background
+        self._offsets[k] = (int(offset[0]), int(offset[1]))
+        tile = self._tile(k)
+        tile[:] = background
+        for x, y in (env.positions + offset).tolist():
+            if self._inside(x, y):
+                self._cell(tile, x, y)[:] = self._templates[VOXEL]
+        self._counters[k] = None
+
+    def _update_tile(self, k):
+        """Copy the background back into the cells left by the electrovoxels and stamp the cells they entered.
+
+        Returns:
+            True if the tile changed
+        """
+        if self._reloaded[k]:
+            self._reloaded[k] = False
+            self._dirty[k].clear()
+            self._redraw_tile(k)
+            return True
+        if not self._dirty[k]:
+            return False
+        ox, oy = self._offsets[k]
+        if not all(self._inside(nx + ox, ny + oy) for _, (nx, ny) in self._dirty[k]):
+            # The swarm leaves the view: move the view
+            self._dirty[k].clear()
+            self._redraw_tile(k)
+            return True
+        tile, background = self._tile(k), self._backgrounds[k]
+        for (x, y), (nx, ny) in self._dirty[k]:
+            if self._inside(x + ox, y + oy):
+                self._cell(tile, x + ox, y + oy)[:] = self._cell(background, x + ox, y + oy)
+            self._cell(tile, nx + ox, ny + oy)[:] = self._templates[VOXEL]
+        self._dirty[k].clear()
+        return True
+
+    def _draw_counter(self, k, value):
+        """Counter in the top left corner of a tile, on an opaque box of COUNTER_DIGITS digits."""
+        s = self.counter_scale
+        text = str(value)[-COUNTER_DIGITS:]
+        box = self._tile(k)[:7 * s, :(4 * COUNTER_DIGITS + 1) * s]
+        box[:] = 255
+        for i, digit in enumerate(text):
+            glyph = np.repeat(np.repeat(_DIGITS[int(digit)], s, axis=0), s, axis=1)
+            box[s:6 * s, (4 * i + 1) * s:(4 * i + 4) * s][glyph] = 0
+        self._counters[k] = value
+
+    def render(self, counters=None):
+        """Update the changed tiles of the mosaic
+
+        Args:
+            counters: value shown in the corner of each tile, e.g. the steps of the episodes,
+                the moves since the last reset if None
+
+        Returns:
+            the (height, width, 3) uint8 frame with render_mode="rgb_array", updated in place
+            by the next calls; None with render_mode="human"
+        """
+        counters = self.moves if counters is None else counters
+        changed = []
+        for k in range(len(self.envs)):
+            redrawn = self._update_tile(k)
+            if self.counter_scale and (redrawn or counters[k] != self._counters[k]):
+                self._draw_counter(k, int(counters[k]))
+                redrawn = True
+            if redrawn:
+                changed.append(k)
+        if self.render_mode == "human":
+            self._display(changed)
+            return None
+        return self.frame
+
+    def _display(self, changed):
+        import pygame
+
+        height, width, _ = self.frame.shape
+        if self.window is None:
+            pygame.display.init()
+            pygame.display.set_caption(f"Electrovoxel x {len(self.envs)}")
+            self.window = pygame.display.set_mode((width, height))
+            # Surface over the memory of the frame: nothing is converted before blitting
+            self._surface = pygame.image.frombuffer(self.frame, (width, height), "RGB")
+            self.window.blit(self._surface, (0, 0))
+            pygame.display.flip()
+            return
+        pygame.event.pump()
+        rects = []
+        for k in changed:
+            top, left = self._corners[k]
+            rect = pygame.Rect(left, top, self.tile_px[0], self.tile_px[1])
+            self.window.blit(self._surface, rect, rect)
+            rects.append(rect)
+        pygame.display.update(rects)
+
+    def close(self):
+        for env, listener in zip(self.envs, self._listeners):
+            if listener in env.move_listeners:
+                env.move_listeners.remove(listener)
+        if self.window is not None:
+            import pygame
+
+            pygame.display.quit()
+            self.window = None
+            self._surface = None
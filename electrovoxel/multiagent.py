@@ -0,0 +1,239 @@
+"""Multi-agent electrovoxel swarms: every electrovoxel is an agent acting on its own 24-cell view.
+
+`SwarmBatch` is the array-native engine: B swarms of N electrovoxels in dense occupancy
+arrays, all N x B local observations computed in one vectorized pass and all N x B actions
+resolved simultaneously. `ParallelElectroVoxelenv` exposes a single swarm with a
+PettingZoo-parallel style dict-of-agents API on top of it.
+
+Simultaneous moves are resolved conservatively, in this order:
+- a move must be legal for the current configuration (see `electrovoxel.rules`) and stay in the world
+- a move is rejected if one of the electrovoxels it leans on also tries to move
+- when several moves share a destination, the electrovoxel with the lowest index wins
+- a move is rejected if a cell it sweeps through is the destination of another accepted move
+"""
+from typing import Optional
+
+import numpy as np
+
+from gym import spaces
+from electrovoxel.electrovoxel_2D import choose_shapes, load_shape
+from electrovoxel.grid import NEIGHBOR_OFFSETS, NUM_NEIGHBORS
+from electrovoxel.rules import DESTINATIONS_2D, DISPLACEMENTS_2D, EMPTY_2D, REQUIRED_2D
+from electrovoxel.utils import popcount
+
+NOOP = 8  # action of an electrovoxel that stays in place
+
+
+class SwarmBatch:
+    """B swarms of N electrovoxels stepped together
+
+    Args:
+        num_swarms: number of swarms B
+        num_voxels: number of electrovoxels N of each swarm
+        world_size: (width, height) of the world, moves leaving it are illegal
+    """
+
+    def __init__(self, num_swarms: int, num_voxels: int, world_size=(64, 64)):
+        self.num_swarms = num_swarms
+        self.num_voxels = num_voxels
+        self.world_size = tuple(world_size)
+        # Occupancy (voxel index + 1) padded by 2 cells, flattened for the gathers
+        self._width = world_size[0] + 4
+        self._plane = self._width * (world_size[1] + 4)
+        self.occupancy = np.zeros(num_swarms * self._plane, dtype=np.int32)
+        self._marks = np.zeros(num_swarms * self._plane, dtype=bool)
+        self._offsets = np.array([dy * self._width + dx for dx, dy in NEIGHBOR_OFFSETS], dtype=np.int64)
+        self._base = (np.arange(num_swarms, dtype=np.int64) * self._plane + 2 * self._width + 2)[:, None]
+
+        self.positions = np.zeros((num_swarms, num_voxels, 2), dtype=np.int64)
+        self._packed = np.zeros((num_swarms, num_voxels, 4), dtype=np.uint8)
+        self.codes = self._packed.view("<u4")[..., 0]  # (B, N) view on the packed bytes
+        self.target_codes = np.zeros((num_swarms, num_voxels), dtype="<u4")
+        self.similarity = np.zeros(num_swarms)
+        self._ids = np.arange(1, num_voxels + 1, dtype=np.int32)
+
+    def _cells(self, positions):
+        """Flat occupancy index of (..., 2) positions."""
+        return self._base + positions[..., 1] * self._width + positions[..., 0]
+
+    def _gather_codes(self, grid, cells, out=None):
+        """Neighborhood codes of `cells` in a flat boolean/integer grid."""
+        bits = grid[cells[..., None] + self._offsets] != 0
+        if out is None:
+            out = np.zeros(cells.shape + (4,), dtype=np.uint8)
+        out[..., :3] = np.packbits(bits, axis=-1, bitorder="little")
+        return out.view("<u4")[..., 0]
+
+    def reset(self, initial_positions, target_positions):
+        """Place the swarms
+
+        Args:
+            initial_positions: (B, N, 2) start positions
+            target_positions: (B, N, 2) target positions, only their shape matters
+        """
+        initial_positions = np.asarray(initial_positions, dtype=np.int64).reshape(self.positions.shape)
+        if (initial_positions < 0).any() or (initial_positions >= self.world_size).any():
+            raise ValueError(f"Initial positions do not fit in a world of size {self.world_size}.")
+        self.positions[:] = initial_positions
+        self.occupancy.fill(0)
+        self.occupancy[self._cells(self.positions)] = self._ids
+
+        # Target codes on a temporary grid, target shapes moved to the origin of the world
+        target_positions = np.asarray(target_positions, dtype=np.int64).reshape(self.positions.shape)
+        target_positions = target_positions - target_positions.min(axis=1, keepdims=True)
+        if (target_positions >= self.world_size).any():
+            raise ValueError(f"Target shapes do not fit in a world of size {self.world_size}.")
+        target_cells = self._cells(target_positions)
+        self._marks[target_cells] = True
+        self.target_codes[:] = np.sort(self._gather_codes(self._marks, target_cells), axis=1)
+        self._marks[target_cells] = False
+
+        self._gather_codes(self.occupancy, self._cells(self.positions), self._packed)
+        self.similarity = self._similarity()
+        return self.codes
+
+    def _similarity(self):
+        difference = popcount(np.sort(self.codes, axis=1) ^ self.target_codes).sum(axis=1)
+        return 1.0 - difference / (self.num_voxels * NUM_NEIGHBORS)
+
+    def unpacked_observations(self):
+        """(B, N, 24) uint8 local views, bit i for NEIGHBOR_OFFSETS[i]."""
+        return np.unpackbits(self._packed[..., :3], axis=-1, bitorder="little")
+
+    def step(self, actions):
+        """Resolve one action per electrovoxel simultaneously
+
+        Args:
+            actions: (B, N) actions in [0, 8], 8 being NOOP
+
+        Returns:
+            codes (B, N), team rewards (B,), terminated (B,), moved (B, N)
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.codes.shape)
+        active = actions != NOOP
+        a = np.where(active, actions, 0)
+        codes = self.codes[..., None]
+        variants = ((codes & REQUIRED_2D[a]) == REQUIRED_2D[a]) & ((codes & EMPTY_2D[a]) == 0)
+        v = variants.argmax(axis=-1)
+        legal = active & variants.any(axis=-1)
+        destination = self.positions + DISPLACEMENTS_2D[a, v]
+        legal &= ((destination >= 0) & (destination < self.world_size)).all(axis=-1)
+
+        # Electrovoxels leaning on a moving electrovoxel can't move
+        cells = self._cells(self.positions)
+        moving = cells[legal]
+        self._marks[moving] = True
+        leaning = (self._gather_codes(self._marks, cells) & REQUIRED_2D[a, v]) != 0
+        self._marks[moving] = False
+        legal &= ~leaning
+
+        # One electrovoxel per destination, the lowest index wins
+        destination_cells = self._cells(destination)
+        candidates = np.flatnonzero(legal)
+        _, first = np.unique(destination_cells.ravel()[candidates], return_index=True)
+        legal = np.zeros(legal.size, dtype=bool)
+        legal[candidates[first]] = True
+        legal = legal.reshape(self.codes.shape)
+
+        # Cells swept by a move must not be the destination of another move
+        arriving = destination_cells[legal]
+        self._marks[arriving] = True
+        swept = self._gather_codes(self._marks, cells) & EMPTY_2D[a, v] & ~DESTINATIONS_2D[a, v]
+        self._marks[arriving] = False
+        legal &= swept == 0
+
+        self.occupancy[cells[legal]] = 0
+        self.occupancy[destination_cells[legal]] = np.broadcast_to(self._ids, legal.shape)[legal]
+        self.positions[legal] = destination[legal]
+        self._gather_codes(self.occupancy, self._cells(self.positions), self._packed)
+
+        similarity = self._similarity()
+        terminated = similarity == 1.0
+        rewards = np.where(terminated, 1.0, np.maximum(0.0, similarity - self.similarity))
+        self.similarity = similarity
+        return self.codes, rewards, terminated, legal
+
+
+class ParallelElectroVoxelenv:
+    """
+    One swarm where every electrovoxel is an agent, with a PettingZoo-parallel style API.
+
+    Agents are named "voxel_<i>". Each observes its 24-cell neighborhood (MultiBinary(24))
+    and picks one of the 8 movements or NOOP (8). All actions are resolved simultaneously
+    by `SwarmBatch.step`; agents missing from the action dict stay in place. The reward is
+    shared by all agents: the gain in similarity with the target, 1 on a complete match.
+
+    ### Arguments
+    Same `Size` / `map_name` / `initial_shape` / `target_shape` as ElectroVoxelenv, plus
+    `max_steps` (truncation) and `world_size`.
+    """
+    metadata = {"render_modes": [], "name": "ElectroVoxel_parallel_v0"}
+
+    def __init__(
+        self,
+        Size=9,
+        map_name=["None", "None"],
+        initial_shape=None,
+        target_shape=None,
+        max_steps: int = 200,
+        world_size=(64, 64),
+    ):
+        self.map_name = list(map_name)
+        self.fixed_shapes = None if initial_shape is None else (initial_shape, target_shape)
+        self.size = Size if initial_shape is None else len(initial_shape)
+        self.max_steps = max_steps
+        self.engine = SwarmBatch(1, self.size, world_size)
+        self.possible_agents = [f"voxel_{i}" for i in range(self.size)]
+        self.agents = []
+        self.np_random = np.random.default_rng()
+        self._observation_space = spaces.MultiBinary(NUM_NEIGHBORS)
+        self._action_space = spaces.Discrete(9)
+
+    def observation_space(self, agent):
+        return self._observation_space
+
+    def action_space(self, agent):
+        return self._action_space
+
+    def _observations(self):
+        observations = self.engine.unpacked_observations()[0].astype(np.int8)
+        return {agent: observations[i] for i, agent in enumerate(self.possible_agents)}
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        options = options or {}
+        if "initial_shape" in options:
+            initial_shape, target_shape = options["initial_shape"], options["target_shape"]
+        elif self.fixed_shapes is not None and "map_name" not in options:
+            initial_shape, target_shape = self.fixed_shapes
+        else:
+            map_name = options.get("map_name", self.map_name)
+            shape1, shape2 = choose_shapes(self.size, map_name[0], map_name[1], np_random=self.np_random)
+            initial_shape, target_shape = load_shape(shape1), load_shape(shape2)
+        self.engine.reset(np.asarray(initial_shape)[None], np.asarray(target_shape)[None])
+        self.agents = list(self.possible_agents)
+        self.num_steps = 0
+        return self._observations(), {agent: {} for agent in self.agents}
+
+    def step(self, actions):
+        joint = np.full((1, self.size), NOOP, dtype=np.int64)
+        for agent, action in actions.items():
+            joint[0, int(agent[len("voxel_"):])] = action
+        _, rewards, terminated, moved = self.engine.step(joint)
+        self.num_steps += 1
+        truncated = not terminated[0] and self.num_steps >= self.max_steps
+
+        agents = self.agents
+        observations = self._observations()
+        reward = float(rewards[0])
+        result = (
+            observations,
+            {agent: reward for agent in agents},
+            {agent: bool(terminated[0]) for agent in agents},
+            {agent: truncated for agent in agents},
+            {agent: {"moved": bool(moved[0, i])} for i, agent in enumerate(agents)},
+        )
+        if terminated[0] or truncated:
+            self.agents = []
+        return result
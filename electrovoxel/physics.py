@@ -0,0 +1,183 @@
+"""Electrostatic energy and forces between the charged electrovoxels.
+
+Electrovoxels interact through a Coulomb potential `q_i * q_j / r` truncated at a cutoff
+radius (in cells). As they sit on a lattice, the pairs within the cutoff are found by
+looking up a fixed list of offsets in a spatial index of the occupied cells, a dense
+cell grid when the swarm is compact and a sorted hash of the cells otherwise, so the
+cost grows with N instead of N^2.
+"""
+import numpy as np
+
+
+def cutoff_offsets(cutoff: float, half: bool = False):
+    """Lattice offsets (dx, dy) with 0 < |d| <= cutoff
+
+    Args:
+        cutoff: cutoff radius in cells
+        half: keep one offset of each pair (d, -d), to count each pair of electrovoxels once
+
+    Returns:
+        (K, 2) int64 array
+    """
+    r = int(np.floor(cutoff))
+    offsets = [
+        (dx, dy) for dy in range(-r, r + 1) for dx in range(-r, r + 1)
+        if 0 < dx * dx + dy * dy <= cutoff * cutoff and (not half or dy > 0 or (dy == 0 and dx > 0))
+    ]
+    return np.array(offsets, dtype=np.int64).reshape(-1, 2)
+
+
+def neighbor_pairs(positions, cutoff: float):
+    """All pairs of electrovoxels closer than the cutoff
+
+    Args:
+        positions: (N, 2) integer positions
+        cutoff: cutoff radius in cells
+
+    Returns:
+        i, j (P,) index arrays and d (P, 2) = positions[j] - positions[i], each pair once
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    offsets = cutoff_offsets(cutoff, half=True)
+    if len(positions) == 0 or len(offsets) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros((0, 2), dtype=np.int64)
+    r = int(np.floor(cutoff))
+    low = positions.min(axis=0) - r
+    extent = positions.max(axis=0) + r - low + 1
+
+    i_parts, j_parts, d_parts = [], [], []
+    if extent[0] * extent[1] <= 16 * len(positions) + 1024:
+        # Compact swarm: dense cell list holding index + 1
+        cells = np.zeros((extent[1], extent[0]), dtype=np.int64)
+        local = positions - low
+        cells[local[:, 1], local[:, 0]] = np.arange(1, len(positions) + 1)
+        for d in offsets:
+            j = cells[local[:, 1] + d[1], local[:, 0] + d[0]] - 1
+            i = np.flatnonzero(j >= 0)
+            i_parts.append(i)
+            j_parts.append(j[i])
+            d_parts.append(np.broadcast_to(d, (len(i), 2)))
+    else:
+        # Sparse swarm: binary search in the sorted cell keys
+        width = int(extent[0])
+        keys = (positions[:, 1] - low[1]) * width + (positions[:, 0] - low[0])
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        for d in offsets:
+            shifted = keys + d[1] * width + d[0]
+            k = np.minimum(np.searchsorted(sorted_keys, shifted), len(keys) - 1)
+            i = np.flatnonzero(sorted_keys[k] == shifted)
+            i_parts.append(i)
+            j_parts.append(order[k[i]])
+            d_parts.append(np.broadcast_to(d, (len(i), 2)))
+    return np.concatenate(i_parts), np.concatenate(j_parts), np.concatenate(d_parts)
+
+
+def energy(positions, charges, cutoff: float = 3.0):
+    """Total electrostatic energy of a swarm."""
+    i, j, d = neighbor_pairs(positions, cutoff)
+    charges = np.asarray(charges, dtype=np.float64)
+    return float((charges[i] * charges[j] / np.hypot(d[:, 0], d[:, 1])).sum())
+
+
+def forces(positions, charges, cutoff: float = 3.0):
+    """Electrostatic forces on each electrovoxel
+
+    Each pair acts through one face of each electrovoxel: the face looking toward the other
+    electrovoxel along the dominant component of their offset (x on ties).
+
+    Returns:
+        force (N, 2) and per-face forces (N, 4): on the left, right, top and bottom faces, the
+        sum of the pair forces acting through the face, projected on its outward normal
+        (positive when pulled outward, negative when pushed inward)
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    charges = np.asarray(charges, dtype=np.float64)
+    i, j, d = neighbor_pairs(positions, cutoff)
+    r = np.hypot(d[:, 0], d[:, 1])
+    # Force on j from i, i gets the opposite
+    pair = (charges[i] * charges[j] / r ** 3)[:, None] * d
+    force = np.zeros(positions.shape, dtype=np.float64)
+    np.add.at(force, j, pair)
+    np.add.at(force, i, -pair)
+    # j sees i through the face opposite to d, i sees j through the face along d; the
+    # outward normal component is the same for both
+    axis = (np.abs(d[:, 1]) > np.abs(d[:, 0])).astype(np.int64)
+    rows = np.arange(len(d))
+    positive = d[rows, axis] > 0
+    normal = -pair[rows, axis] * np.where(positive, 1.0, -1.0)
+    faces = np.zeros((len(positions), 4), dtype=np.float64)
+    np.add.at(faces, (j, 2 * axis + (~positive).astype(np.int64)), normal)
+    np.add.at(faces, (i, 2 * axis + positive.astype(np.int64)), normal)
+    return force, faces
+
+
+def site_energy(grid, charges, index, cell, cutoff: float = 3.0, offsets=None):
+    """Energy of the electrovoxel `index` if it was at `cell`, the rest of the swarm fixed
+
+    Args:
+        grid: ChunkedGrid holding `index + 1` in the cells of the electrovoxels
+        charges: (N,) charges
+        index: the electrovoxel, ignored if met in the grid
+        cell: (x, y)
+        offsets: result of `cutoff_offsets(cutoff)`, computed if None
+    """
+    if offsets is None:
+        offsets = cutoff_offsets(cutoff)
+    x, y = cell
+    total = 0.0
+    for dx, dy in offsets.tolist():
+        j = grid.get(x + dx, y + dy) - 1
+        if j >= 0 and j != index:
+            total += charges[j] / np.sqrt(dx * dx + dy * dy)
+    return float(charges[index] * total)
+
+
+def delta_energy(grid, charges, index, old, new, cutoff: float = 3.0, offsets=None):
+    """Change of the total energy when the electrovoxel `index` moves from `old` to `new`, in O(cutoff^2)."""
+    if offsets is None:
+        offsets = cutoff_offsets(cutoff)
+    return site_energy(grid, charges, index, new, cutoff, offsets) - site_energy(grid, charges, index, old, cutoff, offsets)
+
+
+def batch_energy(positions, charges, cutoff: float = 3.0):
+    """Energies of a batch of configurations
+
+    The cells of all the configurations are binned together: each configuration gets its own
+    block of keys (a padded box around its cells), the keys are sorted once, and the pairs are
+    the hits of the `cutoff_offsets` lookups in the sorted keys, as in `neighbor_pairs`. The
+    memory and time grow with B * N, not with N^2.
+
+    Args:
+        positions: (B, N, 2) integer positions
+        charges: (N,) or (B, N) charges
+
+    Returns:
+        (B,) energies
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    num_configs, n = positions.shape[:2]
+    charges = np.broadcast_to(np.asarray(charges, dtype=np.float64), (num_configs, n)).reshape(-1)
+    offsets = cutoff_offsets(cutoff, half=True)
+    if num_configs == 0 or n == 0 or len(offsets) == 0:
+        return np.zeros(num_configs)
+    r = int(np.floor(cutoff))
+    # Local cells of each configuration, with a margin of r cells so that the shifted keys stay in its block
+    local = positions - positions.min(axis=1, keepdims=True) + r
+    width = int(local[..., 0].max()) + r + 1
+    height = int(local[..., 1].max()) + r + 1
+    keys = (np.arange(num_configs, dtype=np.int64)[:, None] * height + local[..., 1]) * width + local[..., 0]
+    keys = keys.reshape(-1)
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    energies = np.zeros(num_configs)
+    config = np.repeat(np.arange(num_configs), n)
+    for dx, dy in offsets.tolist():
+        shifted = keys + dy * width + dx
+        k = np.minimum(np.searchsorted(sorted_keys, shifted), len(keys) - 1)
+        i = np.flatnonzero(sorted_keys[k] == shifted)
+        j = order[k[i]]
+        energies += np.bincount(config[i], charges[i] * charges[j], minlength=num_configs) / np.hypot(dx, dy)
+    return energies
@@ -0,0 +1,350 @@
+"""Tabular Q-learning on ElectroVoxelenv.
+
+The state of a decision is the configuration of the swarm (its Zobrist hash
+`env.config_hash`, combined with the target shape) and the electrovoxel to move; its
+row holds the Q-values of the 8 movements. Rows live in `QTable`, an open-addressing hash
+table of NumPy arrays keyed by 64-bit hashes, so lookups and updates of a whole batch of
+states are a few vectorized probes instead of dictionary accesses.
+
+`QLearningTrainer` steps several envs side by side with epsilon-greedy actions restricted
+to the legal movements, and applies the updates of all the envs in one batch per step.
+
+Usage:
+    python -m electrovoxel.qlearning --size 9 --envs 16 --steps 20000
+"""
+import argparse
+import time
+from typing import Optional
+
+import numpy as np
+
+from electrovoxel.rules import legal_moves_2d
+from electrovoxel.utils import cell_hash, splitmix64
+
+NUM_MOVES = 8
+_EMPTY = np.uint64(0)  # key of the free slots, a state hashed to 0 is stored under _ZERO_KEY
+_ZERO_KEY = np.uint64(0x9E3779B97F4A7C15)
+
+
+def state_keys(config_hash: int, num_voxels: int, target_key: int = 0):
+    """Keys of the rows of every electrovoxel of a configuration
+
+    Args:
+        config_hash: `env.config_hash`
+        num_voxels: number of electrovoxels N
+        target_key: non-negative 64-bit key of the target shape (see `target_key`), keeps the
+            values of different targets apart
+
+    Returns:
+        (N,) uint64 keys
+    """
+    if not 0 <= target_key < 1 << 64:
+        raise ValueError(f"The target key must be a non-negative 64-bit integer, got {target_key}.")
+    salt = splitmix64(np.arange(num_voxels, dtype=np.uint64) ^ splitmix64(np.uint64(target_key)))
+    return splitmix64(np.uint64(config_hash) ^ salt)
+
+
+def target_key(env):
+    """Key of the target of an env: its shape ID, or the hash of its cells for the targets that
+    are not in the catalog (shape ID -1)."""
+    if env.shape_ids[1] >= 0:
+        return int(env.shape_ids[1])
+    return int(np.bitwise_xor.reduce(cell_hash(env.target_positions)))
+
+
+class QTable:
+    """Open-addressing hash table of float32 rows of Q-values
+
+    Keys are 64-bit hashes, probed linearly from their low bits. The table doubles when its
+    load passes `max_load`; `compact` drops the rarely visited states.
+
+    Args:
+        capacity: initial number of slots, rounded up to a power of two
+        num_actions: width of a row
+        max_load: maximal fraction of used slots
+        initial_value: value of the rows of new states
+    """
+
+    def __init__(self, capacity: int = 1 << 16, num_actions: int = NUM_MOVES, max_load: float = 0.7, initial_value: float = 0.0):
+        if not 0 < max_load < 1:
+            raise ValueError("max_load must be in (0, 1).")
+        self.num_actions = num_actions
+        self.max_load = max_load
+        self.initial_value = initial_value
+        self._allocate(1 << max(4, int(capacity - 1).bit_length()))
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.mask = np.uint64(capacity - 1)
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.values = np.full((capacity, self.num_actions), self.initial_value, dtype=np.float32)
+        self.visits = np.zeros(capacity, dtype=np.uint32)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes + self.visits.nbytes
+
+    def slots(self, keys, insert: bool = False):
+        """Slots of an array of keys
+
+        Args:
+            keys: uint64 keys, any shape
+            insert: give a slot to the missing keys, otherwise their slot is -1
+
+        Returns:
+            int64 slots, same shape as `keys`
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        shape = keys.shape
+        keys = keys.ravel()
+        keys = np.where(keys == _EMPTY, _ZERO_KEY, keys)
+        if insert and self.size + len(keys) > self.max_load * self.capacity:
+            self._resize(self.size + len(keys))
+
+        result = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        position = (keys & self.mask).astype(np.int64)
+        while len(pending):
+            found = self.keys[position] == keys[pending]
+            result[pending[found]] = position[found]
+            free = self.keys[position] == _EMPTY
+            if insert and free.any():
+                # Claim the free slots; when several keys claim the same slot one of them
+                # wins, the others see it taken and keep probing
+                claimed = position[free]
+                self.keys[claimed] = keys[pending[free]]
+                won = free & (self.keys[position] == keys[pending])
+                result[pending[won]] = position[won]
+                self.size += len(np.unique(position[won]))  # repeated keys share their slot
+                found |= won
+            elif not insert:
+                found |= free
+            pending = pending[~found]
+            position = (position[~found] + 1) & (self.capacity - 1)
+        return result.reshape(shape)
+
+    def lookup(self, keys):
+        """Rows of an array of keys of shape S, as a S + (num_actions,) array (`initial_value` for unknown keys)."""
+        slots = self.slots(keys)
+        rows = self.values[np.maximum(slots, 0)]
+        rows[slots < 0] = self.initial_value
+        return rows
+
+    def _rebuild(self, capacity, keep):
+        keys, values, visits = self.keys[keep], self.values[keep], self.visits[keep]
+        self._allocate(capacity)
+        slots = self.slots(keys, insert=True)
+        self.values[slots] = values
+        self.visits[slots] = visits
+
+    def _resize(self, needed):
+        capacity = self.capacity
+        while needed > self.max_load * capacity:
+            capacity *= 2
+        self._rebuild(capacity, self.keys != _EMPTY)
+
+    def compact(self, min_visits: int = 2, max_size: Optional[int] = None, decay: bool = True):
+        """Drop the rarely visited states and rehash the others
+
+        Args:
+            min_visits: states visited less often are dropped
+            max_size: if set, keep at most this many states, the most visited ones
+            decay: halve the visit counts of the kept states, so that old visits count less
+
+        Returns:
+            number of dropped states
+        """
+        used = self.keys != _EMPTY
+        keep = used & (self.visits >= min_visits)
+        if max_size is not None and keep.sum() > max_size:
+            threshold = np.sort(self.visits[keep])[-max_size]
+            keep &= self.visits > threshold
+            ties = np.flatnonzero(used & (self.visits == threshold))
+            keep[ties[:max_size - int(keep.sum())]] = True
+        dropped = self.size - int(keep.sum())
+        capacity = self.capacity
+        while capacity > 16 and keep.sum() < self.max_load * capacity / 4:
+            capacity //= 2
+        self._rebuild(capacity, keep)
+        if decay:
+            self.visits >>= 1
+        return dropped
+
+    def update(self, keys, actions, targets, alpha: float):
+        """Move Q(key, action) towards the targets
+
+        Args:
+            keys: (B,) keys, inserted if needed
+            actions: (B,) actions
+            targets: (B,) target values
+            alpha: learning rate
+        """
+        slots = self.slots(keys, insert=True)
+        actions = np.asarray(actions, dtype=np.int64)
+        errors = np.asarray(targets, dtype=np.float32) - self.values[slots, actions]
+        # Repeated (state, action) pairs add up their corrections
+        np.add.at(self.values, (slots, actions), np.float32(alpha) * errors)
+        np.add.at(self.visits, slots, 1)
+        return errors
+
+
+class QLearningTrainer:
+    """Epsilon-greedy Q-learning over a list of ElectroVoxelenv
+
+    Args:
+        envs: list of ElectroVoxelenv, stepped side by side
+        table: QTable, a new one if None
+        alpha: learning rate
+        gamma: discount factor
+        epsilon: probability of a random legal move
+        max_episode_steps: steps before an episode is truncated
+        compact_every: if set, `table.compact(min_visits)` every this many steps
+        min_visits: see `compact_every`
+        seed: seed of the exploration
+    """
+
+    def __init__(
+        self,
+        envs,
+        table: Optional[QTable] = None,
+        alpha: float = 0.1,
+        gamma: float = 0.99,
+        epsilon: float = 0.1,
+        max_episode_steps: int = 200,
+        compact_every: Optional[int] = None,
+        min_visits: int = 2,
+        seed: Optional[int] = None,
+    ):
+        self.envs = list(envs)
+        self.table = table if table is not None else QTable()
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.max_episode_steps = max_episode_steps
+        self.compact_every = compact_every
+        self.min_visits = min_visits
+        self.np_random = np.random.default_rng(seed)
+        self.num_updates = 0
+        self.num_episodes = 0
+        self.episode_returns = []
+        self._started = False
+
+    def _keys(self, env):
+        return state_keys(env.config_hash, env.size, target_key(env))
+
+    def _start(self, i):
+        env = self.envs[i]
+        env.reset(seed=int(self.np_random.integers(1 << 31)))
+        self._steps[i] = 0
+        self._returns[i] = 0.0
+        self._keys_now[i] = self._keys(env)
+
+    def _reset_all(self):
+        self._steps = np.zeros(len(self.envs), dtype=np.int64)
+        self._returns = np.zeros(len(self.envs))
+        self._keys_now = [None] * len(self.envs)
+        for i in range(len(self.envs)):
+            self._start(i)
+        self._started = True
+
+    def act(self, keys, codes, epsilon: float):
+        """Epsilon-greedy (electrovoxel, movement) among the legal moves of a configuration."""
+        legal = legal_moves_2d(codes)
+        if not legal.any():
+            return int(self.np_random.integers(len(codes))), int(self.np_random.integers(NUM_MOVES))
+        if self.np_random.random() < epsilon:
+            choices = np.flatnonzero(legal)
+        else:
+            q = np.where(legal, self.table.lookup(keys), -np.inf)
+            choices = np.flatnonzero(q == q.max())
+        flat = int(choices[self.np_random.integers(len(choices))])
+        return flat // NUM_MOVES, flat % NUM_MOVES
+
+    def step(self):
+        """One step of every env followed by one batched update; returns the number of updates."""
+        if not self._started:
+            self._reset_all()
+        num_envs = len(self.envs)
+        keys = np.zeros(num_envs, dtype=np.uint64)
+        actions = np.zeros(num_envs, dtype=np.int64)
+        rewards = np.zeros(num_envs)
+        bootstrap = np.zeros(num_envs, dtype=bool)
+        next_keys, next_codes = [], []
+        for i, env in enumerate(self.envs):
+            voxel, move = self.act(self._keys_now[i], env.codes, self.epsilon)
+            keys[i], actions[i] = self._keys_now[i][voxel], move
+            _, rewards[i], terminated, _, _ = env.step((voxel, move))
+            self._steps[i] += 1
+            self._returns[i] += rewards[i]
+            bootstrap[i] = not terminated
+            self._keys_now[i] = self._keys(env)
+            next_keys.append(self._keys_now[i])
+            next_codes.append(env.codes.copy())
+            if terminated or self._steps[i] >= self.max_episode_steps:
+                self.num_episodes += 1
+                self.episode_returns.append(self._returns[i])
+                self._start(i)
+
+        # Value of the next configurations: best legal move over all their electrovoxels
+        values = np.zeros(num_envs)
+        for i in np.flatnonzero(bootstrap):
+            legal = legal_moves_2d(next_codes[i])
+            if legal.any():
+                values[i] = self.table.lookup(next_keys[i])[legal].max()
+        self.table.update(keys, actions, rewards + self.gamma * values * bootstrap, self.alpha)
+
+        previous = self.num_updates
+        self.num_updates += num_envs
+        if self.compact_every and self.num_updates // self.compact_every > previous // self.compact_every:
+            self.table.compact(self.min_visits)
+        return num_envs
+
+    def train(self, num_steps: int, log_every: Optional[int] = None):
+        """Run `num_steps` steps of every env
+
+        Returns:
+            dict with "updates", "updates_per_sec", "episodes", "states" and "mean_return"
+            (over the episodes finished during the call)
+        """
+        start, first_episode, updates = time.perf_counter(), len(self.episode_returns), 0
+        for t in range(num_steps):
+            updates += self.step()
+            if log_every and (t + 1) % log_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"step {t + 1}: {updates / elapsed:.0f} updates/s, {len(self.table)} states, {self.num_episodes} episodes")
+        elapsed = time.perf_counter() - start
+        returns = self.episode_returns[first_episode:]
+        return {
+            "updates": updates,
+            "updates_per_sec": updates / elapsed if elapsed > 0 else float("inf"),
+            "episodes": len(returns),
+            "states": len(self.table),
+            "mean_return": float(np.mean(returns)) if returns else float("nan"),
+        }
+
+
+def main():
+    from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+
+    parser = argparse.ArgumentParser(description="Tabular Q-learning on ElectroVoxelenv.")
+    parser.add_argument("--size", type=int, default=9, help="number of electrovoxels")
+    parser.add_argument("--envs", type=int, default=16, help="number of envs stepped together")
+    parser.add_argument("--steps", type=int, default=10000, help="steps of every env")
+    parser.add_argument("--map", nargs=2, default=["None", "None"], help="start and target shapes")
+    parser.add_argument("--epsilon", type=float, default=0.1)
+    parser.add_argument("--compact-every", type=int, default=None, help="updates between two compactions")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    envs = [ElectroVoxelenv(Size=args.size, map_name=args.map) for _ in range(args.envs)]
+    trainer = QLearningTrainer(envs, epsilon=args.epsilon, compact_every=args.compact_every, seed=args.seed)
+    stats = trainer.train(args.steps, log_every=max(1, args.steps // 10))
+    print(", ".join(f"{name}: {value:.4g}" if isinstance(value, float) else f"{name}: {value}" for name, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
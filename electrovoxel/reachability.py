@@ -0,0 +1,125 @@
+"""Cells reachable by one electrovoxel moving over the surface of the rest of the swarm.
+
+The reachable set of an electrovoxel is a breadth-first search over its legal single moves,
+everyone else staying in place. It only depends on the occupancy of the cells read during
+the search (the 5x5 windows of the explored cells), its footprint. Results are cached per
+electrovoxel with their footprint; when an electrovoxel moves, only the entries whose
+footprint contains its old or new cell are dropped, and removed from all their footprint cells.
+"""
+from collections import deque
+
+import numpy as np
+
+from electrovoxel.grid import NEIGHBOR_OFFSETS
+from electrovoxel.rules import DISPLACEMENTS_2D, legal_variants_2d
+
+_WINDOW = NEIGHBOR_OFFSETS + ((0, 0),)
+
+
+def surface_search(grid, start, max_cells: int = 100000):
+    """Breadth-first search of the moves of the electrovoxel at `start`, the rest of `grid` fixed
+
+    The start cell must already be cleared from the grid.
+
+    Returns:
+        parents dict {cell: (previous cell, movement) or None for start}
+    """
+    parents = {start: None}
+    queue = deque([start])
+    while queue and len(parents) < max_cells:
+        current = queue.popleft()
+        variants = legal_variants_2d(grid.neighborhood_code(*current))
+        for a, v in zip(*np.nonzero(variants)):
+            dx, dy = DISPLACEMENTS_2D[a, v]
+            following = (current[0] + int(dx), current[1] + int(dy))
+            if following not in parents:
+                parents[following] = (current, int(a))
+                queue.append(following)
+    return parents
+
+
+class ReachabilityCache:
+    """Cached reachability queries on an ElectroVoxelenv
+
+    Use `ReachabilityCache.for_env(env)` to share one cache per env; it registers itself in
+    `env.move_listeners` to be invalidated by the moves.
+    """
+
+    def __init__(self, env, max_cells: int = 100000):
+        self.env = env
+        self.max_cells = max_cells
+        self.entries = {}  # index -> (parents, cells array, footprint set)
+        self.readers = {}  # cell -> set of indices whose entry read that cell
+        self.hits = 0
+        self.misses = 0
+        env.move_listeners.append(self._on_move)
+
+    @classmethod
+    def for_env(cls, env):
+        cache = getattr(env, "reachability", None)
+        if cache is None:
+            cache = cls(env)
+            env.reachability = cache
+        return cache
+
+    def _on_move(self, index, old, new):
+        if index < 0:
+            self.entries.clear()
+            self.readers.clear()
+            return
+        self._drop(index)
+        for cell in (old, new):
+            for reader in list(self.readers.get(cell, ())):
+                self._drop(reader)
+
+    def _drop(self, index):
+        """Remove the entry of `index` and its index from the readers of its footprint."""
+        entry = self.entries.pop(index, None)
+        if entry is None:
+            return
+        for cell in entry[2]:
+            readers = self.readers[cell]
+            readers.discard(index)
+            if not readers:
+                del self.readers[cell]
+
+    def _entry(self, index):
+        entry = self.entries.get(index)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        grid = self.env.grid
+        start = (int(self.env.positions[index, 0]), int(self.env.positions[index, 1]))
+        grid.clear(*start)
+        try:
+            parents = surface_search(grid, start, self.max_cells)
+        finally:
+            grid.set(start[0], start[1], index + 1)
+
+        footprint = {(x + dx, y + dy) for x, y in parents for dx, dy in _WINDOW}
+        for cell in footprint:
+            self.readers.setdefault(cell, set()).add(index)
+        entry = (parents, np.array(list(parents), dtype=np.int64), footprint)
+        self.entries[index] = entry
+        return entry
+
+    def reachable(self, index):
+        """(K, 2) array of the cells the electrovoxel `index` can reach, its own cell first."""
+        return self._entry(index)[1]
+
+    def can_reach(self, index, cell):
+        return (int(cell[0]), int(cell[1])) in self._entry(index)[0]
+
+    def path(self, index, cell):
+        """Shortest list of movements taking the electrovoxel `index` to `cell`, None if unreachable."""
+        parents = self._entry(index)[0]
+        cell = (int(cell[0]), int(cell[1]))
+        if cell not in parents:
+            return None
+        path = []
+        while parents[cell] is not None:
+            cell, a = parents[cell]
+            path.append(a)
+        return path[::-1]
@@ -0,0 +1,252 @@
+"""Compact binary recording of ElectroVoxelenv episodes and deterministic replay.
+
+A recording is a directory holding two append-only files of packed records:
+
+- `episodes.bin`: one EPISODE_DTYPE record per episode (size, shape IDs, seed, first step, number of steps)
+- `steps.bin`: one STEP_DTYPE record per step (electrovoxel, action, reward)
+- `config.json`: the reward and observation arguments of the env (ENV_CONFIG_KEYS), shared by
+  all the episodes of the recording
+
+Records are buffered in chunks and written with a single call per chunk. Both files can be
+memory-mapped with `EpisodeLog`, so millions of episodes can be read without loading them.
+Frames are never stored: `replay` re-simulates an episode from its shape IDs, seed and actions,
+in an env built with the recorded configuration.
+
+Usage:
+    python -m electrovoxel.recording <directory> <episode> [--render]
+"""
+import argparse
+import json
+import os
+from os import path
+from typing import Optional
+
+import numpy as np
+
+from gym import Wrapper
+
+EPISODE_DTYPE = np.dtype([
+    ("size", "<u4"),
+    ("start_id", "<i4"),
+    ("target_id", "<i4"),
+    ("num_steps", "<u4"),
+    ("seed", "<i8"),
+    ("first_step", "<u8"),
+])
+STEP_DTYPE = np.dtype([("voxel", "<u4"), ("action", "u1"), ("reward", "<f4")])  # 9 bytes, unaligned
+
+EPISODES_FILE = "episodes.bin"
+STEPS_FILE = "steps.bin"
+CONFIG_FILE = "config.json"
+
+# Arguments of ElectroVoxelenv that change the rewards or the observations of an episode
+ENV_CONFIG_KEYS = ("observation_mode", "graph_connectivity", "energy_weight", "cutoff", "distance_weight", "shaping_weight")
+
+
+def env_config(env):
+    """Values of the ENV_CONFIG_KEYS arguments of an ElectroVoxelenv, as a JSON-serializable dict."""
+    env = env.unwrapped
+    return {key: getattr(env, key) for key in ENV_CONFIG_KEYS}
+
+
+class EpisodeRecorder:
+    """Append episodes to a recording directory.
+
+    Args:
+        directory: recording directory, created if needed. Existing recordings are appended to.
+        chunk_size: number of steps buffered in memory before being written
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 1 << 16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._steps_file = open(path.join(directory, STEPS_FILE), "ab")
+        self._episodes_file = open(path.join(directory, EPISODES_FILE), "ab")
+        self._steps = np.zeros(chunk_size, dtype=STEP_DTYPE)
+        self._episodes = np.zeros(max(1, chunk_size // 64), dtype=EPISODE_DTYPE)
+        self._num_buffered_steps = 0
+        self._num_buffered_episodes = 0
+        self._total_steps = self._steps_file.tell() // STEP_DTYPE.itemsize
+        self._episode = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def set_config(self, config: dict):
+        """Record the env configuration of the episodes (see `env_config`).
+
+        Raises:
+            ValueError: if the recording already holds episodes of another configuration
+        """
+        filename = path.join(self.directory, CONFIG_FILE)
+        config = json.loads(json.dumps(config))
+        if path.exists(filename):
+            with open(filename) as file:
+                recorded = json.load(file)
+            if recorded != config:
+                raise ValueError(f"{self.directory} holds episodes of another env configuration: {recorded}.")
+            return
+        with open(filename, "w") as file:
+            json.dump(config, file)
+
+    def begin(self, size: int, start_id: int, target_id: int, seed: int):
+        """Start a new episode, the current one is ended first."""
+        if self._episode is not None:
+            self.end()
+        self._episode = (size, start_id, target_id, 0, seed, self._total_steps)
+
+    def record(self, voxel: int, action: int, reward: float):
+        if self._episode is None:
+            raise ValueError("No episode in progress, call begin() first.")
+        self._steps[self._num_buffered_steps] = (voxel, action, reward)
+        self._num_buffered_steps += 1
+        self._total_steps += 1
+        if self._num_buffered_steps == len(self._steps):
+            self._flush_steps()
+
+    def end(self):
+        """End the current episode, if any."""
+        if self._episode is None:
+            return
+        size, start_id, target_id, _, seed, first_step = self._episode
+        self._episodes[self._num_buffered_episodes] = (size, start_id, target_id, self._total_steps - first_step, seed, first_step)
+        self._num_buffered_episodes += 1
+        self._episode = None
+        if self._num_buffered_episodes == len(self._episodes):
+            self.flush()
+
+    def _flush_steps(self):
+        self._steps_file.write(self._steps[:self._num_buffered_steps].tobytes())
+        self._num_buffered_steps = 0
+
+    def flush(self):
+        # Steps are written before the episodes that refer to them
+        self._flush_steps()
+        self._steps_file.flush()
+        self._episodes_file.write(self._episodes[:self._num_buffered_episodes].tobytes())
+        self._episodes_file.flush()
+        self._num_buffered_episodes = 0
+
+    def close(self):
+        self.end()
+        self.flush()
+        self._steps_file.close()
+        self._episodes_file.close()
+
+
+def _memmap(filename, dtype):
+    # np.memmap can't map an empty file
+    if not path.exists(filename) or path.getsize(filename) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r", shape=(path.getsize(filename) // dtype.itemsize,))
+
+
+class EpisodeLog:
+    """Read-only, memory-mapped view of a recording directory.
+
+    `config` holds the recorded env configuration, empty (the default env) when the recording has none.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.episodes = _memmap(path.join(directory, EPISODES_FILE), EPISODE_DTYPE)
+        self.all_steps = _memmap(path.join(directory, STEPS_FILE), STEP_DTYPE)
+        self.config = {}
+        filename = path.join(directory, CONFIG_FILE)
+        if path.exists(filename):
+            with open(filename) as file:
+                self.config = json.load(file)
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def steps(self, i: int):
+        """Steps of the episode `i`, as a view into the memory-mapped steps file."""
+        episode = self.episodes[i]
+        first = int(episode["first_step"])
+        return self.all_steps[first:first + int(episode["num_steps"])]
+
+
+class RecordEpisode(Wrapper):
+    """Record every episode of an ElectroVoxelenv into an EpisodeRecorder.
+
+    When `reset` is called without a seed, a seed is drawn so that the episode can be replayed.
+    The reward and observation arguments of the env are stored with the recording.
+    """
+
+    def __init__(self, env, recorder: EpisodeRecorder):
+        super().__init__(env)
+        self.recorder = recorder
+        recorder.set_config(env_config(env))
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (1 << 63))
+        observation, info = self.env.reset(seed=seed, options=options)
+        start_id, target_id = self.env.unwrapped.shape_ids
+        self.recorder.begin(self.env.unwrapped.size, start_id, target_id, seed)
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        self.recorder.record(int(action[0]), int(action[1]), reward)
+        return observation, reward, terminated, truncated, info
+
+    def close(self):
+        self.recorder.end()
+        super().close()
+
+
+def replay(log: EpisodeLog, i: int, render_mode: Optional[str] = None, check: bool = True):
+    """Re-simulate the episode `i` of a recording
+
+    Args:
+        log: the recording
+        i: index of the episode
+        render_mode: render mode of the environment, it is rendered after each step if not None
+        check: raise an error if the rewards differ from the recorded ones
+
+    Returns:
+        the environment in the final state of the episode
+    """
+    from electrovoxel.electrovoxel_2D import ElectroVoxelenv, shape_catalog
+
+    episode = log.episodes[i]
+    if episode["start_id"] < 0 or episode["target_id"] < 0:
+        raise ValueError(f"Episode {i} does not use shapes from the catalog and can't be replayed.")
+    size = int(episode["size"])
+    catalog = shape_catalog(size)
+    map_name = [catalog[int(episode["start_id"])], catalog[int(episode["target_id"])]]
+
+    env = ElectroVoxelenv(render_mode=render_mode, Size=size, map_name=map_name, **log.config)
+    env.reset(seed=int(episode["seed"]), options={"map_name": map_name})
+    if render_mode is not None:
+        env.render()
+    steps = log.steps(i)
+    for k, (voxel, action, recorded_reward) in enumerate(steps.tolist()):
+        _, reward, _, _, _ = env.step((voxel, action))
+        if render_mode is not None:
+            env.render()
+        if check and np.float32(reward) != np.float32(recorded_reward):
+            raise RuntimeError(f"Replay of episode {i} diverged at step {k}: reward {reward} instead of {recorded_reward}.")
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded ElectroVoxel episode.")
+    parser.add_argument("directory", help="recording directory")
+    parser.add_argument("episode", type=int, help="index of the episode")
+    parser.add_argument("--render", action="store_true", help="display the episode")
+    args = parser.parse_args()
+
+    log = EpisodeLog(args.directory)
+    env = replay(log, args.episode, render_mode="human" if args.render else None)
+    print(f"Episode {args.episode}: {len(log.steps(args.episode))} steps, similarity {env.similarity:.3f}")
+    env.close()
+
+
+if __name__ == "__main__":
+    main()
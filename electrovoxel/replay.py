@@ -0,0 +1,263 @@
+"""Compact replay buffer for deep Q-learning on ElectroVoxelenv.
+
+Observations are stored once, in a ring of their own, bit-packed when they are binary
+("neighborhood" and "image" modes). A transition only holds the position of its state in
+that ring, the next state being always the following observation, plus the moved
+electrovoxel, the action, the reward and the termination flag (TRANSITION_DTYPE, 18 bytes).
+With `directory`, both rings are memory-mapped files, so tens of millions of transitions
+fit on local disk and in the page cache.
+
+Sampling is vectorized: uniform, or proportional to priorities kept in a sum-tree
+(prioritized experience replay).
+
+Usage:
+    buffer = ReplayBuffer(1 << 24, env.observation_space.shape, pack_bits=True)
+    observation, _ = env.reset()
+    buffer.begin(observation)
+    observation, reward, terminated, truncated, _ = env.step((voxel, action))
+    buffer.add(voxel, action, reward, observation, terminated)
+    batch = buffer.sample(256, prioritized=True)
+    buffer.update_priorities(batch["index"], td_errors)
+"""
+import os
+from os import path
+from typing import Optional
+
+import numpy as np
+
+TRANSITION_DTYPE = np.dtype([
+    ("state", "<u8"),  # counter of the state in the observation ring, the next state is state + 1
+    ("voxel", "<u4"),
+    ("action", "u1"),
+    ("reward", "<f4"),
+    ("terminated", "u1"),
+])
+
+OBSERVATIONS_FILE = "observations.bin"
+TRANSITIONS_FILE = "transitions.bin"
+
+
+class SumTree:
+    """Binary tree of partial sums over `capacity` non-negative priorities
+
+    Leaves are stored at [size, 2 * size) of a flat array, `size` being a power of two,
+    and every operation works on arrays of indices at once.
+    """
+
+    def __init__(self, capacity: int):
+        self.size = 1 << max(0, int(capacity - 1).bit_length())
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    @property
+    def total(self):
+        return float(self.tree[1])
+
+    def __getitem__(self, indices):
+        return self.tree[self.size + np.asarray(indices)]
+
+    def update(self, indices, priorities):
+        """Set the priorities of the leaves `indices` (the last value wins for repeated indices)."""
+        nodes = self.size + np.asarray(indices, dtype=np.int64).ravel()
+        if len(nodes) == 0:
+            return
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes >> 1)
+        while nodes[0] > 0:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            # Parents of sorted unique nodes are sorted, only adjacent duplicates remain
+            nodes >>= 1
+            nodes = nodes[np.concatenate(([True], nodes[1:] != nodes[:-1]))]
+
+    def set(self, index: int, priority: float):
+        """Set one priority, without the overhead of the array operations of `update`."""
+        tree = self.tree
+        node = self.size + index
+        tree[node] = priority
+        node >>= 1
+        while node > 0:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node >>= 1
+
+    def find(self, values):
+        """Leaves whose cumulated priority range contains each of `values` (in [0, total))."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.size:
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            right = values >= left_sum
+            values -= np.where(right, left_sum, 0.0)
+            nodes = left + right
+        return nodes - self.size
+
+
+class ReplayBuffer:
+    """Ring buffer of ElectroVoxelenv transitions
+
+    Args:
+        capacity: maximal number of transitions
+        observation_shape: shape of one observation (`env.observation_space.shape`)
+        observation_dtype: dtype of the observations, ignored with `pack_bits`
+        pack_bits: store 0/1 observations with 8 values per byte
+        directory: if set, the rings are memory-mapped files in this directory (overwritten)
+        observation_capacity: size of the observation ring, by default capacity + capacity // 16 + 1.
+            Each episode uses one more observation than transitions; when the ring is too
+            small for the episode lengths, the oldest transitions are dropped earlier.
+        alpha: prioritization exponent, the sampling probability is proportional to priority ** alpha
+        seed: seed of the sampling generator
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_shape,
+        observation_dtype=np.uint8,
+        pack_bits: bool = False,
+        directory: Optional[str] = None,
+        observation_capacity: Optional[int] = None,
+        alpha: float = 0.6,
+        seed: Optional[int] = None,
+    ):
+        if capacity <= 0:
+            raise ValueError("The capacity must be positive.")
+        self.capacity = int(capacity)
+        self.observation_capacity = int(observation_capacity or capacity + capacity // 16 + 1)
+        if self.observation_capacity <= 1:
+            raise ValueError("The observation ring must hold at least 2 observations.")
+        self.observation_shape = tuple(observation_shape)
+        self.pack_bits = pack_bits
+        self._observation_size = int(np.prod(self.observation_shape))
+        if pack_bits:
+            self.observation_dtype = np.dtype(np.uint8)
+            stored_shape = ((self._observation_size + 7) // 8,)
+        else:
+            self.observation_dtype = np.dtype(observation_dtype)
+            stored_shape = self.observation_shape
+        self.directory = directory
+        self.observations = self._allocate(OBSERVATIONS_FILE, self.observation_dtype, (self.observation_capacity,) + stored_shape)
+        self.transitions = self._allocate(TRANSITIONS_FILE, TRANSITION_DTYPE, (self.capacity,))
+
+        self.alpha = alpha
+        self.priorities = SumTree(self.capacity)
+        self.max_priority = 1.0
+        self.np_random = np.random.default_rng(seed)
+        self.num_observations = 0  # observations ever written
+        self.num_transitions = 0  # transitions ever written
+        self.first = 0  # oldest transition still valid
+        self._in_episode = False
+
+    def _allocate(self, filename, dtype, shape):
+        if self.directory is None:
+            return np.zeros(shape, dtype=dtype)
+        os.makedirs(self.directory, exist_ok=True)
+        return np.memmap(path.join(self.directory, filename), dtype=dtype, mode="w+", shape=shape)
+
+    def __len__(self):
+        return self.num_transitions - self.first
+
+    @property
+    def nbytes(self):
+        return self.observations.nbytes + self.transitions.nbytes + self.priorities.tree.nbytes
+
+    def _store(self, observation):
+        observation = np.asarray(observation)
+        if observation.shape != self.observation_shape:
+            raise ValueError(f"Expected an observation of shape {self.observation_shape}, got {observation.shape}.")
+        slot = self.num_observations % self.observation_capacity
+        if self.pack_bits:
+            self.observations[slot] = np.packbits(observation.reshape(-1) != 0)
+        else:
+            self.observations[slot] = observation
+        self.num_observations += 1
+
+        # Transitions whose state or next state was just overwritten are dropped
+        oldest = self.num_observations - self.observation_capacity
+        first = self.first
+        while first < self.num_transitions and int(self.transitions[first % self.capacity]["state"]) < oldest:
+            first += 1
+        self._drop(first)
+
+    def _drop(self, first):
+        if first > self.first:
+            self.priorities.update(np.arange(self.first, first) % self.capacity, 0.0)
+            self.first = first
+
+    def begin(self, observation):
+        """Store the first observation of an episode."""
+        self._store(observation)
+        self._in_episode = True
+
+    def add(self, voxel: int, action: int, reward: float, next_observation, terminated: bool):
+        """Add the transition from the last stored observation to `next_observation`."""
+        if not self._in_episode:
+            raise ValueError("No episode in progress, call begin() first.")
+        if self.num_transitions - self.first == self.capacity:
+            self._drop(self.first + 1)
+        slot = self.num_transitions % self.capacity
+        self.transitions[slot] = (self.num_observations - 1, voxel, action, reward, terminated)
+        self.num_transitions += 1
+        self._store(next_observation)
+        self.priorities.set(slot, self.max_priority ** self.alpha)
+
+    def _unpack(self, stored):
+        if not self.pack_bits:
+            return np.array(stored)
+        bits = np.unpackbits(stored, axis=-1, count=self._observation_size)
+        return bits.reshape(stored.shape[:-1] + self.observation_shape)
+
+    def sample(self, batch_size: int, prioritized: bool = False, beta: float = 0.4):
+        """Draw a batch of transitions
+
+        Args:
+            batch_size: number of transitions
+            prioritized: sample proportionally to the priorities instead of uniformly
+            beta: importance-sampling exponent of the prioritized sampling
+
+        Returns:
+            dict of arrays: "observation", "voxel", "action", "reward", "next_observation",
+            "terminated", "index" (to update the priorities) and "weight" (importance-sampling
+            weights normalized by their batch maximum, ones for uniform sampling)
+        """
+        if len(self) == 0:
+            raise ValueError("The replay buffer is empty.")
+        if prioritized:
+            # Stratified: one draw per equal segment of the total priority
+            total = self.priorities.total
+            values = (np.arange(batch_size) + self.np_random.random(batch_size)) * (total / batch_size)
+            indices = self.priorities.find(np.minimum(values, np.nextafter(total, 0)))
+            probabilities = self.priorities[indices] / total
+            weights = (len(self) * probabilities) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+        else:
+            indices = (self.first + self.np_random.integers(0, len(self), batch_size)) % self.capacity
+            weights = np.ones(batch_size, dtype=np.float32)
+
+        transitions = self.transitions[indices]
+        states = (transitions["state"] % self.observation_capacity).astype(np.int64)
+        following = (states + 1) % self.observation_capacity
+        return {
+            "observation": self._unpack(self.observations[states]),
+            "voxel": transitions["voxel"].astype(np.int64),
+            "action": transitions["action"].astype(np.int64),
+            "reward": transitions["reward"],
+            "next_observation": self._unpack(self.observations[following]),
+            "terminated": transitions["terminated"].astype(bool),
+            "index": indices,
+            "weight": weights,
+        }
+
+    def update_priorities(self, indices, priorities, epsilon: float = 1e-6):
+        """Set the priorities (e.g. absolute TD errors) of sampled transitions."""
+        priorities = np.abs(np.asarray(priorities, dtype=np.float64)) + epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        indices = np.asarray(indices, dtype=np.int64)
+        # Transitions dropped since they were sampled keep a zero priority
+        age = (indices - self.first) % self.capacity
+        alive = age < len(self)
+        self.priorities.update(indices[alive], priorities[alive] ** self.alpha)
+
+    def flush(self):
+        """Write the memory-mapped rings to disk."""
+        for ring in (self.observations, self.transitions):
+            if isinstance(ring, np.memmap):
+                ring.flush()
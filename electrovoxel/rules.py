@@ -0,0 +1,206 @@
+"""Declarative movement rules of the electrovoxels.
+
+Each move is described by the cells that must be occupied, the cells that must be
+empty and the displacement it produces, all relative to the moving electrovoxel.
+The 2D rules are transcribed from `ElectroVoxel._can_pivot` and
+`ElectroVoxel._can_transverse`; the 3D rules are generated from them.
+Rules are compiled into bit masks over neighborhood codes so that the legality of
+every move of every electrovoxel is a few vectorized bitwise operations.
+"""
+import numpy as np
+
+from electrovoxel.grid import NEIGHBOR_OFFSETS
+
+# Same order as the actions of ElectroVoxelenv (LEFT_pivot = 0, ..., UP_transverse = 7)
+ACTIONS_2D = (
+    ("pivot", "left"), ("pivot", "down"), ("pivot", "right"), ("pivot", "up"),
+    ("transverse", "left"), ("transverse", "down"), ("transverse", "right"), ("transverse", "up"),
+)
+DIRECTIONS_2D = {"left": (-1, 0), "down": (0, 1), "right": (1, 0), "up": (0, -1)}
+
+# (direction, base axis): cells that must be empty, as listed in ElectroVoxel._can_pivot
+_PIVOT_BLOCKERS = {
+    ("up", (1, 0)): [(-1, 0), (-1, -1), (0, -2), (1, -2), (0, -1), (1, -1)],
+    ("up", (-1, 0)): [(1, 0), (1, -1), (0, -2), (-1, -2), (0, -1), (-1, -1)],
+    ("down", (1, 0)): [(-1, 0), (-1, 1), (0, 2), (1, 2), (0, 1), (1, 1)],
+    ("down", (-1, 0)): [(1, 0), (1, 1), (0, 2), (-1, 2), (0, 1), (-1, 1)],
+    ("left", (0, 1)): [(0, -1), (-1, -1), (-2, 0), (-2, -1), (-1, 0), (-1, 1)],
+    ("left", (0, -1)): [(0, 1), (-1, 1), (-2, 0), (-2, 1), (-1, 0), (-1, -1)],
+    ("right", (0, 1)): [(0, -1), (1, -1), (2, 0), (2, -1), (1, 0), (1, 1)],
+    ("right", (0, -1)): [(0, 1), (1, 1), (2, 0), (2, 1), (1, 0), (1, -1)],
+}
+
+# (direction, base axis): (cells that must be empty, supporting cell), as in ElectroVoxel._can_transverse
+_TRANSVERSE_BLOCKERS = {
+    ("down", (1, 0)): ([(-1, 0), (-1, -1), (0, -1)], (1, 1)),
+    ("down", (-1, 0)): ([(1, 0), (1, -1), (0, -1)], (-1, 1)),
+    ("up", (1, 0)): ([(-1, 0), (-1, 1), (0, 1)], (1, -1)),
+    ("up", (-1, 0)): ([(1, 0), (1, 1), (0, 1)], (-1, -1)),
+    ("left", (0, 1)): ([(0, -1), (-1, -1), (-1, 0)], (-1, 1)),
+    ("left", (0, -1)): ([(0, 1), (-1, 1), (-1, 0)], (-1, -1)),
+    ("right", (0, 1)): ([(0, -1), (1, -1), (1, 0)], (1, 1)),
+    ("right", (0, -1)): ([(0, 1), (1, 1), (1, 0)], (1, -1)),
+}
+
+
+def _rules_2d():
+    """List, for each action, its variants as (required cells, empty cells, displacement).
+
+    The destination cell is always required to be empty: `_can_transverse` does not check
+    it for vertical moves, but two electrovoxels can't share a cell.
+    """
+    rules = []
+    for kind, direction in ACTIONS_2D:
+        d = DIRECTIONS_2D[direction]
+        variants = []
+        for (rule_direction, base), blockers in (_PIVOT_BLOCKERS if kind == "pivot" else _TRANSVERSE_BLOCKERS).items():
+            if rule_direction != direction:
+                continue
+            opposite = (-base[0], -base[1])
+            if kind == "pivot":
+                required = [base]
+                empty = [opposite] + blockers
+                shift = base[0] + base[1]
+                displacement = (shift, d[1]) if d[0] == 0 else (d[0], shift)
+            else:
+                required = [base, blockers[1]]
+                empty = [opposite] + blockers[0] + [d]
+                displacement = d
+            variants.append((required, sorted(set(empty)), displacement))
+        rules.append(variants)
+    return rules
+
+
+RULES_2D = _rules_2d()
+_OFFSET_BIT = {offset: i for i, offset in enumerate(NEIGHBOR_OFFSETS)}
+
+
+def _mask(cells, bit_of):
+    mask = 0
+    for cell in cells:
+        mask |= 1 << bit_of[cell]
+    return mask
+
+
+# Compiled 2D tables, indexed [action, variant]
+REQUIRED_2D = np.array([[_mask(r, _OFFSET_BIT) for r, _, _ in v] for v in RULES_2D], dtype=np.uint32)
+EMPTY_2D = np.array([[_mask(e, _OFFSET_BIT) for _, e, _ in v] for v in RULES_2D], dtype=np.uint32)
+DISPLACEMENTS_2D = np.array([[disp for _, _, disp in v] for v in RULES_2D], dtype=np.int64)
+# Bit of the destination cell in the neighborhood code
+DESTINATIONS_2D = np.array([[1 << _OFFSET_BIT[disp] for _, _, disp in v] for v in RULES_2D], dtype=np.uint32)
+
+
+def legal_variants_2d(codes):
+    """Legality of every variant of every action for an array of neighborhood codes.
+
+    Args:
+        codes: array of 24-bit neighborhood codes, any shape S
+
+    Returns:
+        bool array of shape S + (8, 2)
+    """
+    codes = np.asarray(codes, dtype=np.uint32)[..., None, None]
+    return ((codes & REQUIRED_2D) == REQUIRED_2D) & ((codes & EMPTY_2D) == 0)
+
+
+def legal_moves_2d(codes):
+    """Bool array of shape S + (8,): which actions are legal for each code."""
+    return legal_variants_2d(codes).any(axis=-1)
+
+
+def resolve_moves_2d(codes, actions):
+    """Legality and displacement of one action per electrovoxel.
+
+    Args:
+        codes: (N,) neighborhood codes
+        actions: (N,) actions in [0, 8)
+
+    Returns:
+        legal (N,) bool and displacement (N, 2), zero where the move is illegal
+    """
+    actions = np.asarray(actions)
+    variants = legal_variants_2d(codes)[np.arange(len(actions)), actions]
+    legal = variants.any(axis=-1)
+    displacement = DISPLACEMENTS_2D[actions, variants.argmax(axis=-1)]
+    displacement[~legal] = 0
+    return legal, displacement
+
+
+# 3D rules
+
+# Relative positions of the 5x5x5 neighborhood, bit i of a 3D code for NEIGHBOR_OFFSETS_3D[i]
+NEIGHBOR_OFFSETS_3D = tuple(
+    (dx, dy, dz) for dz in range(-2, 3) for dy in range(-2, 3) for dx in range(-2, 3) if (dx, dy, dz) != (0, 0, 0)
+)
+_OFFSET_BIT_3D = {offset: i for i, offset in enumerate(NEIGHBOR_OFFSETS_3D)}
+DIRECTIONS_3D = ((-1, 0, 0), (1, 0, 0), (0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1))
+
+
+def _to_frame(cells, d, b):
+    """Express 2D cells in the (direction, base) frame: cell = alpha * d + beta * b."""
+    return [(c[0] * d[0] + c[1] * d[1], c[0] * b[0] + c[1] * b[1]) for c in cells]
+
+
+def _from_frame(frame_cells, d, b):
+    return [tuple(alpha * d[k] + beta * b[k] for k in range(3)) for alpha, beta in frame_cells]
+
+
+def _frame_rule(kind, direction, base):
+    """Rule of a 2D variant, in its (direction, base) frame."""
+    a = ACTIONS_2D.index((kind, direction))
+    d = DIRECTIONS_2D[direction]
+    for required, empty, _ in RULES_2D[a]:
+        if required[0] == base:
+            return _to_frame(required, d, base), _to_frame(empty, d, base)
+    raise KeyError((kind, direction, base))
+
+
+def _rules_3d():
+    """3D primitives (kind, direction, base), each one a 2D rule laid in the plane (direction, base).
+
+    In 2D, vertical and horizontal variants of the same move are not exact rotations of each
+    other. The frames used here are the vertical pivot and the horizontal transverse, the
+    latter being the one whose checks cover the cells swept by the move.
+    """
+    templates = {"pivot": _frame_rule("pivot", "up", (1, 0)), "transverse": _frame_rule("transverse", "left", (0, 1))}
+    primitives = []
+    for kind in ("pivot", "transverse"):
+        required_frame, empty_frame = templates[kind]
+        for d in DIRECTIONS_3D:
+            for b in DIRECTIONS_3D:
+                if sum(d[k] * b[k] for k in range(3)) != 0:
+                    continue  # base must be perpendicular to the direction
+                required = _from_frame(required_frame, d, b)
+                empty = _from_frame(empty_frame, d, b)
+                displacement = tuple(d[k] + b[k] for k in range(3)) if kind == "pivot" else d
+                primitives.append(((kind, d, b), required, empty, displacement))
+    return primitives
+
+
+RULES_3D = _rules_3d()
+PRIMITIVES_3D = tuple(p for p, _, _, _ in RULES_3D)
+
+
+def _split_mask(cells):
+    mask = _mask(cells, _OFFSET_BIT_3D)
+    return (mask & 0xFFFFFFFFFFFFFFFF, mask >> 64)
+
+
+# 124-bit masks stored as two little-endian 64-bit words, indexed [primitive, word]
+REQUIRED_3D = np.array([_split_mask(r) for _, r, _, _ in RULES_3D], dtype=np.uint64)
+EMPTY_3D = np.array([_split_mask(e) for _, _, e, _ in RULES_3D], dtype=np.uint64)
+DISPLACEMENTS_3D = np.array([disp for _, _, _, disp in RULES_3D], dtype=np.int64)
+
+
+def legal_moves_3d(codes):
+    """Legality of every 3D primitive.
+
+    Args:
+        codes: (..., 2) uint64 array of 124-bit neighborhood codes
+
+    Returns:
+        bool array of shape (..., len(PRIMITIVES_3D))
+    """
+    codes = np.asarray(codes, dtype=np.uint64)[..., None, :]
+    ok = ((codes & REQUIRED_3D) == REQUIRED_3D) & ((codes & EMPTY_3D) == 0)
+    return ok.all(axis=-1)
@@ -0,0 +1,234 @@
+"""Headless tool building a compact binary shape library from a directory of shape CSVs.
+
+Shapes are read from `*_N_electrovoxels.csv` files (the format saved by the shape editor),
+checked (N distinct cells, 4-connected), and canonicalized under translation and the 8
+symmetries of the square, so that shapes differing only by a rotation, a reflection or a
+translation are kept once. The work is spread over a process pool.
+
+The library is a single file, memory-mapped by `ShapeLibrary`:
+
+- a LIBRARY_HEADER_DTYPE record
+- one SIZE_INDEX_DTYPE record per size: number of shapes and byte offset of their block
+- per size, a (count, size, 2) block of little-endian uint16 canonical positions
+- the names of the shapes, UTF-8, one per line, in the order of the blocks
+
+Usage:
+    python -m electrovoxel.shape_library <shape directory> <library file> [--processes P]
+"""
+import argparse
+import os
+import re
+from multiprocessing import Pool
+from os import path
+
+import numpy as np
+
+LIBRARY_MAGIC = b"EVSHAPES"
+LIBRARY_VERSION = 1
+LIBRARY_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("num_sizes", "<u4"),
+    ("num_shapes", "<u8"),
+    ("names_offset", "<u8"),
+    ("names_length", "<u8"),
+])
+SIZE_INDEX_DTYPE = np.dtype([("size", "<u4"), ("count", "<u4"), ("offset", "<u8")])
+CELL_DTYPE = np.dtype("<u2")
+
+SHAPE_FILE_REGEX = re.compile(r"(.+)_(\d+)_electrovoxels\.csv$")
+
+# The 8 symmetries of the square as (x, y) -> (a * x + b * y, c * x + d * y)
+D4 = np.array([
+    [[1, 0], [0, 1]], [[0, -1], [1, 0]], [[-1, 0], [0, -1]], [[0, 1], [-1, 0]],
+    [[-1, 0], [0, 1]], [[1, 0], [0, -1]], [[0, 1], [1, 0]], [[0, -1], [-1, 0]],
+], dtype=np.int64)
+
+
+def read_shape(filename: str):
+    """Positions of the electrovoxels of a shape CSV (header X,Y) as a (N, 2) int64 array."""
+    return np.loadtxt(filename, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
+
+
+def is_connected(positions):
+    """Whether the cells are 4-connected."""
+    cells = set(map(tuple, np.asarray(positions).tolist()))
+    if not cells:
+        return False
+    start = next(iter(cells))
+    visited = {start}
+    queue = [start]
+    for x, y in queue:
+        for neighbor in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if neighbor in cells and neighbor not in visited:
+                visited.add(neighbor)
+                queue.append(neighbor)
+    return len(visited) == len(cells)
+
+
+def canonical_form(positions):
+    """Representative of a shape under translation and D4 symmetry
+
+    Each of the 8 transformed shapes is moved to the origin and its cells sorted by (y, x);
+    the smallest one, compared as a sequence of cells, is the canonical form.
+
+    Returns:
+        (N, 2) int64 array
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    transformed = np.einsum("tij,nj->tni", D4, positions)
+    transformed -= transformed.min(axis=1, keepdims=True)
+    keys = transformed[..., 1] * (transformed.max() + 1) + transformed[..., 0]
+    keys.sort(axis=1)
+    best = min(range(len(D4)), key=lambda t: keys[t].tolist())
+    width = transformed.max() + 1
+    return np.stack([keys[best] % width, keys[best] // width], axis=1)
+
+
+def _process(filename):
+    """Worker: (name, size, canonical positions or None, error message)."""
+    name = path.basename(filename)[:-len(".csv")]
+    size = int(SHAPE_FILE_REGEX.match(path.basename(filename)).group(2))
+    try:
+        positions = read_shape(filename)
+    except ValueError as error:
+        return name, size, None, f"unreadable: {error}"
+    if positions.shape != (size, 2):
+        return name, size, None, f"{len(positions)} electrovoxels instead of {size}"
+    if len(np.unique(positions, axis=0)) != size:
+        return name, size, None, "repeated cells"
+    if not is_connected(positions):
+        return name, size, None, "not connected"
+    return name, size, canonical_form(positions), None
+
+
+def build_library(directory: str, output: str, processes=None, chunksize: int = 64, verbose: bool = False):
+    """Validate, canonicalize and deduplicate the shapes of a directory into a library file
+
+    Args:
+        directory: directory of `*_N_electrovoxels.csv` files
+        output: library file, overwritten
+        processes: size of the process pool, the number of CPUs if None
+        chunksize: files sent to a worker at once
+        verbose: print the rejected files and duplicates
+
+    Returns:
+        dict with the numbers of "scanned", "invalid", "duplicates" and "shapes" (written)
+    """
+    filenames = sorted(path.join(directory, f) for f in os.listdir(directory) if SHAPE_FILE_REGEX.match(f))
+    shapes = {}  # size -> {canonical bytes: (name, positions)}, the first file in sorted order is kept
+    invalid = duplicates = 0
+    with Pool(processes) as pool:
+        for name, size, canonical, error in pool.imap(_process, filenames, chunksize):
+            if canonical is None:
+                invalid += 1
+                if verbose:
+                    print(f"{name}: {error}")
+                continue
+            if canonical.max() >= 1 << 16:
+                raise ValueError(f"{name} does not fit in a 65536 x 65536 box.")
+            key = canonical.tobytes()
+            known = shapes.setdefault(size, {})
+            if key in known:
+                duplicates += 1
+                if verbose:
+                    print(f"{name}: same shape as {known[key][0]}")
+                continue
+            known[key] = (name, canonical)
+
+    write_library(output, {size: list(known.values()) for size, known in shapes.items()})
+    return {"scanned": len(filenames), "invalid": invalid, "duplicates": duplicates, "shapes": sum(len(k) for k in shapes.values())}
+
+
+def write_library(output: str, shapes):
+    """Write a library file
+
+    Args:
+        output: library file
+        shapes: dict size -> list of (name, (size, 2) positions)
+    """
+    sizes = sorted(shapes)
+    header = np.zeros(1, dtype=LIBRARY_HEADER_DTYPE)
+    index = np.zeros(len(sizes), dtype=SIZE_INDEX_DTYPE)
+    offset = LIBRARY_HEADER_DTYPE.itemsize + index.nbytes
+    for k, size in enumerate(sizes):
+        index[k] = (size, len(shapes[size]), offset)
+        offset += len(shapes[size]) * size * 2 * CELL_DTYPE.itemsize
+    names = "".join(name + "\n" for size in sizes for name, _ in shapes[size]).encode("utf-8")
+    header[0] = (LIBRARY_MAGIC, LIBRARY_VERSION, len(sizes), sum(len(shapes[s]) for s in sizes), offset, len(names))
+
+    with open(output, "wb") as file:
+        file.write(header.tobytes())
+        file.write(index.tobytes())
+        for size in sizes:
+            block = np.array([positions for _, positions in shapes[size]], dtype=CELL_DTYPE).reshape(-1, size, 2)
+            file.write(block.tobytes())
+        file.write(names)
+
+
+class ShapeLibrary:
+    """Read-only, memory-mapped shape library
+
+    `library.shapes(size)` is the (count, size, 2) block of the canonical positions of the
+    shapes of that size, `library.names(size)` their names, in the same order.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._data = np.memmap(filename, dtype=np.uint8, mode="r")
+        header = self._data[:LIBRARY_HEADER_DTYPE.itemsize].view(LIBRARY_HEADER_DTYPE)[0]
+        if header["magic"] != LIBRARY_MAGIC or header["version"] != LIBRARY_VERSION:
+            raise ValueError(f"{filename} is not a shape library of version {LIBRARY_VERSION}.")
+        self.header = header
+        start = LIBRARY_HEADER_DTYPE.itemsize
+        self.index = self._data[start:start + int(header["num_sizes"]) * SIZE_INDEX_DTYPE.itemsize].view(SIZE_INDEX_DTYPE)
+        self._sizes = {int(size): k for k, size in enumerate(self.index["size"])}
+        self._names = None
+
+    def __len__(self):
+        return int(self.header["num_shapes"])
+
+    @property
+    def sizes(self):
+        return list(self._sizes)
+
+    def count(self, size: int):
+        return int(self.index[self._sizes[size]]["count"]) if size in self._sizes else 0
+
+    def shapes(self, size: int):
+        """(count, size, 2) uint16 canonical positions of the shapes of `size`."""
+        if size not in self._sizes:
+            return np.zeros((0, size, 2), dtype=CELL_DTYPE)
+        entry = self.index[self._sizes[size]]
+        start, count = int(entry["offset"]), int(entry["count"])
+        return self._data[start:start + count * size * 2 * CELL_DTYPE.itemsize].view(CELL_DTYPE).reshape(count, size, 2)
+
+    def names(self, size: int):
+        if self._names is None:
+            start, length = int(self.header["names_offset"]), int(self.header["names_length"])
+            self._names = bytes(self._data[start:start + length]).decode("utf-8").splitlines()
+        first = sum(self.count(s) for s in self.sizes if s < size)
+        return self._names[first:first + self.count(size)]
+
+    def shape(self, size: int, i: int, origin=(0, 0)):
+        """Positions of the shape `i` of `size` as a (size, 2) int64 array moved to `origin`."""
+        return self.shapes(size)[i].astype(np.int64) + np.asarray(origin, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a deduplicated binary shape library from shape CSVs.")
+    parser.add_argument("directory", help="directory of *_N_electrovoxels.csv files")
+    parser.add_argument("output", help="library file to write")
+    parser.add_argument("--processes", type=int, default=None, help="size of the process pool")
+    parser.add_argument("--verbose", action="store_true", help="list the rejected files and duplicates")
+    args = parser.parse_args()
+
+    stats = build_library(args.directory, args.output, args.processes, verbose=args.verbose)
+    library = ShapeLibrary(args.output)
+    print(f"{stats['scanned']} files, {stats['invalid']} invalid, {stats['duplicates']} duplicates, {stats['shapes']} shapes written")
+    for size in library.sizes:
+        print(f"  size {size}: {library.count(size)} shapes")
+
+
+if __name__ == "__main__":
+    main()
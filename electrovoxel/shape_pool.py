@@ -0,0 +1,113 @@
+"""Pool of precomputed start/target shape pairs for fast ElectroVoxelenv resets.
+
+A `ShapePairPool` holds, in preallocated arrays, ready-to-use episodes: the positions of
+the initial and target shapes, the neighborhood codes and configuration hash of the
+initial shape, the sorted codes of the target and the initial similarity. A background thread refills the slots
+consumed by the envs, so that `reset` only copies a slot into the buffers of the env,
+without reading shape files or computing codes.
+
+Usage:
+    pool = ShapePairPool(9, capacity=64, seed=0)
+    env.shape_pool = pool
+    env.reset()
+"""
+import queue
+import threading
+from typing import Optional
+
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import choose_shapes, load_shape, shape_catalog
+from electrovoxel.grid import NUM_NEIGHBORS, neighborhood_codes
+from electrovoxel.utils import cell_hash, popcount
+
+
+class ShapePairPool:
+    """Ring of precomputed start/target pairs refilled in the background
+
+    Args:
+        size: number of electrovoxels of the shapes
+        capacity: number of precomputed pairs
+        map_name: [start, target] shape names, "None" for random shapes, as in ElectroVoxelenv
+        background: refill the slots in a daemon thread, otherwise when they are taken
+        seed: seed of the random shape choices of the pool
+    """
+
+    def __init__(self, size: int = 9, capacity: int = 64, map_name=["None", "None"], background: bool = True, seed: Optional[int] = None):
+        self.size = size
+        self.capacity = capacity
+        self.map_name = list(map_name)
+        self.np_random = np.random.default_rng(seed)
+        self._catalog = shape_catalog(size)
+        choose_shapes(size, *self.map_name)  # check the names once
+        self._shapes = {}  # name -> positions, each shape file is read once
+
+        self.initial = np.zeros((capacity, size, 2), dtype=np.int64)
+        self.target = np.zeros((capacity, size, 2), dtype=np.int64)
+        self.codes = np.zeros((capacity, size), dtype="<u4")
+        self.target_codes = np.zeros((capacity, size), dtype="<u4")
+        self.similarity = np.zeros(capacity)
+        self.shape_ids = np.zeros((capacity, 2), dtype=np.int64)
+        self.config_hash = np.zeros(capacity, dtype=np.uint64)  # Zobrist hash of the initial shape
+
+        self._ready = queue.Queue()
+        self._empty = queue.Queue()
+        self._thread = None
+        for slot in range(capacity):
+            self._fill(slot)
+            self._ready.put(slot)
+        if background:
+            self._thread = threading.Thread(target=self._refill, name="electrovoxel-shape-pool", daemon=True)
+            self._thread.start()
+
+    def _shape(self, name):
+        positions = self._shapes.get(name)
+        if positions is None:
+            positions = self._shapes[name] = np.asarray(load_shape(name), dtype=np.int64)
+        return positions
+
+    def _choose(self):
+        """Same choices as `choose_shapes`, without listing the shape directory each time."""
+        shape1, shape2 = self.map_name
+        if shape1 == "None":
+            shape1 = self._catalog[self.np_random.integers(len(self._catalog))]
+        if shape2 == "None":
+            others = [name for name in self._catalog if name != shape1]
+            shape2 = others[self.np_random.integers(len(others))]
+        return shape1, shape2
+
+    def _fill(self, slot):
+        shape1, shape2 = self._choose()
+        self.initial[slot] = self._shape(shape1)
+        self.target[slot] = self._shape(shape2)
+        self.codes[slot] = neighborhood_codes(self.initial[slot])
+        self.target_codes[slot] = np.sort(neighborhood_codes(self.target[slot]))
+        difference = popcount(np.sort(self.codes[slot]) ^ self.target_codes[slot]).sum()
+        self.similarity[slot] = 1.0 - difference / (self.size * NUM_NEIGHBORS)
+        self.shape_ids[slot] = (self._catalog.index(shape1), self._catalog.index(shape2))
+        self.config_hash[slot] = np.bitwise_xor.reduce(cell_hash(self.initial[slot]))
+
+    def _refill(self):
+        while True:
+            slot = self._empty.get()
+            if slot is None:
+                return
+            self._fill(slot)
+            self._ready.put(slot)
+
+    def take(self, timeout: Optional[float] = None):
+        """Slot of a ready pair, to be given back with `release` once copied."""
+        if self._thread is None and self._ready.empty():
+            slot = self._empty.get_nowait()
+            self._fill(slot)
+            return slot
+        return self._ready.get(timeout=timeout)
+
+    def release(self, slot: int):
+        self._empty.put(slot)
+
+    def close(self):
+        if self._thread is not None:
+            self._empty.put(None)
+            self._thread.join()
+            self._thread = None
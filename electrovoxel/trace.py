@@ -0,0 +1,116 @@
+"""Trace of the movement attempts of an ElectroVoxelenv, for debugging the movement rules.
+
+Every attempt (accepted or not) is an EVENT_DTYPE record in a fixed-size NumPy ring buffer:
+the oldest events are overwritten once it is full, and recording costs one record write, with
+no I/O. A rejected attempt carries the REASON_* code of the rule that refused it. The trace
+is off by default (`ElectroVoxelenv(trace_capacity=...)` turns it on), can be filtered by
+electrovoxel, reason or episode, and dumped on demand or at the end of each episode.
+"""
+import sys
+
+import numpy as np
+
+REASON_OK = 0
+REASON_NO_BASE = 1  # no electrovoxel beside it to move around
+REASON_TWO_BASES = 2  # electrovoxels on both sides, it is wedged
+REASON_BLOCKED = 3  # a cell swept by the movement is occupied
+REASON_NO_SUPPORT = 4  # transverse: no electrovoxel to slide onto
+REASON_OCCUPIED = 5  # the destination cell is occupied
+REASON_NAMES = ("ok", "no base", "two bases", "blocked", "no support", "occupied")
+
+ACTION_NAMES = ("left pivot", "down pivot", "right pivot", "up pivot",
+                "left transverse", "down transverse", "right transverse", "up transverse")
+
+EVENT_DTYPE = np.dtype([
+    ("episode", "<u4"),
+    ("step", "<u4"),
+    ("voxel", "<u4"),
+    ("action", "u1"),
+    ("accepted", "u1"),
+    ("reason", "u1"),
+])
+
+
+class MoveTrace:
+    """Ring buffer of movement attempts
+
+    Args:
+        capacity: number of events kept, the oldest ones are overwritten
+        dump_on_episode_end: file-like object the events of each episode are written to when
+            it ends (see `end_episode`), None to keep them in the buffer
+    """
+
+    def __init__(self, capacity: int = 1 << 16, dump_on_episode_end=None):
+        if capacity < 1:
+            raise ValueError("The capacity of a trace must be positive.")
+        self.buffer = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.count = 0  # events recorded since the creation, the next one goes to count % capacity
+        self.episode = 0
+        self.step = 0
+        self.dump_on_episode_end = dump_on_episode_end
+        self._episode_start = 0  # count at the start of the current episode
+
+    def __len__(self):
+        return min(self.count, len(self.buffer))
+
+    def record(self, voxel: int, action: int, accepted: bool, reason: int):
+        self.buffer[self.count % len(self.buffer)] = (self.episode, self.step, voxel, action, accepted, reason)
+        self.count += 1
+        self.step += 1
+
+    def end_episode(self):
+        """Dump the events of the episode if `dump_on_episode_end` is set, then start a new episode."""
+        if self.dump_on_episode_end is not None and self.count > self._episode_start:
+            self.dump(self.dump_on_episode_end, episode=self.episode)
+        self.episode += 1
+        self.step = 0
+        self._episode_start = self.count
+
+    def events(self, voxel=None, reason=None, accepted=None, episode=None):
+        """Copy of the events kept, oldest first, optionally filtered
+
+        Args:
+            voxel: index or list of indices of electrovoxels
+            reason: REASON_* code or list of codes
+            accepted: True or False to keep only the accepted or rejected attempts
+            episode: episode number
+
+        Returns:
+            EVENT_DTYPE array
+        """
+        capacity = len(self.buffer)
+        if self.count <= capacity:
+            events = self.buffer[:self.count].copy()
+        else:
+            start = self.count % capacity
+            events = np.concatenate((self.buffer[start:], self.buffer[:start]))
+        keep = np.ones(len(events), dtype=bool)
+        if voxel is not None:
+            keep &= np.isin(events["voxel"], voxel)
+        if reason is not None:
+            keep &= np.isin(events["reason"], reason)
+        if accepted is not None:
+            keep &= events["accepted"] == bool(accepted)
+        if episode is not None:
+            keep &= events["episode"] == episode
+        return events[keep]
+
+    def counts(self, **filters):
+        """Number of events per reason, as a dict name -> count, with the filters of `events`."""
+        counts = np.bincount(self.events(**filters)["reason"], minlength=len(REASON_NAMES))
+        return dict(zip(REASON_NAMES, counts.tolist()))
+
+    def dump(self, file=None, **filters):
+        """Write the events as text lines, to stdout if `file` is None, with the filters of `events`."""
+        file = sys.stdout if file is None else file
+        lines = [f"episode {e} step {s} voxel {v}: {ACTION_NAMES[a]} {'accepted' if ok else 'rejected (' + REASON_NAMES[r] + ')'}\n"
+                 for e, s, v, a, ok, r in self.events(**filters).tolist()]
+        file.write("".join(lines))
+
+    def save(self, filename: str, **filters):
+        """Save the events as a .npy file, with the filters of `events`."""
+        np.save(filename, self.events(**filters))
+
+    def clear(self):
+        self.count = self._episode_start = 0
+        self.step = 0
@@ -6,3 +6,128 @@ def categorical_sample(prob_n, np_random: np.random.Generator):
     prob_n = np.asarray(prob_n)
     csprob_n = np.cumsum(prob_n)
     return np.argmax(csprob_n > np_random.random())
+
+
+def _vose(weights):
+    """Vose alias table of a weight vector: draw j uniformly, keep it with probability prob[j], else take alias[j]."""
+    n = len(weights)
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError("Weights must have a positive sum.")
+    scaled = weights * (n / total)
+    prob = np.ones(n, dtype=np.float64)
+    alias = np.arange(n, dtype=np.int64)
+    small = [j for j in range(n) if scaled[j] < 1.0]
+    large = [j for j in range(n) if scaled[j] >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    # Leftovers are 1 up to rounding errors
+    return prob, alias
+
+
+class AliasSampler:
+    """Categorical sampler with O(1) draws, for fixed or slowly changing weights
+
+    Weights are split in blocks of `block_size`, each with its own alias table, and a top
+    alias table picks the block. A draw is two O(1) alias lookups, and changing a few weights
+    only rebuilds their blocks and the top table (O(block_size + n / block_size)).
+
+    Args:
+        weights: non-negative weights, not necessarily normalized
+        np_random: random generator, a new unseeded one if None
+        block_size: size of the blocks
+    """
+
+    def __init__(self, weights, np_random: np.random.Generator = None, block_size: int = 256):
+        weights = np.asarray(weights, dtype=np.float64).ravel()
+        if (weights < 0).any():
+            raise ValueError("Weights must be non-negative.")
+        self.np_random = np.random.default_rng() if np_random is None else np_random
+        self.n = len(weights)
+        self.block_size = min(block_size, self.n)
+        self.num_blocks = -(-self.n // self.block_size)
+        # Padded with zero weights up to a whole number of blocks
+        self.weights = np.zeros(self.num_blocks * self.block_size)
+        self.weights[:self.n] = weights
+        self.prob = np.ones((self.num_blocks, self.block_size))
+        self.alias = np.zeros((self.num_blocks, self.block_size), dtype=np.int64)
+        self.block_weights = np.zeros(self.num_blocks)
+        for block in range(self.num_blocks):
+            self._build_block(block)
+        self._build_top()
+        self._scratch = np.zeros((0, 4))
+
+    def _build_block(self, block):
+        weights = self.weights[block * self.block_size:(block + 1) * self.block_size]
+        self.block_weights[block] = weights.sum()
+        if self.block_weights[block] > 0:
+            self.prob[block], self.alias[block] = _vose(weights.copy())
+
+    def _build_top(self):
+        self.top_prob, self.top_alias = _vose(self.block_weights.copy())
+
+    def update(self, indices, weights):
+        """Change the weights of `indices`."""
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), indices.shape)
+        if (weights < 0).any():
+            raise ValueError("Weights must be non-negative.")
+        self.weights[indices] = weights
+        for block in np.unique(indices // self.block_size):
+            self._build_block(block)
+        self._build_top()
+
+    def sample(self, size=None, out=None, np_random: np.random.Generator = None):
+        """Draw samples
+
+        Args:
+            size: number of samples, a single int is returned if None
+            out: preallocated int64 array filled with the samples (its size is used)
+            np_random: generator of the draw, the one of the sampler if None
+
+        Returns:
+            int, or the array of samples
+        """
+        if size is None and out is None:
+            return int(self.sample(out=np.empty(1, dtype=np.int64), np_random=np_random)[0])
+        if out is None:
+            out = np.empty(size, dtype=np.int64)
+        count = out.size
+        if len(self._scratch) < count:
+            self._scratch = np.empty((count, 4))
+        u = (self.np_random if np_random is None else np_random).random(out=self._scratch[:count])
+        block = (u[:, 0] * self.num_blocks).astype(np.int64)
+        block = np.where(u[:, 1] < self.top_prob[block], block, self.top_alias[block])
+        j = (u[:, 2] * self.block_size).astype(np.int64)
+        j = np.where(u[:, 3] < self.prob[block, j], j, self.alias[block, j])
+        np.add(block * self.block_size, j, out=out.reshape(-1))
+        return out
+
+
+_POPCOUNT_8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(values):
+    """Number of set bits of each element of an unsigned integer array."""
+    values = np.ascontiguousarray(values)
+    counts = _POPCOUNT_8[values.view(np.uint8)].reshape(values.shape + (values.itemsize,))
+    return counts.sum(axis=-1, dtype=np.int64)
+
+
+def splitmix64(values):
+    """SplitMix64 finalizer, a fast 64-bit mixing function applied element-wise."""
+    z = np.atleast_1d(values).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def cell_hash(positions):
+    """64-bit key of each (..., 2) integer position, XOR them to hash a set of cells."""
+    positions = np.asarray(positions, dtype=np.int64)
+    packed = np.atleast_1d((positions[..., 0] & 0xFFFFFFFF) | (positions[..., 1] << 32))
+    return splitmix64(packed.view(np.uint64)).reshape(positions.shape[:-1])
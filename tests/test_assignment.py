@@ -0,0 +1,48 @@
+import itertools
+
+import numpy as np
+
+from electrovoxel.assignment import ShapeDistance, auction
+from electrovoxel.electrovoxel_2D import generate_random_shape
+
+
+def brute_force_assignment(benefit):
+    n = len(benefit)
+    return max(benefit[np.arange(n), list(p)].sum() for p in itertools.permutations(range(n)))
+
+
+def test_auction_is_optimal():
+    rng = np.random.default_rng(0)
+    for n in range(1, 8):
+        for _ in range(10):
+            benefit = rng.integers(-20, 20, (n, n))
+            assigned, _ = auction(benefit)
+            assert sorted(assigned.tolist()) == list(range(n))
+            assert benefit[np.arange(n), assigned].sum() == brute_force_assignment(benefit)
+
+
+def test_auction_warm_start_stays_optimal():
+    rng = np.random.default_rng(1)
+    benefit = rng.integers(-20, 20, (7, 7))
+    assigned, prices = auction(benefit)
+    benefit[3] = rng.integers(-20, 20, 7)
+    warm, _ = auction(benefit, prices, assigned)
+    assert benefit[np.arange(7), warm].sum() == brute_force_assignment(benefit)
+
+
+def test_shape_distance_updates_match_cold_solves():
+    rng = np.random.default_rng(2)
+    target = generate_random_shape(7, rng)
+    positions = generate_random_shape(7, rng)
+    warm = ShapeDistance(target)
+    warm.reset(positions)
+    for _ in range(20):
+        index = int(rng.integers(7))
+        positions[index] += rng.integers(-1, 2, 2)
+        warm.update(index, positions[index])
+        # Same translation solved from scratch
+        shifted = target + np.asarray(warm.translation)
+        cost = np.abs(positions[:, None] - shifted[None]).sum(axis=-1)
+        assert warm.distance == -brute_force_assignment(-cost)
+    assert warm.warm_solves > 0
+    assert ShapeDistance(target).reset(target + 3) == 0
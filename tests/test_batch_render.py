@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from electrovoxel.batch_render import VOXEL_COLOR, TARGET_COLOR, episodes_from_log, rasterize, render_episode, simulate, write_png
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, generate_random_shape, load_shape
+from electrovoxel.recording import EpisodeLog, EpisodeRecorder, RecordEpisode
+
+
+def test_rasterize_labels_cells():
+    frame = rasterize([(1, 0)], [(0, 0), (1, 0)], np.array([0, 0]), (3, 2), cell_px=4)
+    assert frame.shape == (8, 12, 3)
+    assert tuple(frame[1, 1]) == TARGET_COLOR  # inside the target cell, away from its edge
+    assert tuple(frame[1, 5]) == VOXEL_COLOR  # the electrovoxel covers the target
+    assert tuple(frame[5, 9]) == (255, 255, 255)
+
+
+def test_simulate_matches_env():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"])
+    rng = np.random.default_rng(0)
+    actions = np.stack([rng.integers(9, size=40), rng.integers(8, size=40)], axis=1)
+    trajectory = simulate(load_shape("carre_9_electrovoxels"), load_shape("ligne_9_electrovoxels"), actions)
+    for t, (voxel, action) in enumerate(actions.tolist()):
+        env.step((voxel, action))
+        assert (trajectory[t + 1] == env.positions).all()
+    frames = render_episode(load_shape("carre_9_electrovoxels"), load_shape("ligne_9_electrovoxels"), actions)
+    assert len(frames) == len(actions) + 1
+
+
+def test_write_png(tmp_path):
+    image = np.zeros((4, 5, 3), dtype=np.uint8)
+    write_png(str(tmp_path / "frame.png"), image)
+    assert (tmp_path / "frame.png").read_bytes().startswith(b"\x89PNG")
+
+
+def test_episodes_from_log_rejects_custom_shapes(tmp_path):
+    rng = np.random.default_rng(1)
+    with EpisodeRecorder(str(tmp_path)) as recorder:
+        env = RecordEpisode(ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "croix_9_electrovoxels"]), recorder)
+        env.reset()
+        env.step((0, 1))
+        env.reset(options={"initial_shape": generate_random_shape(9, rng), "target_shape": generate_random_shape(9, rng)})
+        env.step((0, 1))
+    log = EpisodeLog(str(tmp_path))
+    (initial, target, actions), = episodes_from_log(log, [0])
+    assert (initial == load_shape("carre_9_electrovoxels")).all()
+    assert actions.tolist() == [[0, 1]]
+    with pytest.raises(ValueError):
+        list(episodes_from_log(log, [1]))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from electrovoxel.batched import BatchedElectroVoxelenv, bucket_for, make_batches, padding_buckets
+
+
+def test_padding_buckets_bound_the_waste():
+    for max_waste in (0.1, 0.25, 0.5):
+        buckets = padding_buckets(1000, max_waste)
+        assert buckets[-1] >= 1000
+        for size in range(1, 1001):
+            assert bucket_for(size, buckets) - size <= max_waste * size
+
+
+def test_make_batches_share_a_bucket():
+    sizes = np.random.default_rng(0).integers(1, 200, 300)
+    buckets = padding_buckets(int(sizes.max()))
+    batches = make_batches(sizes, 16)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(300))
+    for batch in batches:
+        assert len(batch) <= 16
+        assert len({bucket_for(sizes[i], buckets) for i in batch}) == 1
+
+
+def test_padding_actions_count_toward_truncation():
+    with pytest.warns(UserWarning, match="make_batches"):
+        env = BatchedElectroVoxelenv([9, 4], max_steps=5, seed=0)
+    observation, _ = env.reset()
+    assert env.padded_size == 9
+    assert not observation["voxel_mask"][1, 4:].any()
+    padding_action = 8 * env.nA  # electrovoxel 8 does not exist in the second env
+    for t in range(5):
+        _, rewards, terminated, truncated, info = env.step([0, padding_action])
+        assert rewards[1] == 0 and not info["moved"][1]
+    assert truncated[1] and env.steps[1] == 0
+
+
+def test_batches_of_make_batches_do_not_warn(recwarn):
+    sizes = [9, 100, 12, 95, 10]
+    for batch in make_batches(sizes, batch_size=4):
+        env = BatchedElectroVoxelenv([sizes[i] for i in batch], seed=0)
+        assert all(env.padded_size - n <= 0.25 * n for n in env.sizes)
+    assert not [w for w in recwarn if "make_batches" in str(w.message)]
+    with pytest.warns(UserWarning, match="make_batches"):
+        BatchedElectroVoxelenv([9, 100], seed=0)
@@ -0,0 +1,42 @@
+import importlib.util
+from os import path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tkinter")
+spec = importlib.util.spec_from_file_location("CreateFormEV", path.join(path.dirname(__file__), "..", "draft", "CreateFormEV.py"))
+CreateFormEV = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(CreateFormEV)
+
+
+def count_components(cells):
+    remaining, components = set(cells), 0
+    while remaining:
+        components += 1
+        queue = [remaining.pop()]
+        for x, y in queue:
+            for neighbor in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if neighbor in remaining:
+                    remaining.remove(neighbor)
+                    queue.append(neighbor)
+    return components
+
+
+def test_connectivity_matches_flood_fill():
+    rng = np.random.default_rng(0)
+    connectivity = CreateFormEV.Connectivity()
+    cells = set()
+    for _ in range(3000):
+        cell = tuple(int(v) for v in rng.integers(0, 12, 2))
+        if cell in cells:
+            connectivity.remove(cell)
+            cells.remove(cell)
+        else:
+            connectivity.add(cell)
+            cells.add(cell)
+        assert connectivity.num_components == count_components(cells)
+        assert connectivity.is_connected() == (count_components(cells) == 1)
+    assert len(connectivity) == len(cells) and all(cell in connectivity for cell in cells)
+    # Ghost nodes are bounded by the rebuilds
+    assert len(connectivity.parent) <= 2 * len(cells) + 64 + 1
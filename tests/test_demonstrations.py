@@ -0,0 +1,27 @@
+import numpy as np
+
+from electrovoxel.demonstrations import SHARD_FORMAT, generate, generate_shard, load_shard
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+
+
+def test_shard_episodes_reach_their_target():
+    arrays = generate_shard(0, episodes=3, seed=1)
+    assert len(arrays["episode_lengths"]) == 3
+    assert arrays["episode_lengths"].sum() == len(arrays["actions"]) == len(arrays["observations"])
+    start = 0
+    for initial, target, length in zip(arrays["initial"], arrays["target"], arrays["episode_lengths"]):
+        env = ElectroVoxelenv(initial_shape=initial, target_shape=target)
+        for voxel, action in arrays["actions"][start:start + length].tolist():
+            _, _, terminated, _, _ = env.step((voxel, action))
+        assert terminated
+        start += length
+
+
+def test_generate_resumes_missing_shards(tmp_path):
+    stats = generate(str(tmp_path), 3, processes=2, episodes=2, seed=2)
+    assert stats["shards"] == 3
+    first = load_shard(str(tmp_path / SHARD_FORMAT.format(1)))
+    (tmp_path / SHARD_FORMAT.format(1)).unlink()
+    assert generate(str(tmp_path), 3, processes=2, episodes=2, seed=2)["shards"] == 1
+    again = load_shard(str(tmp_path / SHARD_FORMAT.format(1)))
+    assert all(np.array_equal(first[key], again[key]) for key in first)
@@ -0,0 +1,44 @@
+import numpy as np
+
+from electrovoxel.distance_field import DistanceField, FieldCache, distance_field
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, generate_random_shape
+
+
+def test_distances_match_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        target = generate_random_shape(12, rng, origin=tuple(rng.integers(-10, 10, 2)))
+        field = DistanceField(target)
+        positions = rng.integers(-30, 30, (500, 2))
+        expected = np.abs(positions[:, None] - target[None]).sum(axis=-1).min(axis=1)
+        assert (field.distances(positions) == expected).all()
+        assert [field.distance(x, y) for x, y in positions.tolist()] == expected.tolist()
+        assert field.potential(positions[:10]) == -expected[:10].sum()
+        assert field.delta(positions[0], positions[1]) == expected[0] - expected[1]
+
+
+def test_env_potential_stays_in_sync():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"], shaping_weight=0.5)
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        before = env.potential
+        similarity = env.similarity
+        _, reward, terminated, _, _ = env.step((int(rng.integers(9)), int(rng.integers(8))))
+        assert env.potential == env.distance_field.potential(env.positions)
+        if not terminated:
+            assert np.isclose(reward, max(0.0, env.similarity - similarity) + 0.5 * (env.potential - before))
+    assert env.distance_field is distance_field(env.target_positions, env.shape_ids[1])
+
+
+def test_field_cache():
+    cache = FieldCache(max_fields=2)
+    squares = [np.array([(0, 0), (1, 0), (0, 1), (1, 1)]) + k for k in range(3)]
+    first = cache.get("a", squares[0])
+    assert cache.get("a", squares[0]) is first
+    cache.get("b", squares[1])
+    cache.get("c", squares[2])  # evicts "a", the least recently used
+    assert len(cache) == 2 and cache.get("a", squares[0]) is not first
+    assert (cache.hits, cache.misses) == (1, 4)
+    # Targets outside the catalog are keyed by their cells
+    assert distance_field(squares[1]) is distance_field(squares[1].copy())
+    assert distance_field(squares[1]) is not distance_field(squares[2])
@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.env_client import EnvClient
+from electrovoxel.env_server import EnvServer
+
+MAP_NAME = ["carre_9_electrovoxels", "None"]
+
+
+@pytest.fixture
+def address(tmp_path):
+    address = str(tmp_path / "env.sock")
+    server = EnvServer(address)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield address
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_matches_local_envs(address):
+    envs = [ElectroVoxelenv(Size=9, map_name=MAP_NAME, observation_mode="packed") for _ in range(3)]
+    with EnvClient(address, num_envs=3, size=9, map_name=MAP_NAME, seed=10) as client:
+        observations = client.reset()
+        for b, env in enumerate(envs):
+            assert (observations[b] == env.reset(seed=10 + b)[0]).all()
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            actions = np.stack([rng.integers(9, size=3), rng.integers(8, size=3)], axis=1)
+            before = client.arrays["codes"].copy()
+            observations, rewards, terminated, moved = client.step(actions)
+            for b, env in enumerate(envs):
+                observation, reward, done, _, info = env.step(tuple(actions[b]))
+                assert (observations[b] == observation).all()
+                assert (client.arrays["positions"][b] == env.positions).all()
+                assert reward == rewards[b] and done == terminated[b] and info["moved"] == moved[b]
+                # The delta lists exactly the codes that changed
+                indices, codes = client.changes(b)
+                assert sorted(indices.tolist()) == np.flatnonzero(before[b] != env.codes).tolist()
+                assert (env.codes[indices] == codes).all()
+        positions = client.arrays["positions"].copy()
+        client.reset(mask=[False, True, False])
+        envs[1].reset()
+        assert (client.arrays["positions"][1] == envs[1].positions).all()
+        assert (client.arrays["positions"][[0, 2]] == positions[[0, 2]]).all()
+
+
+def test_errors_keep_the_session_usable(address):
+    with EnvClient(address, num_envs=2, size=9, map_name=MAP_NAME, seed=0) as client:
+        client.reset()
+        with pytest.raises(RuntimeError):
+            client.step([[9, 0], [0, 0]])
+        client.step([[0, 0], [1, 1]])
+    with pytest.raises(RuntimeError):
+        EnvClient(address, num_envs=0)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.graph import CONNECTIVITY_OFFSETS, NO_EDGE
+
+
+def brute_force_edges(positions, connectivity):
+    cells = {tuple(p): i for i, p in enumerate(positions.tolist())}
+    return {(i, cells[(x + dx, y + dy)]) for (x, y), i in cells.items()
+            for dx, dy in CONNECTIVITY_OFFSETS[connectivity] if (x + dx, y + dy) in cells}
+
+
+def test_graph_observation_matches_space_and_adjacency():
+    for connectivity in (4, 8):
+        env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"],
+                              observation_mode="graph", graph_connectivity=connectivity)
+        observation, _ = env.reset(seed=0)
+        rng = np.random.default_rng(connectivity)
+        for _ in range(200):
+            assert env.observation_space.contains(observation)
+            num_edges = observation["num_edges"]
+            edges = observation["edge_index"]
+            assert (edges[:, num_edges:] == NO_EDGE).all()
+            assert set(map(tuple, edges[:, :num_edges].T.tolist())) == brute_force_edges(env.positions, connectivity)
+            observation, _, terminated, _, _ = env.step((int(rng.integers(9)), int(rng.integers(8))))
+            if terminated:
+                observation, _ = env.reset()
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from electrovoxel.grid import ChunkedGrid, NEIGHBOR_OFFSETS, code_to_connections, connections_to_code, neighborhood_codes
+
+
+def brute_force_code(cells, x, y):
+    return sum(1 << i for i, (dx, dy) in enumerate(NEIGHBOR_OFFSETS) if (x + dx, y + dy) in cells)
+
+
+def test_grid_matches_a_set_of_cells():
+    rng = np.random.default_rng(0)
+    grid = ChunkedGrid(tile_size=8, max_free_tiles=4)
+    cells = {}
+    for _ in range(3000):
+        x, y = (int(v) for v in rng.integers(-40, 40, 2))
+        if rng.random() < 0.6:
+            value = int(rng.integers(1, 100))
+            grid.set(x, y, value)
+            cells[(x, y)] = value
+        else:
+            assert grid.clear(x, y) == cells.pop((x, y), 0)
+    assert len(grid) == len(cells)
+    # Only tiles with an occupied cell are kept
+    assert set(grid.tiles) == {(x >> 3, y >> 3) for x, y in cells}
+    for (x, y), value in cells.items():
+        assert grid.get(x, y) == value and (x, y) in grid
+    xs, ys = zip(*cells)
+    assert grid.bounding_box() == (min(xs), min(ys), max(xs), max(ys))
+    for x, y in rng.integers(-45, 45, (500, 2)).tolist():
+        assert grid.neighborhood_code(x, y) == brute_force_code(cells, x, y)
+
+
+def test_grid_reset_reuses_tiles():
+    grid = ChunkedGrid(tile_size=8)
+    for x in range(0, 80, 8):
+        grid.set(x, 0, 1)
+    tiles = {id(tile) for tile in grid.tiles.values()}
+    grid.reset()
+    assert len(grid) == 0 and grid.bounding_box() is None
+    for x in range(0, 80, 8):
+        grid.set(x, 5, 1)
+    assert {id(tile) for tile in grid.tiles.values()} == tiles
+    assert len(grid) == 10 and grid.get(0, 0) == 0
+    with pytest.raises(ValueError):
+        ChunkedGrid(tile_size=12)
+
+
+def test_codes_and_connections():
+    rng = np.random.default_rng(1)
+    positions = rng.integers(-1000, 1000, (200, 2))
+    positions = np.unique(np.concatenate([positions, positions + 1, positions + (2, -1)]), axis=0)
+    cells = set(map(tuple, positions.tolist()))
+    expected = [brute_force_code(cells, x, y) for x, y in positions.tolist()]
+    assert neighborhood_codes(positions).tolist() == expected
+    for code in expected[:50]:
+        assert connections_to_code(code_to_connections(code)) == code
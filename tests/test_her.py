@@ -0,0 +1,56 @@
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.her import HindsightReplay, achieved_goal, goal_rewards, goal_similarity
+from electrovoxel.replay import ReplayBuffer
+
+
+def collect(env, her, steps, rng):
+    observation, _ = env.reset(seed=0)
+    her.begin(observation, achieved_goal(env), env.target_codes)
+    rewards = []
+    for _ in range(steps):
+        voxel, action = int(rng.integers(env.size)), int(rng.integers(8))
+        observation, reward, terminated, _, _ = env.step((voxel, action))
+        her.add(voxel, action, reward, observation, terminated, achieved_goal(env))
+        rewards.append(reward)
+        if terminated:
+            observation, _ = env.reset()
+            her.begin(observation, achieved_goal(env), env.target_codes)
+    return rewards
+
+
+def test_goal_rewards_match_env():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "croix_9_electrovoxels"])
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        before = achieved_goal(env)
+        _, reward, terminated, _, _ = env.step((int(rng.integers(9)), int(rng.integers(8))))
+        expected, done = goal_rewards(before, achieved_goal(env), env.target_codes)
+        assert np.isclose(expected, reward) and done == terminated
+    assert goal_similarity(env.target_codes, env.target_codes) == 1.0
+
+
+def test_unrelabeled_transitions_keep_their_reward():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "croix_9_electrovoxels"], energy_weight=0.5)
+    her = HindsightReplay(ReplayBuffer(1000, (24,), seed=0), 9, her_ratio=0.0)
+    collect(env, her, 300, np.random.default_rng(1))
+    batch = her.sample(256)
+    assert not batch["relabeled"].any()
+    assert np.array_equal(batch["reward"], her.buffer.transitions["reward"][batch["index"]])
+
+
+def test_relabeled_transitions_keep_the_other_reward_terms():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "croix_9_electrovoxels"], energy_weight=0.5)
+    her = HindsightReplay(ReplayBuffer(1000, (24,), seed=0), 9, her_ratio=1.0)
+    collect(env, her, 300, np.random.default_rng(2))
+    batch = her.sample(256)
+    states = her.buffer.transitions["state"][batch["index"]].astype(np.int64)
+    achieved, next_achieved = her.achieved[states], her.achieved[states + 1]
+    stored = her.buffer.transitions["reward"][batch["index"]]
+    # Energy term of the stored reward, which does not depend on the goal
+    energy_term = stored - goal_rewards(achieved, next_achieved, env.target_codes)[0]
+    similarity, terminated = goal_rewards(achieved, next_achieved, batch["goal"])
+    assert np.allclose(batch["reward"], similarity + energy_term, atol=1e-5)
+    assert np.array_equal(batch["terminated"], terminated)
+    assert np.abs(energy_term).max() > 0
@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+import pygame
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.electrovoxelInit import draw_voxel
+from electrovoxel.live_render import RenderThread, SnapshotChannel, view_origin
+
+SHAPES = ["carre_9_electrovoxels", "ligne_9_electrovoxels"]
+
+
+def test_snapshots_are_copies():
+    channel = SnapshotChannel()
+    positions = np.zeros((3, 2), dtype=np.int64)
+    channel.publish(positions, ["white"] * 3)
+    positions[0] = 5
+    assert channel.latest.version == 1 and (channel.latest.positions == 0).all()
+
+
+def test_env_publishes_each_move():
+    env = ElectroVoxelenv(Size=9, map_name=SHAPES, render_mode="human_async")
+    env.reset(seed=0)
+    version = env.snapshots.version
+    rng = np.random.default_rng(0)
+    moves = 0
+    for _ in range(50):
+        _, _, _, _, info = env.step((int(rng.integers(9)), int(rng.integers(8))))
+        moves += info["moved"]
+        assert (env.snapshots.latest.positions == env.positions).all()
+    assert env.snapshots.version == version + moves
+
+
+def test_view_origin_keeps_the_swarm_visible():
+    grid_size, voxel_size = (20, 20), 40
+    assert view_origin(np.array([[0, 0], [19, 19]]), grid_size, voxel_size) == (0, 0)
+    for positions in (np.array([[-5, 3], [-4, 3]]), np.array([[30, 40], [31, 41]])):
+        ox, oy = view_origin(positions, grid_size, voxel_size)
+        shifted = positions + (ox // voxel_size, oy // voxel_size)
+        assert (shifted >= 0).all() and (shifted < grid_size).all()
+
+
+def test_render_thread_draws_the_latest_snapshot(monkeypatch):
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    channel = SnapshotChannel()
+    thread = RenderThread(channel, grid_size=(10, 10), voxel_size=8, fps=200)
+    thread.start()
+    try:
+        for k in range(20):
+            channel.publish(np.array([[k % 10, 0]]), ["white"])
+        deadline = time.time() + 5
+        while thread.frames == 0 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        thread.stop()
+    assert thread.frames >= 1
+    assert thread.frames + thread.skipped <= 20
+
+
+def test_draw_voxel_fits_the_cell_size():
+    surface = pygame.Surface((40, 40))
+    surface.fill((50, 50, 50))
+    draw_voxel(surface, 8, 8, "red", size=8)
+    pixels = pygame.surfarray.array3d(surface)
+    assert tuple(pixels[12, 12]) == (255, 0, 0)
+    # Nothing is drawn beyond the cell and its corner dots
+    assert (pixels[18:, :] == 50).all() and (pixels[:, 18:] == 50).all()
+    assert (pixels[:6, :] == 50).all() and (pixels[:, :6] == 50).all()
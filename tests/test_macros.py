@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.macros import roll_to, surface_path, transfer
+from electrovoxel.reachability import ReachabilityCache
+
+SHAPES = ["carre_9_electrovoxels", "ligne_9_electrovoxels"]
+
+
+def test_execute_matches_steps():
+    env, reference = (ElectroVoxelenv(Size=9, map_name=SHAPES) for _ in range(2))
+    actions = np.random.default_rng(0).integers(8, size=30).tolist()
+    _, total, terminated, _, info = env.execute(4, actions)
+    expected, moves = 0.0, 0
+    for a in actions:
+        _, reward, _, _, step_info = reference.step((4, a))
+        if not step_info["moved"]:
+            break
+        expected += reward
+        moves += 1
+    assert info["moves"] == moves and info["moved"] == (moves == len(actions))
+    assert np.isclose(total, expected)
+    assert (env.positions == reference.positions).all()
+
+
+def test_roll_to_reaches_every_reachable_cell():
+    env = ElectroVoxelenv(Size=9, map_name=SHAPES)
+    cells = ReachabilityCache.for_env(env).reachable(0)[1:].tolist()
+    rng = np.random.default_rng(1)
+    for cell in [cells[k] for k in rng.choice(len(cells), min(5, len(cells)), replace=False)]:
+        env.reset(seed=0)
+        path = surface_path(env, 0, cell)
+        _, _, terminated, _, info = roll_to(env, 0, cell)
+        assert info["reachable"] and info["moves"] == len(path)
+        assert terminated or tuple(env.positions[0]) == tuple(cell)
+
+
+def test_unreachable_cells_and_transfer():
+    env = ElectroVoxelenv(Size=9, map_name=SHAPES)
+    before = env.positions.copy()
+    _, reward, _, _, info = roll_to(env, 0, (1000, 1000))
+    assert not info["reachable"] and info["moves"] == 0 and reward == 0.0
+    assert (env.positions == before).all()
+    with pytest.raises(ValueError):
+        transfer(env, (1000, 1000), (0, 0))
+    source = tuple(env.positions[2].tolist())
+    _, _, _, _, info = transfer(env, source, source)
+    assert info["reachable"] and info["moves"] == 0
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from electrovoxel.batch_render import rasterize
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.mosaic import MosaicRenderer, _tile_templates
+
+SHAPES = [["carre_9_electrovoxels", "ligne_9_electrovoxels"], ["croix_9_electrovoxels", "carre_9_electrovoxels"]]
+
+
+def expected_tile(mosaic, k):
+    env = mosaic.envs[k]
+    origin = -np.asarray(mosaic._offsets[k])
+    return rasterize(env.positions, env.target_positions, origin, mosaic.tile_cells, mosaic.cell_px, _tile_templates(mosaic.cell_px))
+
+
+@pytest.mark.parametrize("max_size", [(1280, 960), (150, 100)])
+def test_incremental_frame_matches_full_redraw(max_size):
+    envs = [ElectroVoxelenv(Size=9, map_name=SHAPES[k % 2]) for k in range(5)]
+    mosaic = MosaicRenderer(envs, tile_cells=(12, 12), max_size=max_size)
+    assert (mosaic.columns, mosaic.rows) == (3, 2)
+    frame = mosaic.render()
+    rng = np.random.default_rng(0)
+    for t in range(150):
+        for env in envs:
+            _, _, terminated, _, _ = env.step((int(rng.integers(9)), int(rng.integers(8))))
+            if terminated or rng.random() < 0.01:
+                env.reset()
+        assert mosaic.render(counters=[0] * 5) is frame
+        box = (7 * mosaic.counter_scale, 25 * mosaic.counter_scale)
+        for k in range(5):
+            tile = mosaic._tile(k).copy()
+            expected = expected_tile(mosaic, k)
+            # The counter box is drawn over the top left corner
+            tile[:box[0], :box[1]] = expected[:box[0], :box[1]]
+            assert (tile == expected).all()
+    mosaic.close()
+    assert all(listener not in env.move_listeners for env, listener in zip(envs, mosaic._listeners))
+
+
+def test_counters_are_drawn():
+    envs = [ElectroVoxelenv(Size=9, map_name=SHAPES[0]) for _ in range(2)]
+    mosaic = MosaicRenderer(envs, tile_cells=(12, 12))
+    assert mosaic.counter_scale > 0
+    frame = mosaic.render(counters=[0, 0])
+    first = mosaic._tile(0)[:7 * mosaic.counter_scale].copy()
+    mosaic.render(counters=[123, 0])
+    # Black pixels of the digits: "123" has more of them than "0"
+    box = mosaic._tile(0)[:7 * mosaic.counter_scale]
+    assert (box == 0).all(axis=-1).sum() > (first == 0).all(axis=-1).sum()
+    assert (mosaic._tile(1) == frame[:, -mosaic.tile_px[0]:]).all()
+    with pytest.raises(ValueError):
+        MosaicRenderer(envs, render_mode="ansi")
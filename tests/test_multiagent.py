@@ -0,0 +1,70 @@
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, load_shape
+from electrovoxel.grid import NEIGHBOR_OFFSETS, neighborhood_codes
+from electrovoxel.multiagent import NOOP, ParallelElectroVoxelenv, SwarmBatch
+from electrovoxel.rules import REQUIRED_2D, legal_moves_2d, legal_variants_2d
+
+SHAPES = ["carre_9_electrovoxels", "croix_9_electrovoxels", "ligne_9_electrovoxels"]
+
+
+def required_cells(position, mask):
+    return {(position[0] + dx, position[1] + dy) for k, (dx, dy) in enumerate(NEIGHBOR_OFFSETS) if int(mask) >> k & 1}
+
+
+def test_single_moves_match_env():
+    initial = np.stack([load_shape(name) + 20 for name in SHAPES])
+    target = np.stack([load_shape(name) for name in SHAPES[1:] + SHAPES[:1]])
+    batch = SwarmBatch(3, 9)
+    batch.reset(initial, target)
+    envs = [ElectroVoxelenv(initial_shape=i, target_shape=t) for i, t in zip(initial, target)]
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        actions = np.full((3, 9), NOOP)
+        voxels, moves = rng.integers(9, size=3), rng.integers(8, size=3)
+        actions[np.arange(3), voxels] = moves
+        _, rewards, _, moved = batch.step(actions)
+        for b, env in enumerate(envs):
+            _, reward, _, _, info = env.step((voxels[b], moves[b]))
+            assert moved[b, voxels[b]] == info["moved"]
+            assert np.isclose(rewards[b], reward)
+        assert (batch.positions == np.stack([env.positions for env in envs])).all()
+
+
+def test_simultaneous_moves_are_consistent():
+    initial = np.stack([load_shape(name) + 20 for name in SHAPES])
+    batch = SwarmBatch(3, 9)
+    batch.reset(initial, initial)
+    assert (batch.similarity == 1.0).all()
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        before = batch.positions.copy()
+        codes = batch.codes.copy()
+        actions = rng.integers(9, size=(3, 9))
+        _, _, _, moved = batch.step(actions)
+        for b in range(3):
+            assert len({tuple(p) for p in batch.positions[b].tolist()}) == 9
+            assert (batch.codes[b] == neighborhood_codes(batch.positions[b])).all()
+            assert (batch.positions[b][~moved[b]] == before[b][~moved[b]]).all()
+            for i in np.flatnonzero(moved[b]):
+                assert actions[b, i] != NOOP and legal_moves_2d(codes[b, i])[actions[b, i]]
+                # No electrovoxel it leaned on moved
+                v = legal_variants_2d(codes[b, i])[actions[b, i]].argmax()
+                cells = {tuple(p) for p in before[b][moved[b]].tolist()}
+                assert not cells & required_cells(before[b, i].tolist(), REQUIRED_2D[actions[b, i], v])
+        assert (batch.occupancy != 0).sum() == 27
+
+
+def test_parallel_env_api():
+    env = ParallelElectroVoxelenv(Size=9, map_name=SHAPES[:2], max_steps=3)
+    observations, infos = env.reset(seed=0)
+    assert sorted(observations) == sorted(env.possible_agents) == sorted(infos)
+    assert all(env.observation_space(a).contains(o) for a, o in observations.items())
+    for t in range(3):
+        observations, rewards, terminated, truncated, infos = env.step({agent: env.action_space(agent).sample() for agent in env.agents})
+        assert len(set(rewards.values())) == 1
+    assert all(truncated.values()) and env.agents == []
+    line = load_shape("ligne_9_electrovoxels")
+    env.reset(options={"initial_shape": line, "target_shape": line})
+    _, rewards, terminated, _, _ = env.step({})
+    assert all(terminated.values()) and rewards["voxel_0"] == 1.0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import OBSERVATION_MODES, ElectroVoxelenv
+from electrovoxel.grid import neighborhood_codes
+
+SHAPES = ["carre_9_electrovoxels", "ligne_9_electrovoxels"]
+
+
+def unpacked(codes):
+    return ((np.asarray(codes, dtype=np.uint32)[:, None] >> np.arange(24)) & 1).astype(np.uint8)
+
+
+def test_observation_modes_agree():
+    envs = {mode: ElectroVoxelenv(Size=9, map_name=SHAPES, observation_mode=mode) for mode in OBSERVATION_MODES}
+    observations = {mode: env.reset(seed=0)[0] for mode, env in envs.items()}
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        action = (int(rng.integers(9)), int(rng.integers(8)))
+        for mode, env in envs.items():
+            observations[mode] = env.step(action)[0]
+            if mode != "graph":
+                assert env.observation_space.contains(observations[mode])
+        positions = envs["coords"].positions
+        codes = neighborhood_codes(positions)
+        assert (observations["coords"] == positions).all()
+        assert (observations["neighborhood"] == unpacked(codes[action[0]:action[0] + 1])[0]).all()
+        assert (np.unpackbits(observations["packed"], axis=1, count=24, bitorder="little") == unpacked(codes)).all()
+        assert (observations["graph"]["x"] == unpacked(codes)).all()
+        image = observations["image"]
+        assert image[0].sum() == 9
+        assert (image[0, positions[:, 1], positions[:, 0]] == 1).all()
+        assert image[1].sum() == len(envs["image"].target_positions)
+
+
+def test_observation_views_are_read_only():
+    for mode in ("packed", "image", "coords"):
+        env = ElectroVoxelenv(Size=9, map_name=SHAPES, observation_mode=mode)
+        observation, _ = env.reset(seed=0)
+        with pytest.raises(ValueError):
+            observation[0] = 0
+
+
+def test_unknown_observation_mode():
+    with pytest.raises(ValueError):
+        ElectroVoxelenv(Size=9, map_name=SHAPES, observation_mode="pixels")
+
+
+def test_reward_range_covers_the_reward_terms():
+    assert ElectroVoxelenv(Size=9, map_name=SHAPES).reward_range == (0, 1)
+    for weights in ({"energy_weight": 0.5}, {"distance_weight": 0.1}, {"shaping_weight": 1.0}):
+        env = ElectroVoxelenv(Size=9, map_name=SHAPES, **weights)
+        low, high = env.reward_range
+        rng = np.random.default_rng(0)
+        rewards = [env.step((int(rng.integers(9)), int(rng.integers(8))))[1] for _ in range(100)]
+        assert low <= min(rewards) and max(rewards) <= high
+        assert min(rewards) < 0
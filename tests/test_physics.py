@@ -0,0 +1,93 @@
+import numpy as np
+
+from electrovoxel.grid import ChunkedGrid
+from electrovoxel.physics import batch_energy, delta_energy, energy, forces, neighbor_pairs
+
+
+def random_configuration(rng, n, extent):
+    cells = rng.choice(extent * extent, n, replace=False)
+    return np.stack([cells % extent, cells // extent], axis=1) - extent // 2
+
+
+def brute_force_energy(positions, charges, cutoff):
+    total = 0.0
+    for i in range(len(positions)):
+        for j in range(i + 1, len(positions)):
+            r = np.hypot(*(positions[j] - positions[i]))
+            if r <= cutoff:
+                total += charges[i] * charges[j] / r
+    return total
+
+
+def test_energy_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for extent in (8, 200):  # dense cell list and sorted hash
+        positions = random_configuration(rng, 40, extent)
+        charges = rng.normal(size=40)
+        assert np.isclose(energy(positions, charges, 3.0), brute_force_energy(positions, charges, 3.0))
+
+
+def test_neighbor_pairs_are_unique():
+    rng = np.random.default_rng(1)
+    positions = random_configuration(rng, 60, 12)
+    i, j, d = neighbor_pairs(positions, 2.5)
+    pairs = {tuple(sorted(p)) for p in zip(i.tolist(), j.tolist())}
+    assert len(pairs) == len(i)
+    assert (positions[j] - positions[i] == d).all()
+
+
+def test_batch_energy_matches_energy():
+    rng = np.random.default_rng(2)
+    positions = np.stack([random_configuration(rng, 50, extent) for extent in (8, 10, 30, 300) for _ in range(4)])
+    charges = rng.normal(size=(len(positions), 50))
+    expected = [energy(p, q, 3.0) for p, q in zip(positions, charges)]
+    assert np.allclose(batch_energy(positions, charges, 3.0), expected)
+    # Shared charges
+    assert np.allclose(batch_energy(positions, charges[0], 2.0), [energy(p, charges[0], 2.0) for p in positions])
+
+
+def test_batch_energy_scales_to_10k_voxels():
+    rng = np.random.default_rng(3)
+    positions = np.stack([random_configuration(rng, 10000, 200) for _ in range(2)])
+    energies = batch_energy(positions, 1.0)
+    assert np.isclose(energies[1], energy(positions[1], np.ones(10000)))
+
+
+def test_delta_energy_matches_recompute():
+    rng = np.random.default_rng(4)
+    positions = random_configuration(rng, 30, 10)
+    charges = rng.normal(size=30)
+    grid = ChunkedGrid()
+    for k, (x, y) in enumerate(positions.tolist()):
+        grid.set(x, y, k + 1)
+    before = energy(positions, charges)
+    old = tuple(positions[0].tolist())
+    new = (old[0] + 20, old[1])
+    change = delta_energy(grid, charges, 0, old, new)
+    positions[0] = new
+    assert np.isclose(before + change, energy(positions, charges))
+
+
+def test_face_forces_match_brute_force():
+    rng = np.random.default_rng(3)
+    positions = random_configuration(rng, 30, 8)
+    charges = rng.normal(size=30)
+    force, faces = forces(positions, charges, 3.0)
+    expected_force = np.zeros((30, 2))
+    expected_faces = np.zeros((30, 4))
+    for a in range(30):
+        for b in range(30):
+            e = positions[b] - positions[a]
+            r = np.hypot(*e)
+            if a == b or r > 3.0:
+                continue
+            f = -charges[a] * charges[b] / r ** 3 * e
+            expected_force[a] += f
+            axis = 0 if abs(e[0]) >= abs(e[1]) else 1
+            side = 1 if e[axis] > 0 else 0
+            expected_faces[a, 2 * axis + side] += f[axis] * (1 if side else -1)
+    assert np.allclose(force, expected_force)
+    assert np.allclose(faces, expected_faces)
+    # Two like charges side by side push each other inward through the faces they share
+    _, faces = forces([(0, 0), (1, 0)], [1.0, 1.0])
+    assert np.allclose(faces, [[0, -1, 0, 0], [-1, 0, 0, 0]])
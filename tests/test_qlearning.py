@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, generate_random_shape
+from electrovoxel.qlearning import QLearningTrainer, QTable, state_keys, target_key
+
+
+def test_qtable_counts_distinct_keys():
+    rng = np.random.default_rng(0)
+    table = QTable(capacity=16)
+    inserted = set()
+    for _ in range(50):
+        keys = rng.integers(0, 300, 32).astype(np.uint64)  # repeated keys, and key 0
+        table.update(keys, rng.integers(0, 8, 32), rng.normal(size=32), 0.1)
+        inserted.update(keys.tolist())
+    assert len(table) == len(inserted)
+    assert (table.slots(np.array(sorted(inserted), dtype=np.uint64)) >= 0).all()
+    assert (table.slots(np.array([1000, 2000], dtype=np.uint64)) == -1).all()
+
+
+def test_qtable_update_and_lookup():
+    table = QTable(capacity=16)
+    keys = np.arange(100, dtype=np.uint64)
+    table.update(keys, keys % 8, np.ones(100), 0.5)
+    rows = table.lookup(keys)
+    assert np.allclose(rows[np.arange(100), keys % 8], 0.5)
+    assert rows.sum() == pytest.approx(50.0)
+    assert np.allclose(table.lookup(np.array([500], dtype=np.uint64)), 0.0)
+
+
+def test_qtable_compact_keeps_visited_states():
+    table = QTable(capacity=16)
+    table.update(np.arange(10, dtype=np.uint64), np.zeros(10, dtype=int), np.ones(10), 1.0)
+    table.update(np.arange(5, dtype=np.uint64), np.zeros(5, dtype=int), np.ones(5), 1.0)
+    assert table.compact(min_visits=2) == 5
+    assert len(table) == 5
+    assert (table.slots(np.arange(5, dtype=np.uint64)) >= 0).all()
+    assert (table.slots(np.arange(5, 10, dtype=np.uint64)) == -1).all()
+
+
+def test_state_keys_reject_negative_target():
+    with pytest.raises(ValueError):
+        state_keys(123, 9, -1)
+    assert len(np.unique(state_keys(123, 9, 0))) == 9
+    assert not np.array_equal(state_keys(123, 9, 0), state_keys(123, 9, 1))
+
+
+def test_trainer_on_shapes_outside_the_catalog():
+    rng = np.random.default_rng(1)
+    envs = [ElectroVoxelenv(initial_shape=generate_random_shape(9, rng), target_shape=generate_random_shape(9, rng)) for _ in range(2)]
+    assert envs[0].shape_ids == (-1, -1)
+    assert target_key(envs[0]) >= 0 and target_key(envs[0]) != target_key(envs[1])
+    trainer = QLearningTrainer(envs, seed=0)
+    stats = trainer.train(20)
+    assert stats["updates"] == 40
+    assert stats["states"] > 0
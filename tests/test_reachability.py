@@ -0,0 +1,44 @@
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.reachability import ReachabilityCache, surface_search
+
+
+def fresh_search(env, index):
+    start = (int(env.positions[index, 0]), int(env.positions[index, 1]))
+    env.grid.clear(*start)
+    try:
+        return surface_search(env.grid, start)
+    finally:
+        env.grid.set(start[0], start[1], index + 1)
+
+
+def test_cache_matches_fresh_search_and_keeps_readers_consistent():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"])
+    cache = ReachabilityCache.for_env(env)
+    assert ReachabilityCache.for_env(env) is cache
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        index = int(rng.integers(9))
+        assert set(map(tuple, cache.reachable(index).tolist())) == set(fresh_search(env, index))
+        _, _, terminated, _, _ = env.step((int(rng.integers(9)), int(rng.integers(8))))
+        if terminated:
+            env.reset()
+        # Every reader belongs to a live entry whose footprint contains the cell
+        expected = {}
+        for i, (_, _, footprint) in cache.entries.items():
+            for cell in footprint:
+                expected.setdefault(cell, set()).add(i)
+        assert cache.readers == expected
+    assert cache.hits > 0 and cache.misses > 0
+
+
+def test_path_leads_to_the_cell():
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"])
+    cache = ReachabilityCache.for_env(env)
+    cells = cache.reachable(0)
+    target = cells[-1]
+    for a in cache.path(0, target):
+        env.step((0, a))
+    assert (env.positions[0] == target).all()
+    assert cache.path(0, (1000, 1000)) is None
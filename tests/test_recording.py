@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, generate_random_shape
+from electrovoxel.recording import EPISODE_DTYPE, STEP_DTYPE, EpisodeLog, EpisodeRecorder, RecordEpisode, replay
+
+
+def test_record_and_replay(tmp_path):
+    rng = np.random.default_rng(0)
+    finals = []
+    # Small chunks so that several flushes happen within an episode
+    with EpisodeRecorder(str(tmp_path), chunk_size=64) as recorder:
+        env = RecordEpisode(ElectroVoxelenv(Size=9), recorder)
+        for _ in range(3):
+            env.reset()
+            for _ in range(100):
+                env.step((int(rng.integers(9)), int(rng.integers(8))))
+            finals.append(env.unwrapped.positions.copy())
+    assert STEP_DTYPE.itemsize == 9
+    assert (tmp_path / "steps.bin").stat().st_size == 300 * STEP_DTYPE.itemsize
+    assert (tmp_path / "episodes.bin").stat().st_size == 3 * EPISODE_DTYPE.itemsize
+    log = EpisodeLog(str(tmp_path))
+    assert len(log) == 3
+    assert log.episodes["first_step"].tolist() == [0, 100, 200]
+    for i, positions in enumerate(finals):
+        assert (replay(log, i).positions == positions).all()
+
+
+def test_recordings_are_appended(tmp_path):
+    for _ in range(2):
+        with EpisodeRecorder(str(tmp_path)) as recorder:
+            recorder.begin(9, 0, 1, seed=3)
+            recorder.record(2, 5, 0.5)
+            recorder.begin(9, 1, 0, seed=4)  # ends the first episode
+            recorder.record(1, 1, 0.0)
+            recorder.record(0, 7, 1.0)
+    log = EpisodeLog(str(tmp_path))
+    assert log.episodes["num_steps"].tolist() == [1, 2, 1, 2]
+    assert log.steps(3).tolist() == [(1, 1, 0.0), (0, 7, 1.0)]
+    with pytest.raises(ValueError):
+        EpisodeRecorder(str(tmp_path / "other")).record(0, 0, 0.0)
+
+
+def test_replay_detects_divergence_and_custom_shapes(tmp_path):
+    rng = np.random.default_rng(1)
+    with EpisodeRecorder(str(tmp_path)) as recorder:
+        env = RecordEpisode(ElectroVoxelenv(Size=9), recorder)
+        env.reset(seed=5)
+        for _ in range(50):
+            env.step((int(rng.integers(9)), int(rng.integers(8))))
+        env.reset(options={"initial_shape": generate_random_shape(9, rng), "target_shape": generate_random_shape(9, rng)})
+        env.step((0, 0))
+    log = EpisodeLog(str(tmp_path))
+    with pytest.raises(ValueError):
+        replay(log, 1)
+    steps = np.array(log.steps(0))
+    steps["reward"] += 1.0
+    (tmp_path / "steps.bin").write_bytes(np.concatenate([steps, log.steps(1)]).tobytes())
+    with pytest.raises(RuntimeError):
+        replay(EpisodeLog(str(tmp_path)), 0)
+
+
+@pytest.mark.parametrize("weights", [{"energy_weight": 0.5}, {"distance_weight": 0.1}, {"shaping_weight": 1.0}])
+def test_replay_uses_the_recorded_reward_terms(tmp_path, weights):
+    rng = np.random.default_rng(2)
+    with EpisodeRecorder(str(tmp_path)) as recorder:
+        env = RecordEpisode(ElectroVoxelenv(Size=9, observation_mode="packed", **weights), recorder)
+        env.reset(seed=3)
+        for _ in range(100):
+            env.step((int(rng.integers(9)), int(rng.integers(8))))
+        final = env.unwrapped.positions.copy()
+    log = EpisodeLog(str(tmp_path))
+    assert log.config["observation_mode"] == "packed"
+    replayed = replay(log, 0)
+    assert (replayed.positions == final).all()
+    assert all(getattr(replayed, key) == value for key, value in weights.items())
+    # Appending episodes of another configuration would make them unreplayable
+    with pytest.raises(ValueError):
+        RecordEpisode(ElectroVoxelenv(Size=9), EpisodeRecorder(str(tmp_path)))
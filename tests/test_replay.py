@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from electrovoxel.replay import TRANSITION_DTYPE, ReplayBuffer, SumTree
+
+
+def test_sum_tree_matches_cumulative_sums():
+    rng = np.random.default_rng(0)
+    tree = SumTree(100)
+    priorities = np.zeros(100)
+    for _ in range(20):
+        indices = rng.integers(100, size=10)
+        values = rng.random(10)
+        tree.update(indices, values)
+        priorities[indices] = values
+        tree.set(int(indices[0]), 0.5)
+        priorities[indices[0]] = 0.5
+    assert np.isclose(tree.total, priorities.sum())
+    assert np.allclose(tree[np.arange(100)], priorities)
+    queries = rng.random(1000) * tree.total
+    expected = np.searchsorted(np.cumsum(priorities), queries, side="right")
+    assert (tree.find(queries) == expected).all()
+
+
+def fill(buffer, episodes, length, start=0):
+    """Observations encode their counter, transitions their state."""
+    counter = start
+    for _ in range(episodes):
+        buffer.begin(np.full(buffer.observation_shape, counter % 2 if buffer.pack_bits else counter % 256))
+        for t in range(length):
+            counter += 1
+            observation = np.full(buffer.observation_shape, counter % 2 if buffer.pack_bits else counter % 256)
+            buffer.add(counter % 9, counter % 8, float(counter), observation, t == length - 1)
+        counter += 1
+    return counter
+
+
+def test_transitions_link_consecutive_observations(tmp_path):
+    for directory in (None, str(tmp_path)):
+        buffer = ReplayBuffer(50, (4,), directory=directory, seed=0)
+        end = fill(buffer, 20, 7)
+        # Episodes use one more observation than transitions, the observation ring is the limit
+        assert 40 < len(buffer) <= 50
+        batch = buffer.sample(200)
+        counters = batch["reward"].astype(np.int64)
+        assert (batch["next_observation"][:, 0] == counters % 256).all()
+        assert (batch["observation"][:, 0] == (counters - 1) % 256).all()
+        assert (batch["voxel"] == counters % 9).all() and (batch["action"] == counters % 8).all()
+        # Only the most recent transitions are kept
+        assert counters.min() >= end - buffer.observation_capacity
+        buffer.flush()
+    assert TRANSITION_DTYPE.itemsize == 18
+
+
+def test_packed_observations_round_trip():
+    buffer = ReplayBuffer(100, (3, 5), pack_bits=True, seed=1)
+    rng = np.random.default_rng(1)
+    observations = rng.integers(0, 2, (11, 3, 5))
+    buffer.begin(observations[0])
+    for k in range(1, 11):
+        buffer.add(0, 0, float(k), observations[k], False)
+    batch = buffer.sample(50)
+    k = batch["reward"].astype(np.int64)
+    assert (batch["observation"] == observations[k - 1]).all()
+    assert (batch["next_observation"] == observations[k]).all()
+    with pytest.raises(ValueError):
+        buffer.add(0, 0, 0.0, np.zeros((2, 5)), False)
+
+
+def test_small_observation_ring_drops_old_transitions():
+    buffer = ReplayBuffer(100, (1,), observation_capacity=30, seed=2)
+    fill(buffer, 10, 9)
+    batch = buffer.sample(500)
+    counters = batch["reward"].astype(np.int64)
+    assert (batch["next_observation"][:, 0] == counters % 256).all()
+    assert (batch["observation"][:, 0] == (counters - 1) % 256).all()
+    assert len(buffer) < 30
+
+
+def test_prioritized_sampling_follows_priorities():
+    buffer = ReplayBuffer(8, (1,), alpha=1.0, seed=3)
+    fill(buffer, 1, 8)
+    buffer.update_priorities(np.arange(8), np.arange(1, 9, dtype=np.float64), epsilon=0.0)
+    counts = np.zeros(8)
+    for _ in range(200):
+        batch = buffer.sample(64, prioritized=True)
+        counts += np.bincount(batch["index"], minlength=8)
+    assert np.allclose(counts / counts.sum(), np.arange(1, 9) / 36, atol=0.01)
+    assert batch["weight"].max() == 1.0 and batch["weight"].min() < 1.0
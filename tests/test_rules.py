@@ -0,0 +1,90 @@
+import numpy as np
+
+from electrovoxel.electrovoxel_3D import ElectroVoxel3Denv
+from electrovoxel.electrovoxelInit import ElectroVoxel
+from electrovoxel.grid import NEIGHBOR_OFFSETS, code_to_connections
+from electrovoxel.rules import (ACTIONS_2D, DISPLACEMENTS_3D, NEIGHBOR_OFFSETS_3D, PRIMITIVES_3D, RULES_3D,
+                                legal_moves_2d, legal_moves_3d, resolve_moves_2d)
+
+
+def random_codes(rng, count):
+    # Sparse and dense neighborhoods
+    density = rng.random((count, 1))
+    bits = rng.random((count, 24)) < density
+    return (bits * (1 << np.arange(24))).sum(axis=1).astype(np.uint32)
+
+
+def test_2d_rules_match_electrovoxel():
+    rng = np.random.default_rng(0)
+    codes = random_codes(rng, 20000)
+    legal = legal_moves_2d(codes)
+    for code, row in zip(codes.tolist(), legal):
+        state = code_to_connections(code)
+        for a, (kind, direction) in enumerate(ACTIONS_2D):
+            voxel = ElectroVoxel(0, 0, charge=1, size=1, color="white")
+            voxel.update(state)
+            moved = voxel.pivot(direction) if kind == "pivot" else voxel.transverse(direction)
+            # The rules also require the destination to be empty
+            expected = moved and not state[(voxel.x, voxel.y)]
+            assert row[a] == expected
+            if expected:
+                legal_one, displacement = resolve_moves_2d(np.array([code]), np.array([a]))
+                assert legal_one[0] and tuple(displacement[0]) == (voxel.x, voxel.y)
+
+
+def test_3d_rules_in_a_plane_match_2d():
+    # Primitives whose direction and base lie in the plane z = 0 are the 2D rules of their frame
+    rng = np.random.default_rng(1)
+    codes = random_codes(rng, 5000)
+    bits = ((codes[:, None] >> np.arange(24)) & 1).astype(bool)
+    bits3d = np.zeros((len(codes), 124), dtype=bool)
+    bits3d[:, [NEIGHBOR_OFFSETS_3D.index(offset + (0,)) for offset in NEIGHBOR_OFFSETS]] = bits
+    legal3d = legal_moves_3d(np.ascontiguousarray(np.packbits(bits3d, axis=1, bitorder="little")).view("<u8"))
+    frames = (
+        (ACTIONS_2D.index(("pivot", "up")), ("pivot", (0, -1, 0), (1, 0, 0)), (1, -1, 0)),
+        (ACTIONS_2D.index(("transverse", "left")), ("transverse", (-1, 0, 0), (0, 1, 0)), (-1, 0, 0)),
+    )
+    for a, primitive, displacement in frames:
+        k = PRIMITIVES_3D.index(primitive)
+        # The 2D variant whose base is the base of the frame
+        expected = legal_moves_2d(codes)[:, a] & bits[:, NEIGHBOR_OFFSETS.index(primitive[2][:2])]
+        assert (legal3d[:, k] == expected).all()
+        assert tuple(DISPLACEMENTS_3D[k]) == displacement
+
+
+def brute_force_legal_3d(env, i):
+    cells = set(map(tuple, env.positions.tolist()))
+    p = env.positions[i]
+    legal = []
+    for _, required, empty, displacement in RULES_3D:
+        new = p + displacement
+        legal.append(all(tuple(p + r) in cells for r in required) and not any(tuple(p + e) in cells for e in empty)
+                     and bool((new >= 0).all() and (new < env.world_size).all()))
+    return legal
+
+
+def test_3d_env_codes_and_moves():
+    env = ElectroVoxel3Denv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"], world_size=(16, 16, 8))
+    env.reset()
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        legal = env.legal_moves()
+        for i in range(env.size):
+            assert legal[i].tolist() == brute_force_legal_3d(env, i)
+        candidates = np.argwhere(legal)
+        index, primitive = candidates[rng.integers(len(candidates))]
+        assert env.move(int(index), int(primitive))
+        assert (env.codes == env._shape_codes(env.positions)).all()
+    illegal = np.argwhere(~env.legal_moves())[0]
+    assert not env.move(int(illegal[0]), int(illegal[1]))
+
+
+def test_3d_env_reaches_a_translated_target():
+    line = np.array([(x, 3, 2) for x in range(4)])
+    env = ElectroVoxel3Denv(initial_shape=line, target_shape=line + (5, 1, 1), world_size=(16, 16, 8))
+    env.reset()
+    assert env.is_target_reached()
+    bent = np.array([(0, 3, 2), (1, 3, 2), (2, 3, 2), (2, 4, 2)])
+    env = ElectroVoxel3Denv(initial_shape=line, target_shape=bent, world_size=(16, 16, 8))
+    env.reset()
+    assert not env.is_target_reached()
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import generate_random_shape
+from electrovoxel.shape_library import D4, ShapeLibrary, build_library, canonical_form, is_connected
+
+
+def write_shape(directory, name, positions):
+    lines = ["X,Y"] + [f"{x},{y}" for x, y in np.asarray(positions).tolist()]
+    (directory / f"{name}_{len(positions)}_electrovoxels.csv").write_text("\n".join(lines) + "\n")
+
+
+def test_canonical_form_is_invariant():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        shape = generate_random_shape(9, rng)
+        canonical = canonical_form(shape)
+        for symmetry in D4:
+            moved = shape @ symmetry.T + rng.integers(-50, 50, 2)
+            assert (canonical_form(rng.permutation(moved)) == canonical).all()
+    line = np.array([(x, 0) for x in range(4)])
+    corner = np.array([(0, 0), (1, 0), (2, 0), (2, 1)])
+    assert not np.array_equal(canonical_form(line), canonical_form(corner))
+    assert is_connected(line) and not is_connected(np.array([(0, 0), (1, 1)]))
+
+
+def test_build_library(tmp_path):
+    rng = np.random.default_rng(1)
+    shapes = [generate_random_shape(9, rng) for _ in range(5)] + [generate_random_shape(4, rng)]
+    for k, shape in enumerate(shapes):
+        write_shape(tmp_path, f"shape{k}", shape)
+    write_shape(tmp_path, "shape0rotated", shapes[0] @ D4[1].T + 3)  # duplicate of shape0
+    write_shape(tmp_path, "split", [(0, 0), (1, 0), (3, 0)])
+    write_shape(tmp_path, "repeated", [(0, 0), (0, 0), (1, 0)])
+    (tmp_path / "short_3_electrovoxels.csv").write_text("X,Y\n0,0\n1,0\n")
+    output = tmp_path / "library.bin"
+    stats = build_library(str(tmp_path), str(output), processes=2, chunksize=2)
+    assert stats == {"scanned": 10, "invalid": 3, "duplicates": 1, "shapes": 6}
+
+    library = ShapeLibrary(str(output))
+    assert len(library) == 6 and library.sizes == [4, 9]
+    assert library.count(9) == 5 and library.count(7) == 0 and library.shapes(7).shape == (0, 7, 2)
+    # Names are the shape names of the files, as in shape_catalog
+    assert library.names(4) == ["shape5_4_electrovoxels"]
+    assert library.names(9) == [f"shape{k}_9_electrovoxels" for k in range(5)]
+    for k in range(5):
+        assert (library.shapes(9)[k] == canonical_form(shapes[k])).all()
+    assert (library.shape(4, 0, origin=(5, 5)) == canonical_form(shapes[5]) + 5).all()
+
+
+def test_library_rejects_other_files(tmp_path):
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        ShapeLibrary(str(other))
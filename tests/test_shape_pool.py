@@ -0,0 +1,37 @@
+import numpy as np
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.shape_pool import ShapePairPool
+
+
+def assert_same_state(env, reference):
+    assert (env.positions == reference.positions).all()
+    assert (env.target_positions == reference.target_positions).all()
+    assert (env.codes == reference.codes).all()
+    assert (env.target_codes == reference.target_codes).all()
+    assert env.config_hash == reference.config_hash
+    assert np.isclose(env.similarity, reference.similarity)
+    assert (env.image == reference.image).all()
+    assert [v.state for v in env.voxels] == [v.state for v in reference.voxels]
+    assert env.shape_distance.distance == reference.shape_distance.distance
+    assert (np.sort(env.graph.edge_index, axis=1) == np.sort(reference.graph.edge_index, axis=1)).all()
+    assert (env.graph.node_features == reference.graph.node_features).all()
+    assert (env.graph.target_features == reference.graph.target_features).all()
+
+
+def test_pooled_reset_reuses_buffers():
+    pool = ShapePairPool(9, capacity=4, background=False, seed=0)
+    env = ElectroVoxelenv(Size=9, observation_mode="graph", distance_weight=0.5)
+    env.shape_pool = pool
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    graph, shape_distance, states = env.graph, env.shape_distance, [v.state for v in env.voxels]
+    for _ in range(10):
+        for _ in range(20):
+            env.step((int(rng.integers(9)), int(rng.integers(8))))
+        env.reset()
+        assert env.graph is graph and env.shape_distance is shape_distance
+        assert all(v.state is state for v, state in zip(env.voxels, states))
+        reference = ElectroVoxelenv(Size=9, observation_mode="graph", distance_weight=0.5)
+        reference.reset(options={"initial_shape": env.positions.copy(), "target_shape": env.target_positions.copy()})
+        assert_same_state(env, reference)
@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv
+from electrovoxel.rules import legal_moves_2d
+from electrovoxel.trace import REASON_NAMES, REASON_OCCUPIED, REASON_OK, MoveTrace
+
+
+def test_ring_buffer_wraps_around():
+    trace = MoveTrace(capacity=10)
+    for k in range(25):
+        trace.record(k, k % 8, k % 3 == 0, REASON_OK if k % 3 == 0 else 1 + k % 5)
+    assert len(trace) == 10 and trace.count == 25
+    events = trace.events()
+    assert events["voxel"].tolist() == list(range(15, 25))
+    assert events["step"].tolist() == list(range(15, 25))
+    assert trace.events(voxel=[16, 17, 99])["voxel"].tolist() == [16, 17]
+    assert trace.events(accepted=True)["voxel"].tolist() == [15, 18, 21, 24]
+    assert sum(trace.counts().values()) == 10
+    with pytest.raises(ValueError):
+        MoveTrace(capacity=0)
+
+
+def test_episodes_are_dumped_when_they_end():
+    output = io.StringIO()
+    trace = MoveTrace(capacity=100, dump_on_episode_end=output)
+    trace.record(1, 0, True, REASON_OK)
+    trace.record(2, 4, False, REASON_OCCUPIED)
+    trace.end_episode()
+    trace.end_episode()  # empty episode, nothing written
+    trace.record(3, 1, True, REASON_OK)
+    assert output.getvalue() == ("episode 0 step 0 voxel 1: left pivot accepted\n"
+                                 "episode 0 step 1 voxel 2: left transverse rejected (occupied)\n")
+    assert trace.events(episode=2)["voxel"].tolist() == [3]
+    trace.clear()
+    assert len(trace) == 0
+
+
+def test_env_trace_agrees_with_the_rules(tmp_path):
+    env = ElectroVoxelenv(Size=9, map_name=["carre_9_electrovoxels", "ligne_9_electrovoxels"], trace_capacity=1000)
+    rng = np.random.default_rng(0)
+    expected = []
+    for _ in range(300):
+        voxel, action = int(rng.integers(9)), int(rng.integers(8))
+        legal = legal_moves_2d(env.codes[voxel])[action]
+        _, _, terminated, _, info = env.step((voxel, action))
+        assert info["moved"] == legal
+        expected.append((voxel, action, legal))
+        if terminated:
+            env.reset()
+    events = env.trace.events()
+    assert [(v, a, bool(ok)) for v, a, ok in zip(events["voxel"].tolist(), events["action"].tolist(), events["accepted"])] == expected
+    assert ((events["reason"] == REASON_OK) == events["accepted"].astype(bool)).all()
+    assert set(env.trace.counts(accepted=False)) == set(REASON_NAMES)
+    env.trace.save(str(tmp_path / "trace.npy"))
+    assert (np.load(tmp_path / "trace.npy") == events).all()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from electrovoxel.electrovoxel_2D import ElectroVoxelenv, choose_shapes, shape_catalog
+from electrovoxel.utils import AliasSampler, popcount
+
+
+def test_alias_sampler_frequencies():
+    weights = np.random.default_rng(0).random(1000) * (np.arange(1000) % 7 != 0)
+    sampler = AliasSampler(weights, np.random.default_rng(1), block_size=64)
+    counts = np.bincount(sampler.sample(400000), minlength=1000)
+    assert counts[weights == 0].sum() == 0
+    expected = weights / weights.sum() * 400000
+    assert np.abs(counts - expected).max() < 6 * np.sqrt(expected.max())
+
+
+def test_alias_sampler_update():
+    sampler = AliasSampler(np.ones(300), np.random.default_rng(2), block_size=32)
+    sampler.update(np.arange(290), 0.0)
+    samples = sampler.sample(10000)
+    assert samples.min() >= 290
+    # Same generator state, same draws
+    assert np.array_equal(sampler.sample(100, np_random=np.random.default_rng(3)), sampler.sample(100, np_random=np.random.default_rng(3)))
+    with pytest.raises(ValueError):
+        sampler.update([0], -1.0)
+
+
+def test_choose_shapes_with_sampler():
+    available = shape_catalog(9)
+    weights = np.zeros(len(available))
+    weights[[0, 1]] = 1.0
+    sampler = AliasSampler(weights, np.random.default_rng(0))
+    pairs = {choose_shapes(9, np_random=np.random.default_rng(seed), sampler=sampler) for seed in range(50)}
+    assert pairs == {(available[0], available[1]), (available[1], available[0])}
+    assert np.array_equal(sampler.weights[:len(available)], weights)
+    # No weight left once the initial shape is drawn: an error instead of an endless loop
+    with pytest.raises(ValueError):
+        choose_shapes(9, shape1=available[0], sampler=AliasSampler(np.eye(len(available))[0]))
+
+
+def test_env_draws_shapes_with_its_generator():
+    env = ElectroVoxelenv(Size=9)
+    env.shape_sampler = AliasSampler(np.ones(len(shape_catalog(9))), np.random.default_rng(0))
+    shapes = []
+    for _ in range(2):
+        env.reset(seed=7)
+        shapes.append(env.shape_ids)
+    assert shapes[0] == shapes[1]
+
+
+def test_popcount():
+    values = np.random.default_rng(4).integers(0, 1 << 40, 100).astype(np.uint64)
+    assert popcount(values).tolist() == [bin(v).count("1") for v in values.tolist()]